@@ -0,0 +1,92 @@
+"""
+Agent pool for Gizmo.
+
+Creating an agent builds its model, its toolkits and, on the first run, the tool schemas sent to the
+model. The pool keeps the agents that finished a run and hands them out again to later runs of the
+same agent type and configuration, so steps, summaries and, in batch mode, projects reuse them. The
+models of pooled agents keep using the shared OpenAI client of their event loop, so agents are pooled
+per event loop.
+
+An agent is only used by one run at a time, and its memory is cleared before it is reused. Clearing
+the state of the last run resets private attributes of agno, see `RUN_STATE_ATTRIBUTES`; they are
+checked before they are reset, so another agno version does not break the pool.
+"""
+
+import asyncio
+import contextlib
+import weakref
+from typing import Iterator, Type
+
+from agno.agent import Agent
+
+from gizmo.utils.error_utils import logger
+
+# Maximum number of idle agents kept per agent type and configuration
+MAX_IDLE_AGENTS = 8
+
+# Idle agents by event loop, then by agent type and configuration
+_pools = weakref.WeakKeyDictionary()
+
+# Attributes of the agent ("agent") and of its model ("model") holding the state of the last run,
+# as of agno 1.2.6, the version pinned in setup.py
+RUN_STATE_ATTRIBUTES = (
+    ("agent", "run_response"),
+    ("agent", "run_input"),
+    ("model", "_function_call_stack"),
+)
+
+# Run state attributes that were found missing, so that each is only reported once
+_missing_attributes = set()
+
+
+def _reset_agent(agent: Agent):
+    """
+    Clear the state an agent keeps from its last run.
+
+    Attributes that do not exist in the installed agno version are skipped, and reported once.
+
+    Args:
+        agent (Agent): The agent
+    """
+    if agent.memory is not None:
+        agent.memory.clear()
+    for owner_name, attribute in RUN_STATE_ATTRIBUTES:
+        owner = agent if owner_name == "agent" else agent.model
+        if owner is None:
+            continue
+        if hasattr(owner, attribute):
+            setattr(owner, attribute, None)
+        elif (owner_name, attribute) not in _missing_attributes:
+            _missing_attributes.add((owner_name, attribute))
+            logger.warning(f"Cannot reset {owner_name}.{attribute} of pooled agents: the installed agno "
+                           f"version does not have it (Gizmo is tested with the version pinned in setup.py)")
+
+
+@contextlib.contextmanager
+def pooled_agent(agent_class: Type[Agent], *args) -> Iterator[Agent]:
+    """
+    Borrow an agent from the pool of the current event loop, creating it if no agent is idle.
+
+    The agent goes back to the pool when the block finishes. If the block raises, the agent is
+    dropped, so a failed run never leaves its state to the next one.
+
+    Args:
+        agent_class (Type[Agent]): The agent type, e.g. SourceAgent
+        *args: The arguments of the agent constructor; agents are only reused for the same arguments
+
+    Yields:
+        Agent: The agent, for the exclusive use of the caller
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        yield agent_class(*args)
+        return
+
+    idle = _pools.setdefault(loop, {}).setdefault((agent_class, args), [])
+    agent = idle.pop() if idle else agent_class(*args)
+    yield agent
+
+    _reset_agent(agent)
+    if len(idle) < MAX_IDLE_AGENTS:
+        idle.append(agent)
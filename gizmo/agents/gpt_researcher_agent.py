@@ -3,14 +3,22 @@ GPT Researcher Agent for Gizmo.
 
 This module defines the GPT Researcher Agent, which is responsible for using
 the gpt-researcher library to produce comprehensive research on a topic.
+The pages GPT Researcher scrapes go through Gizmo's page cache, so pages already
+fetched by earlier steps or by the agents are not downloaded again.
 """
+import asyncio
+import functools
 import os
 from typing import List
 
 from gpt_researcher import GPTResearcher
+from gpt_researcher.scraper.scraper import Scraper
 
+from gizmo.tools.page_cache import get_cached_page, revalidate_page, store_page
 from gizmo.utils.error_utils import retry, logger
 from gizmo.utils.file_utils import write_file
+from gizmo.utils.metrics_utils import UsageAccumulator
+from gizmo.utils.stream_utils import PartialFile, ProgressCallback, ReportStreamWriter
 
 
 class GPTResearcherError(Exception):
@@ -18,6 +26,43 @@ class GPTResearcherError(Exception):
     pass
 
 
+def _cached_extract_data_from_url(extract_data_from_url):
+    """
+    Wrap GPT Researcher's page scraping so that it goes through the page cache.
+
+    Args:
+        extract_data_from_url (Callable): The `Scraper.extract_data_from_url` method
+
+    Returns:
+        Callable: The wrapped method
+    """
+    @functools.wraps(extract_data_from_url)
+    async def wrapper(self, link, session):
+        page, fresh = get_cached_page(link)
+        if page is not None and not fresh:
+            fresh = await asyncio.get_running_loop().run_in_executor(None, revalidate_page, link, page, session)
+        if page is not None and fresh:
+            logger.info(f"Using cached page {link}")
+            return {"url": link, "raw_content": page["content"], "image_urls": page["image_urls"],
+                    "title": page["title"]}
+
+        result = await extract_data_from_url(self, link, session)
+        if result.get("raw_content"):
+            store_page(link, result["raw_content"], result.get("title"), result.get("image_urls"))
+        return result
+
+    wrapper.uses_page_cache = True
+    return wrapper
+
+
+def _install_page_cache():
+    """
+    Make GPT Researcher's scrapers use the page cache. Installing it again has no effect.
+    """
+    if not getattr(Scraper.extract_data_from_url, "uses_page_cache", False):
+        Scraper.extract_data_from_url = _cached_extract_data_from_url(Scraper.extract_data_from_url)
+
+
 @retry(max_attempts=2, delay=1.0)
 async def run_gpt_researcher_agent(
     topic: str, 
@@ -26,7 +71,10 @@ async def run_gpt_researcher_agent(
     plan: str, 
     previous_steps_summaries: List[str]=None,
     initial_query: str=None,
-    source_urls: List[str]=None
+    source_urls: List[str]=None,
+    usage_accumulator: UsageAccumulator=None,
+    stream: bool=False,
+    progress_callback: ProgressCallback=None
 ) -> str:
     """
     Run the GPT Researcher Agent for a step.
@@ -40,6 +88,9 @@ async def run_gpt_researcher_agent(
                                              Each item is a formatted summary of a previous step.
         initial_query (str): The initial query of the research
         source_urls (List[str]): List of URLs to use as sources for the research
+        usage_accumulator (UsageAccumulator): Accumulator to record the costs of this GPT Researcher instance in
+        stream (bool): Whether to write the report to its file while it is generated
+        progress_callback (ProgressCallback): Called as the streamed file grows
 
     Returns:
         str: The research report
@@ -72,21 +123,37 @@ async def run_gpt_researcher_agent(
         </researchPlan>
     """
 
+    # Stream the report through GPT Researcher's websocket interface if requested
+    step_result_file = os.path.join(output_dir, f"step{step_number}.md")
+    partial_file = PartialFile(step_result_file, progress_callback) if stream else None
+
+    _install_page_cache()
+
     # Initialize the researcher with source URLs if available
     researcher = GPTResearcher(
         query=query, 
         report_type="deep", 
         context=context,
-        source_urls=source_urls or []
+        source_urls=source_urls or [],
+        websocket=ReportStreamWriter(partial_file) if partial_file else None
     )
     
     # Join the list into a string for compatibility with GPTResearcher
-    report = await researcher.write_report(relevant_written_contents=previous_steps_summaries or [])
+    try:
+        report = await researcher.write_report(relevant_written_contents=previous_steps_summaries or [])
+    except BaseException:
+        if partial_file:
+            partial_file.discard()
+        raise
     research_costs = researcher.get_costs()
 
-    step_result_file = os.path.join(output_dir, f"step{step_number}.md")
-    write_file(step_result_file, report)
+    if partial_file:
+        partial_file.commit(report)
+    else:
+        write_file(step_result_file, report)
 
     logger.info(f"GPT Researcher costs: {research_costs:.4f}$")
+    if usage_accumulator is not None:
+        usage_accumulator.record_cost(research_costs)
 
     return report
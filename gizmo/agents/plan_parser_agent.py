@@ -2,24 +2,106 @@
 Plan Parser Agent for Gizmo.
 
 This agent reads a plan.md file and produces a structured JSON output that can be used for iteration.
+Most plans are numbered lists that can be read without a model, so the plan is parsed deterministically
+first, and the agent is only used for plans that cannot be read that way. The results of the agent are
+cached by the hash of the plan.
 """
-from typing import List
+import asyncio
+import os
+from typing import List, Optional
 
 from agno.agent import Agent
-from agno.models.openai import OpenAIChat
 from pydantic import BaseModel, Field
 
+from gizmo.agents.agent_pool import pooled_agent
+from gizmo.utils.cache_utils import DiskCache, TieredCache, hash_key
+from gizmo.utils.client_utils import create_model
 from gizmo.utils.error_utils import retry, handle_agent_error, logger
+from gizmo.utils.file_utils import parse_plan_dependencies, parse_plan_file
+
+# Maximum total size of the parsed plans kept in memory, in bytes
+MEMORY_CACHE_SIZE = 4 * 1024 * 1024
+
+# File name of the parsed plan cache in the cache directory
+PLAN_CACHE_FILE = "parsed_plans.sqlite"
+
+# Plans parsed by the agent, by plan hash
+_plan_cache = TieredCache(MEMORY_CACHE_SIZE)
 
 
 class Step(BaseModel):
     step: int = Field(..., description="The step number.")
     topic: str = Field(..., description="The topic of the step: what topic is going to be researched.")
+    depends_on: List[int] = Field(
+        default_factory=list,
+        description="The numbers of the earlier steps whose findings this step builds on. "
+                    "Empty if the step can be researched independently."
+    )
 
 class Plan(BaseModel):
     steps: List[Step]
 
 
+def set_plan_cache_dir(cache_dir: Optional[str]):
+    """
+    Enable or disable the on-disk layer of the parsed plan cache.
+
+    Args:
+        cache_dir (Optional[str]): Directory of the cache, or None to only cache in memory
+    """
+    _plan_cache.disk_cache = DiskCache(os.path.join(cache_dir, PLAN_CACHE_FILE), ttl=None) if cache_dir else None
+
+
+def parse_plan_steps(plan_path: str, require_dependencies: bool = False) -> Optional[List[Step]]:
+    """
+    Parse a plan file without a model, from its JSON sidecar or its numbered list.
+
+    Args:
+        plan_path (str): Path to the plan file
+        require_dependencies (bool, optional): Whether the step dependencies are needed. They can only be
+                                               read from the JSON sidecar. Defaults to False.
+
+    Returns:
+        Optional[List[Step]]: The steps, or None if the plan has to be parsed by the agent
+    """
+    if require_dependencies and not parse_plan_dependencies(plan_path):
+        return None
+    try:
+        topics = parse_plan_file(plan_path)
+    except ValueError:
+        return None
+    return [Step(step=number, topic=topic) for number, topic in enumerate(topics, start=1)]
+
+
+def get_cached_plan(plan_hash: str, require_dependencies: bool = False) -> Optional[List[Step]]:
+    """
+    Get the steps of a plan the agent already parsed.
+
+    Args:
+        plan_hash (str): Hash of the plan, see `hash_text`
+        require_dependencies (bool, optional): Whether the step dependencies are needed. Defaults to False.
+
+    Returns:
+        Optional[List[Step]]: The steps, or None if the plan is not cached
+    """
+    steps = _plan_cache.get(hash_key({"plan": plan_hash, "dependencies": require_dependencies}))
+    return [Step(**step) for step in steps] if steps is not None else None
+
+
+def cache_plan(plan_hash: str, steps: List[Step], require_dependencies: bool = False):
+    """
+    Cache the steps of a plan parsed by the agent.
+
+    Args:
+        plan_hash (str): Hash of the plan, see `hash_text`
+        steps (List[Step]): The parsed steps
+        require_dependencies (bool, optional): Whether the steps were parsed with their dependencies.
+                                               Defaults to False.
+    """
+    _plan_cache.set(hash_key({"plan": plan_hash, "dependencies": require_dependencies}),
+                    [step.model_dump() for step in steps])
+
+
 class PlanParserAgent(Agent):
     def __init__(self):
         """
@@ -43,6 +125,8 @@ class PlanParserAgent(Agent):
         4. Ensure logical ordering and consistent tone across all steps.
         5. Do not return JSON or unstructured text—return only the formatted Markdown plan.
         6. Strictly adhere to the number of steps: it should not change, don't add or subtract any steps.
+        7. For each step, list the numbers of the earlier steps whose findings it directly builds on. 
+           Leave the list empty if the step can be researched without the results of other steps.
         """
 
         expected_output = """
@@ -56,7 +140,7 @@ class PlanParserAgent(Agent):
         super().__init__(
             name="PlanParser",
             role="Plan Parser",
-            model=OpenAIChat(id="gpt-4o"),  # use GPT-4 for superior reasoning
+            model=create_model("gpt-4o"),  # use GPT-4 for superior reasoning
             description=description,
             instructions=instructions,
             expected_output=expected_output,
@@ -66,9 +150,9 @@ class PlanParserAgent(Agent):
 
 
 @retry(max_attempts=2, delay=1.0)
-def run_plan_parser_agent(plan):
+async def arun_plan_parser_agent(plan):
     """
-    Run the Plan Parser Agent to read the .md plan.
+    Run the Plan Parser Agent to read the .md plan asynchronously.
 
     Args:
         plan (str): Research plan
@@ -80,11 +164,24 @@ def run_plan_parser_agent(plan):
         Exception: If the plan parsing fails after retries
     """
     try:
-        # Create the plan parser agent
-        parser_agent = PlanParserAgent()
-
         logger.info("Parsing research plan...")
-        # Run the plan parser agent to get the structured output
-        return parser_agent.run(plan)
+        # Run a plan parser agent from the pool to get the structured output
+        with pooled_agent(PlanParserAgent) as parser_agent:
+            return await parser_agent.arun(plan)
     except Exception as e:
-        return handle_agent_error("PlanParser", 0, e)
\ No newline at end of file
+        return handle_agent_error("PlanParser", 0, e)
+
+
+def run_plan_parser_agent(plan):
+    """
+    Run the Plan Parser Agent to read the .md plan.
+
+    This is a blocking wrapper around arun_plan_parser_agent for callers without an event loop.
+
+    Args:
+        plan (str): Research plan
+
+    Returns:
+        Plan: The parsed plan
+    """
+    return asyncio.run(arun_plan_parser_agent(plan))
@@ -6,10 +6,14 @@ that guide the research process. It ensures that the research covers the topic c
 web tools to inform the structure and content of the plan.
 """
 
+import asyncio
+
 from agno.agent import Agent
-from agno.models.openai import OpenAIChat
 from agno.tools.duckduckgo import DuckDuckGoTools
 
+from gizmo.agents.agent_pool import pooled_agent
+from gizmo.tools.search_cache import with_search_cache
+from gizmo.utils.client_utils import create_model
 from gizmo.utils.error_utils import retry, handle_agent_error, logger
 from gizmo.utils.file_utils import read_file, write_file
 
@@ -25,7 +29,7 @@ DEFAULT_SIZE = "small"
 
 def _build_tools():
     """Build the tools for the Planning Agent."""
-    return [DuckDuckGoTools()]
+    return [with_search_cache(DuckDuckGoTools())]
 
 
 class PlanningAgent(Agent):
@@ -77,7 +81,7 @@ class PlanningAgent(Agent):
         super().__init__(
             name="Planning",
             role="Research Planner",
-            model=OpenAIChat(id="gpt-4o"),  # use GPT-4 for superior reasoning
+            model=create_model("gpt-4o"),  # use GPT-4 for superior reasoning
             tools=_build_tools(),
             description=description,
             instructions=instructions,
@@ -87,9 +91,9 @@ class PlanningAgent(Agent):
 
 
 @retry(max_attempts=2, delay=1.0)
-def run_planning_agent(input_prompt, output_plan_path, is_file=True, size=None):
+async def arun_planning_agent(input_prompt, output_plan_path, is_file=True, size=None):
     """
-    Run the Planning Agent to generate a research plan.
+    Run the Planning Agent to generate a research plan asynchronously.
 
     Args:
         input_prompt (str): The user's input prompt or path to a file containing the prompt
@@ -112,12 +116,10 @@ def run_planning_agent(input_prompt, output_plan_path, is_file=True, size=None):
             # Use the input directly as the prompt
             user_prompt = input_prompt
 
-        # Create the planning agent
-        plan_agent = PlanningAgent(size)
-
         logger.info("Generating research plan...")
-        # Run the planning agent to get the plan
-        plan_markdown = plan_agent.run(user_prompt).content
+        # Run a planning agent from the pool to get the plan
+        with pooled_agent(PlanningAgent, size) as plan_agent:
+            plan_markdown = (await plan_agent.arun(user_prompt)).content
 
         # Write the Markdown plan to the output file
         write_file(output_plan_path, plan_markdown)
@@ -125,3 +127,21 @@ def run_planning_agent(input_prompt, output_plan_path, is_file=True, size=None):
         return plan_markdown
     except Exception as e:
         return handle_agent_error("Planning", 0, e)
+
+
+def run_planning_agent(input_prompt, output_plan_path, is_file=True, size=None):
+    """
+    Run the Planning Agent to generate a research plan.
+
+    This is a blocking wrapper around arun_planning_agent for callers without an event loop.
+
+    Args:
+        input_prompt (str): The user's input prompt or path to a file containing the prompt
+        output_plan_path (str): Path to save the generated plan
+        is_file (bool, optional): Whether input_prompt is a file path. Defaults to True.
+        size (str, optional): Size of the research plan ("small", "medium", "large"). Defaults to None.
+
+    Returns:
+        str: The generated plan
+    """
+    return asyncio.run(arun_planning_agent(input_prompt, output_plan_path, is_file, size))
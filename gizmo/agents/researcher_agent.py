@@ -5,20 +5,29 @@ This module defines the Researcher Agent, which is responsible for taking
 the raw info from the source agent and producing an in-depth analysis or
 explanation for that step.
 """
+import asyncio
 import os
 
 from agno.agent import Agent
-from agno.models.openai import OpenAIChat
 from agno.tools.arxiv import ArxivTools
 from agno.tools.duckduckgo import DuckDuckGoTools
 
+from gizmo.agents.agent_pool import pooled_agent
+from gizmo.tools.page_cache import WebPageToolkit
 from gizmo.tools.research_toolkit import ResearchContextToolkit
+from gizmo.tools.search_cache import with_search_cache
+from gizmo.utils.client_utils import create_model
+from gizmo.utils.context_utils import ContextBuilder, select_plan_entries, select_relevant_passages
 from gizmo.utils.error_utils import retry, handle_agent_error
 from gizmo.utils.file_utils import read_file, write_file
+from gizmo.utils.stream_utils import astream_agent
+
+# Default maximum number of tokens of the researcher input
+CONTEXT_BUDGET = 6000
 
 
 def _build_tools(output_dir, memory_dir):
-    tools = [DuckDuckGoTools(), ArxivTools()]
+    tools = [with_search_cache(DuckDuckGoTools()), with_search_cache(ArxivTools()), WebPageToolkit()]
 
     # Add research toolkit if directories are provided
     if output_dir and memory_dir:
@@ -52,10 +61,10 @@ class ResearcherAgent(Agent):
             You are a research analyst assigned to conduct thorough investigations based on user queries or topics. Follow these steps for every task:
 
                 1. Understand the user's question or topic. Clarify ambiguities before proceeding.
-                2. Search for relevant information using the DuckDuckGo search tool if the links provided in the initial prompt are not enough.
+                2. Search for relevant information using the DuckDuckGo search tool if the links provided in the initial prompt are not enough. Use the read_web_page tool to read the pages behind the most relevant links.
                 3. Read articles on Arxiv if the data found already is not enough and you need scientific knowledge.
                 4. Review provided research plan and incorporate it into your strategy.
-                5. If you find any related topics in the research plan, use the ResearchToolkit to access previously stored results or ongoing project data.
+                5. If you find any related topics in the research plan, use the ResearchToolkit to access previously stored results or ongoing project data. Its search_research tool returns the most relevant passages of previous results, analyses and summaries in one call; pass a query to get_previous_step_result to read only the relevant parts of a step.
                 6. Collect and evaluate all information critically, checking sources and consistency.
                 7. Structure your findings logically, using clear headings and bullet points where needed.
                 8. Provide factual, unbiased, and in-depth explanations.
@@ -79,7 +88,7 @@ class ResearcherAgent(Agent):
         super().__init__(
             name="Researcher",
             role="Analyst",
-            model=OpenAIChat(id="gpt-4o"),  # we need an advanced reasoning model for this task
+            model=create_model("gpt-4o"),  # we need an advanced reasoning model for this task
             tools=_build_tools(output_dir, memory_dir),
             description=description,
             instructions=instructions,
@@ -88,9 +97,15 @@ class ResearcherAgent(Agent):
         )
 
 @retry(max_attempts=2, delay=1.0)
-def run_researcher_agent(step, search_results, step_number, memory_dir, output_dir, plan_path, initial_query=None):
+async def arun_researcher_agent(step, search_results, step_number, memory_dir, output_dir, plan_path, initial_query=None,
+                                previous_steps_summaries=None, stream_path=None, progress_callback=None,
+                                context_budget=None):
     """
-    Run the Researcher Agent for a step.
+    Run the Researcher Agent for a step asynchronously.
+
+    The input of the researcher is limited to a token budget: only the plan entries around the step
+    are included, and the reference information and previous findings are cut down to the passages
+    most relevant to the step if they do not fit.
 
     Args:
         step (str): The step description
@@ -100,6 +115,10 @@ def run_researcher_agent(step, search_results, step_number, memory_dir, output_d
         output_dir (str): Directory containing the output files
         plan_path (str): Path to the plan
         initial_query (str, optional): Initial query of the research
+        previous_steps_summaries (list, optional): Formatted summaries of the steps this step builds on
+        stream_path (str, optional): File to stream the analysis to while it is generated
+        progress_callback (callable, optional): Called as the streamed file grows, see `stream_utils.ProgressCallback`
+        context_budget (int, optional): Maximum number of tokens of the researcher input. Defaults to CONTEXT_BUDGET.
 
     Returns:
         RunResponse: The analysis
@@ -109,24 +128,29 @@ def run_researcher_agent(step, search_results, step_number, memory_dir, output_d
     """
     try:
         plan = read_file(plan_path)
-        # Create the researcher agent with access to research toolkit
-        researcher = ResearcherAgent(output_dir, memory_dir)
         from gizmo.utils.error_utils import logger
 
-        # Prepare the input for the researcher
-        researcher_input = (
-            f"# Research Question\n\n{step}\n\n"
-            f"# Reference Information\n\n{search_results}\n\n"
-        )
+        # Prepare the input for the researcher within the token budget
+        def select_relevant(text, max_tokens):
+            return select_relevant_passages(text, step, max_tokens)
 
+        context = ContextBuilder(f"Researcher (step {step_number})", context_budget or CONTEXT_BUDGET)
+        context.add_section("Research Question", step, required=True)
+        context.add_section("Reference Information", search_results, weight=3, selector=select_relevant)
         if plan_path:
-            researcher_input += f"# General research plan\n\n{plan}\n\n"
-
-        if initial_query:
-            researcher_input += f"# Initial query\n\n{initial_query}\n\n"
-
-        # Run the researcher agent
-        response = researcher.run(researcher_input)
+            context.add_section("General research plan", select_plan_entries(plan, step_number))
+        context.add_section("Initial query", initial_query)
+        if previous_steps_summaries:
+            context.add_section("Findings of previous steps", "\n\n".join(previous_steps_summaries), weight=2,
+                                selector=select_relevant)
+        researcher_input = context.build()
+
+        # Run a researcher agent with access to the research toolkit from the pool
+        with pooled_agent(ResearcherAgent, output_dir, memory_dir) as researcher:
+            if stream_path:
+                response = await astream_agent(researcher, researcher_input, stream_path, progress_callback)
+            else:
+                response = await researcher.arun(researcher_input)
 
         # Save the analysis
         analysis_file = os.path.join(memory_dir, f"step{step_number}_analysis.md")
@@ -135,3 +159,32 @@ def run_researcher_agent(step, search_results, step_number, memory_dir, output_d
         return response
     except Exception as e:
         return handle_agent_error("Researcher", step_number, e, search_results)
+
+
+def run_researcher_agent(step, search_results, step_number, memory_dir, output_dir, plan_path, initial_query=None,
+                         previous_steps_summaries=None, stream_path=None, progress_callback=None, context_budget=None):
+    """
+    Run the Researcher Agent for a step.
+
+    This is a blocking wrapper around arun_researcher_agent for callers without an event loop.
+
+    Args:
+        step (str): The step description
+        search_results (str): The search results from the source agent
+        step_number (int): The step number
+        memory_dir (str): Directory to save intermediate files
+        output_dir (str): Directory containing the output files
+        plan_path (str): Path to the plan
+        initial_query (str, optional): Initial query of the research
+        previous_steps_summaries (list, optional): Formatted summaries of the steps this step builds on
+        stream_path (str, optional): File to stream the analysis to while it is generated
+        progress_callback (callable, optional): Called as the streamed file grows, see `stream_utils.ProgressCallback`
+        context_budget (int, optional): Maximum number of tokens of the researcher input. Defaults to CONTEXT_BUDGET.
+
+    Returns:
+        RunResponse: The analysis
+    """
+    return asyncio.run(
+        arun_researcher_agent(step, search_results, step_number, memory_dir, output_dir, plan_path, initial_query,
+                              previous_steps_summaries, stream_path, progress_callback, context_budget)
+    )
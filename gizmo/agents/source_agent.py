@@ -6,22 +6,31 @@ of relevant, diverse, and reliable sources, each accompanied by summaries and li
 enrich the research process with high-quality external content.
 """
 
+import asyncio
 import os
 
 from agno.agent import Agent
-from agno.models.openai import OpenAIChat
 from agno.run.response import RunResponse
 from agno.tools.arxiv import ArxivTools
 from agno.tools.duckduckgo import DuckDuckGoTools
 from agno.tools.googlesearch import GoogleSearchTools
 
+from gizmo.agents.agent_pool import pooled_agent
+from gizmo.tools.page_cache import WebPageToolkit
+from gizmo.tools.search_cache import with_search_cache
+from gizmo.utils.client_utils import create_model
 from gizmo.utils.error_utils import retry, handle_agent_error
 from gizmo.utils.file_utils import write_file
 
 
 def _build_tools():
     """Build the tools for the Source Agent."""
-    return [DuckDuckGoTools(), GoogleSearchTools(), ArxivTools()]
+    return [
+        with_search_cache(DuckDuckGoTools()),
+        with_search_cache(GoogleSearchTools()),
+        with_search_cache(ArxivTools()),
+        WebPageToolkit(),
+    ]
 
 
 class SourceAgent(Agent):
@@ -44,7 +53,7 @@ class SourceAgent(Agent):
 
         1. Interpret the research question or prompt carefully.
         2. Use the DuckDuckGo and Google Search tools to find the most relevant, reliable, and diverse sources.
-        3. Act like a crawler and explore a few more pages from each website you use as a source. Try to search related articles.
+        3. Act like a crawler and explore a few more pages from each website you use as a source, reading them with the read_web_page tool. Try to search related articles.
         4. If you think the topic could be highlighted in scientific literature, you can also search related articles of arxiv. Judge by the task if it is worth exploring.
         5. Summarize the key insights from each result using a short, informative snippet.
         6. Provide a clean, well-formatted Markdown list that includes:
@@ -71,7 +80,7 @@ class SourceAgent(Agent):
         super().__init__(
             name="Source",
             role="Web Searcher",
-            model=OpenAIChat(id="gpt-4o"),  # faster, cheaper model
+            model=create_model("gpt-4o"),  # faster, cheaper model
             tools=_build_tools(),
             description=description,
             instructions=instructions,
@@ -81,14 +90,16 @@ class SourceAgent(Agent):
 
 
 @retry(max_attempts=2, delay=1.0)
-def run_source_agent(step, step_number, memory_dir):
+async def arun_source_agent(step, step_number, memory_dir, known_sources=None):
     """
-    Run the Source Agent for a step.
+    Run the Source Agent for a step asynchronously.
 
     Args:
         step (str): The step description
         step_number (int): The step number
         memory_dir (str): Directory to save intermediate files
+        known_sources (str, optional): Sources found for a similar step, which the agent reuses where they fit
+                                       and extends with sources for the aspects they do not cover
 
     Returns:
         RunResponse: The search results
@@ -97,16 +108,20 @@ def run_source_agent(step, step_number, memory_dir):
         Exception: If the source agent fails after retries
     """
     try:
-        # Create the source agent
-        source = SourceAgent()
-
         # Formulate a search query from the step
         from gizmo.utils.file_utils import formulate_search_query
         from gizmo.utils.error_utils import logger
         query = formulate_search_query(step)
 
-        # Run the source agent
-        response = source.run(f"Research question: {query}")
+        source_input = f"Research question: {query}"
+        if known_sources:
+            source_input += ("\n\nSources already found for a similar research question. Keep the ones relevant to "
+                             "this question and search for sources on the aspects they do not cover:\n\n"
+                             + known_sources)
+
+        # Run a source agent from the pool
+        with pooled_agent(SourceAgent) as source:
+            response = await source.arun(source_input)
 
         # Save the search results
         search_file = os.path.join(memory_dir, f"step{step_number}_search.md")
@@ -115,3 +130,21 @@ def run_source_agent(step, step_number, memory_dir):
         return response
     except Exception as e:
         return handle_agent_error("Source", step_number, e)
+
+
+def run_source_agent(step, step_number, memory_dir, known_sources=None):
+    """
+    Run the Source Agent for a step.
+
+    This is a blocking wrapper around arun_source_agent for callers without an event loop.
+
+    Args:
+        step (str): The step description
+        step_number (int): The step number
+        memory_dir (str): Directory to save intermediate files
+        known_sources (str, optional): Sources found for a similar step
+
+    Returns:
+        RunResponse: The search results
+    """
+    return asyncio.run(arun_source_agent(step, step_number, memory_dir, known_sources))
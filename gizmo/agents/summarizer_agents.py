@@ -1,18 +1,34 @@
 """
 Summarizer Agents for Gizmo.
 
-This module defines two summarizer agents:
+This module defines four summarizer agents:
 1. Step Summarizer Agent - Produces a concise summary of each step's findings
-2. Final Summarizer Agent - Generates a final summary of the entire research project
+2. Group Summarizer Agent - Condenses the summaries of a group of steps for large plans
+3. Rolling Summarizer Agent - Folds newly finished steps into a summary of the research so far
+4. Final Summarizer Agent - Generates a final summary of the entire research project
+
+For large plans, the final summary is built hierarchically: groups of step summaries are condensed
+in parallel, and the condensed summaries are reduced in further rounds until they fit into a single
+final summarizer call.
 """
+import asyncio
 import os
 
 from agno.agent import Agent
-from agno.models.openai import OpenAIChat
 from agno.run.response import RunResponse
 
+from gizmo.agents.agent_pool import pooled_agent
+from gizmo.utils.client_utils import create_model
 from gizmo.utils.error_utils import retry, handle_agent_error
 from gizmo.utils.file_utils import write_file
+from gizmo.utils.stream_utils import astream_agent
+from gizmo.utils.token_utils import estimate_tokens, truncate_to_tokens
+
+# Maximum number of summaries combined in one summarizer call
+SUMMARY_GROUP_SIZE = 8
+
+# Maximum number of tokens of the summaries combined in one summarizer call
+SUMMARY_MAX_INPUT_TOKENS = 8000
 
 
 class StepSummarizerAgent(Agent):
@@ -54,7 +70,97 @@ class StepSummarizerAgent(Agent):
         super().__init__(
             name="Step Summarizer",
             role="Summarizer",
-            model=OpenAIChat(id="gpt-3.5-turbo"),  # efficient for summarization
+            model=create_model("gpt-3.5-turbo"),  # efficient for summarization
+            tools=[],  # no external tools needed
+            description=description,
+            instructions=instructions,
+            expected_output=expected_output,
+            markdown=True
+        )
+
+
+class GroupSummarizerAgent(Agent):
+    def __init__(self):
+        """
+        Create and configure the Group Summarizer Agent.
+
+        Returns:
+            Agent: The configured group summarizer agent
+        """
+
+        description = """
+        The Group Summarizer Agent condenses the summaries of a group of consecutive research steps into one intermediate summary. 
+        Its output is not read by the user but combined with the intermediate summaries of the other groups into the final summary, 
+        so it preserves every key finding, figure and conclusion while removing repetition.
+        """
+
+        instructions = """
+        You are an intermediate summarization agent working on one part of a large research project.
+
+        1. Review the step summaries provided; they cover consecutive steps of the research.
+        2. Merge them into a single summary of this part of the research.
+        3. Keep every key finding, number, date and conclusion, and mention which steps they come from.
+        4. Remove repetition and filler, but do not drop findings that seem minor.
+        5. Do not write an introduction or conclusion for the whole research; other parts are summarized separately.
+        """
+
+        expected_output = """
+        Your output should be a dense intermediate summary that:
+
+        - Covers all of the provided steps
+        - Preserves the key findings and facts with references to their steps
+        - Is considerably shorter than the combined input
+        """
+
+        super().__init__(
+            name="Group Summarizer",
+            role="Summarizer",
+            model=create_model("gpt-3.5-turbo"),  # efficient for summarization
+            tools=[],  # no external tools needed
+            description=description,
+            instructions=instructions,
+            expected_output=expected_output,
+            markdown=True
+        )
+
+
+class RollingSummarizerAgent(Agent):
+    def __init__(self):
+        """
+        Create and configure the Rolling Summarizer Agent.
+
+        Returns:
+            Agent: The configured rolling summarizer agent
+        """
+
+        description = """
+        The Rolling Summarizer Agent keeps a summary of a research project up to date while the research is still running. 
+        Whenever steps finish, it folds their summaries into the summary of the research so far, so that only the last 
+        steps remain to be merged once the research is complete.
+        """
+
+        instructions = """
+        You are a summarization agent maintaining the summary of an ongoing research project.
+
+        1. Review the summary of the research so far, if there is one, and the summaries of the newly finished steps.
+        2. Integrate the findings of the new steps into the summary, organized by theme rather than by step.
+        3. Keep every key finding, number, date and conclusion, and mention which steps they come from.
+        4. Merge overlapping findings and remove repetition, so the summary grows much slower than the research.
+        5. Do not write an introduction or conclusion; the summary is an intermediate result.
+        """
+
+        expected_output = """
+        Your output should be the updated summary of the research so far that:
+
+        - Covers all previously summarized and newly finished steps
+        - Preserves the key findings and facts with references to their steps
+        - Is organized by theme and free of repetition
+        """
+
+        super().__init__(
+            name="Rolling Summarizer",
+            role="Summarizer",
+            model=create_model("gpt-3.5-turbo"),  # efficient for summarization
             tools=[],  # no external tools needed
             description=description,
             instructions=instructions,
@@ -86,6 +192,7 @@ class FinalSummarizerAgent(Agent):
         3. Structure your summary into three parts: introduction, key findings, and conclusion.
         4. Use bullet points in the key findings section where helpful.
         5. Keep your summary clear and logically organized, with emphasis on clarity and cohesion.
+        6. If a summary of the research so far is provided, it covers the earlier steps; merge the remaining step summaries into it.
 
         Your goal is to convey a full picture of the research in a single, polished narrative.
         """
@@ -103,7 +210,7 @@ class FinalSummarizerAgent(Agent):
         super().__init__(
             name="Final Summarizer",
             role="Synthesizer",
-            model=OpenAIChat(id="gpt-4o"),  # better for synthesis across multiple topics
+            model=create_model("gpt-4o"),  # better for synthesis across multiple topics
             tools=[],  # no external tools needed
             description=description,
             instructions=instructions,
@@ -113,9 +220,9 @@ class FinalSummarizerAgent(Agent):
 
 
 @retry(max_attempts=2, delay=1.0)
-def run_step_summarizer_agent(polished_report, step_number, memory_dir):
+async def arun_step_summarizer_agent(polished_report, step_number, memory_dir):
     """
-    Run the Step Summarizer Agent for a step.
+    Run the Step Summarizer Agent for a step asynchronously.
 
     Args:
         polished_report (str): The polished report from the writer
@@ -129,12 +236,11 @@ def run_step_summarizer_agent(polished_report, step_number, memory_dir):
         Exception: If the step summarizer agent fails after retries
     """
     try:
-        # Create the step summarizer agent
-        summarizer = StepSummarizerAgent()
         from gizmo.utils.error_utils import logger
 
-        # Run the step summarizer agent
-        response = summarizer.run(polished_report)
+        # Run a step summarizer agent from the pool
+        with pooled_agent(StepSummarizerAgent) as summarizer:
+            response = await summarizer.arun(polished_report)
 
         # Save the summary
         summary_file = os.path.join(memory_dir, f"step{step_number}_summary.md")
@@ -148,14 +254,145 @@ def run_step_summarizer_agent(polished_report, step_number, memory_dir):
         return handle_agent_error("Step Summarizer", step_number, e, fallback)
 
 
+def run_step_summarizer_agent(polished_report, step_number, memory_dir):
+    """
+    Run the Step Summarizer Agent for a step.
+
+    This is a blocking wrapper around arun_step_summarizer_agent for callers without an event loop.
+
+    Args:
+        polished_report (str): The polished report from the writer
+        step_number (int): The step number
+        memory_dir (str): Directory to save intermediate files
+
+    Returns:
+        RunResponse: The summary
+    """
+    return asyncio.run(arun_step_summarizer_agent(polished_report, step_number, memory_dir))
+
+
+def group_summaries(summaries, group_size=SUMMARY_GROUP_SIZE, max_input_tokens=SUMMARY_MAX_INPUT_TOKENS):
+    """
+    Split summaries into consecutive groups that each fit into one summarizer call.
+
+    Args:
+        summaries (list): The summaries, in order
+        group_size (int, optional): Maximum number of summaries per group
+        max_input_tokens (int, optional): Maximum number of tokens per group
+
+    Returns:
+        list: The groups, each a list of summaries
+    """
+    groups, group, group_tokens = [], [], 0
+    for summary in summaries:
+        tokens = estimate_tokens(summary)
+        if group and (len(group) >= group_size or group_tokens + tokens > max_input_tokens):
+            groups.append(group)
+            group, group_tokens = [], 0
+        group.append(summary)
+        group_tokens += tokens
+    if group:
+        groups.append(group)
+    return groups
+
+
 @retry(max_attempts=2, delay=1.0)
-def run_final_summarizer_agent(step_summaries, output_dir):
+async def arun_group_summarizer_agent(summaries, label):
     """
-    Run the Final Summarizer Agent.
+    Run the Group Summarizer Agent for a group of summaries asynchronously.
+
+    Args:
+        summaries (list): The summaries of the group
+        label (str): Heading describing the part of the research the group covers
+
+    Returns:
+        RunResponse: The intermediate summary
+    """
+    with pooled_agent(GroupSummarizerAgent) as summarizer:
+        response = await summarizer.arun("# Research Step Summaries\n\n" + "\n\n".join(summaries))
+    response.content = f"## {label}\n\n{response.content}"
+    return response
+
+
+async def areduce_summaries(step_summaries, group_size=SUMMARY_GROUP_SIZE, max_input_tokens=SUMMARY_MAX_INPUT_TOKENS):
+    """
+    Condense step summaries until they fit into one summarizer call.
+
+    Every round summarizes groups of consecutive summaries in parallel, so the number of rounds
+    grows logarithmically with the number of steps.
 
     Args:
-        step_summaries (list): List of step summaries
+        step_summaries (list): The formatted step summaries, in plan order
+        group_size (int, optional): Maximum number of summaries per summarizer call
+        max_input_tokens (int, optional): Maximum number of tokens per summarizer call
+
+    Returns:
+        list: Summaries that fit into a single summarizer call
+    """
+    from gizmo.utils.error_utils import logger
+
+    group_size = max(2, group_size)
+    # A single summary may take at most half of a call, so every group combines at least two of them
+    summaries = [truncate_to_tokens(summary, max_input_tokens // 2) for summary in step_summaries]
+    # Step range covered by every summary, as positions in the plan
+    ranges = [(index, index) for index in range(1, len(summaries) + 1)]
+
+    level = 0
+    while len(summaries) > group_size or estimate_tokens("\n\n".join(summaries)) > max_input_tokens:
+        level += 1
+        groups = group_summaries(summaries, group_size, max_input_tokens)
+        group_ranges, start = [], 0
+        for group in groups:
+            group_ranges.append((ranges[start][0], ranges[start + len(group) - 1][1]))
+            start += len(group)
+
+        logger.info(f"Condensing {len(summaries)} summaries into {len(groups)} (round {level})")
+        responses = await asyncio.gather(*(
+            arun_group_summarizer_agent(group, f"Steps {first}-{last}")
+            for group, (first, last) in zip(groups, group_ranges)
+        ))
+        summaries = [truncate_to_tokens(response.content, max_input_tokens // 2) for response in responses]
+        ranges = group_ranges
+
+    return summaries
+
+
+@retry(max_attempts=2, delay=1.0)
+async def arun_rolling_summarizer_agent(summary_so_far, new_summaries, memory_dir):
+    """
+    Run the Rolling Summarizer Agent to fold newly finished steps into the summary so far.
+
+    Args:
+        summary_so_far (str): The summary of the research so far, or None for the first steps
+        new_summaries (list): The formatted summaries of the newly finished steps
+        memory_dir (str): Directory to save intermediate files
+
+    Returns:
+        RunResponse: The updated summary so far
+    """
+    summarizer_input = ""
+    if summary_so_far:
+        summarizer_input += f"# Research Summary So Far\n\n{summary_so_far}\n\n"
+    summarizer_input += "# Newly Finished Research Step Summaries\n\n" + "\n\n".join(new_summaries)
+
+    with pooled_agent(RollingSummarizerAgent) as summarizer:
+        response = await summarizer.arun(summarizer_input)
+    write_file(os.path.join(memory_dir, "summary_so_far.md"), response.content)
+    return response
+
+
+@retry(max_attempts=2, delay=1.0)
+async def arun_final_summarizer_agent(step_summaries, output_dir, stream=False, progress_callback=None,
+                                      summary_so_far=None):
+    """
+    Run the Final Summarizer Agent asynchronously.
+
+    Args:
+        step_summaries (list): List of step summaries, or only those not covered by summary_so_far
         output_dir (str): Directory to save output files
+        stream (bool, optional): Whether to write the summary to its file while it is generated. Defaults to False.
+        progress_callback (callable, optional): Called as the streamed file grows, see `stream_utils.ProgressCallback`
+        summary_so_far (str, optional): Summary of the research so far maintained by the Rolling Summarizer Agent
 
     Returns:
         str: The final summary
@@ -164,23 +401,48 @@ def run_final_summarizer_agent(step_summaries, output_dir):
         Exception: If the final summarizer agent fails after retries
     """
     try:
-        # Create the final summarizer agent
-        summarizer = FinalSummarizerAgent()
         from gizmo.utils.error_utils import logger
 
-        # Prepare the input for the final summarizer
-        summarizer_input = "# Research Step Summaries\n\n" + "\n\n".join(step_summaries)
-
-        # Run the final summarizer agent
-        response = summarizer.run(summarizer_input)
+        # Condense the step summaries of large plans, then prepare the input for the final summarizer
+        summaries = await areduce_summaries(step_summaries)
+        summarizer_input = "# Research Step Summaries\n\n" + "\n\n".join(summaries)
+        if summary_so_far:
+            summarizer_input = f"# Research Summary So Far\n\n{summary_so_far}\n\n" + (
+                "# Remaining " + summarizer_input if summaries else "")
 
-        # Save the final summary
+        # Run a final summarizer agent from the pool and save the final summary
         summary_file = os.path.join(output_dir, "summary_final.md")
-        write_file(summary_file, response.content)
+        with pooled_agent(FinalSummarizerAgent) as summarizer:
+            if stream:
+                response = await astream_agent(summarizer, summarizer_input, summary_file, progress_callback)
+            else:
+                response = await summarizer.arun(summarizer_input)
+        if not stream:
+            write_file(summary_file, response.content)
 
         return response
     except Exception as e:
         # Generate a simple summary as fallback
-        fallback = "# Research Summary\n\n" + "\n\n".join(step_summaries)
+        fallback = "# Research Summary\n\n" + "\n\n".join(([summary_so_far] if summary_so_far else []) + step_summaries)
         write_file(os.path.join(output_dir, "summary_final.md"), fallback)
         return handle_agent_error("Final Summarizer", 0, e, fallback)
+
+
+def run_final_summarizer_agent(step_summaries, output_dir, stream=False, progress_callback=None, summary_so_far=None):
+    """
+    Run the Final Summarizer Agent.
+
+    This is a blocking wrapper around arun_final_summarizer_agent for callers without an event loop.
+
+    Args:
+        step_summaries (list): List of step summaries, or only those not covered by summary_so_far
+        output_dir (str): Directory to save output files
+        stream (bool, optional): Whether to write the summary to its file while it is generated. Defaults to False.
+        progress_callback (callable, optional): Called as the streamed file grows, see `stream_utils.ProgressCallback`
+        summary_so_far (str, optional): Summary of the research so far maintained by the Rolling Summarizer Agent
+
+    Returns:
+        str: The final summary
+    """
+    return asyncio.run(arun_final_summarizer_agent(step_summaries, output_dir, stream, progress_callback,
+                                                   summary_so_far))
@@ -5,11 +5,13 @@ This module defines the Writer Agent, which takes the researcher's output and re
 for clarity, coherence, structure, and readability. It ensures technical content is presented cleanly
 and professionally without altering meaning or facts.
 """
+import asyncio
 import os
 
 from agno.agent import Agent
-from agno.models.openai import OpenAIChat
 
+from gizmo.agents.agent_pool import pooled_agent
+from gizmo.utils.client_utils import create_model
 from gizmo.utils.error_utils import retry, handle_agent_error
 from gizmo.utils.file_utils import write_file
 
@@ -57,7 +59,7 @@ class WriterAgent(Agent):
         super().__init__(
             name="Writer",
             role="Refiner",
-            model=OpenAIChat(id="gpt-3.5-turbo"),  # language polish model
+            model=create_model("gpt-3.5-turbo"),  # language polish model
             tools=[],  # no external tools needed
             description=description,
             instructions=instructions,
@@ -67,9 +69,9 @@ class WriterAgent(Agent):
 
 
 @retry(max_attempts=2, delay=1.0)
-def run_writer_agent(analysis, step_number, output_dir):
+async def arun_writer_agent(analysis, step_number, output_dir):
     """
-    Run the Writer Agent for a step.
+    Run the Writer Agent for a step asynchronously.
 
     Args:
         analysis (str): The analysis from the researcher
@@ -83,12 +85,11 @@ def run_writer_agent(analysis, step_number, output_dir):
         Exception: If the writer agent fails after retries
     """
     try:
-        # Create the writer agent
-        writer = WriterAgent()
         from gizmo.utils.error_utils import logger
 
-        # Run the writer agent
-        response = writer.run(analysis)
+        # Run a writer agent from the pool
+        with pooled_agent(WriterAgent) as writer:
+            response = await writer.arun(analysis)
 
         # Save the polished report
         report_file = os.path.join(output_dir, f"step{step_number}.md")
@@ -99,3 +100,20 @@ def run_writer_agent(analysis, step_number, output_dir):
         fallback = analysis  # Use the researcher's analysis as fallback
         write_file(os.path.join(output_dir, f"step{step_number}.md"), fallback)
         return handle_agent_error("Writer", step_number, e, fallback)
+
+
+def run_writer_agent(analysis, step_number, output_dir):
+    """
+    Run the Writer Agent for a step.
+
+    This is a blocking wrapper around arun_writer_agent for callers without an event loop.
+
+    Args:
+        analysis (str): The analysis from the researcher
+        step_number (int): The step number
+        output_dir (str): Directory to save output files
+
+    Returns:
+        str: The polished report
+    """
+    return asyncio.run(arun_writer_agent(analysis, step_number, output_dir))
@@ -5,10 +5,15 @@ Gizmo CLI - A research assistant powered by Agno framework.
 This module provides the command-line interface for Gizmo, allowing users to:
 1. Generate a research plan from a prompt
 2. Execute a research workflow based on a plan
+3. Execute the research workflows of many plans in one process
+4. Execute research steps from a work queue as a worker
 
 Usage:
     gizmo plan [-i <input_file> | -p <prompt>] [-s <size>] [-o <output_path>]
-    gizmo research [-p <plan_file>] [-o <output_dir>] [--deep]
+    gizmo research [-p <plan_file>] [-o <output_dir>] [--deep] [--concurrency <n>] [--pipeline] [--resume] [--dag] [--deep-concurrency <n>] [--queue <queue_file>]
+                   [--incremental] [--stream] [--rolling-summary] [--context-budget <tokens>]
+    gizmo batch -f <batch_file> [--max-projects <n>] [--max-steps <n>] [--rate-limit <rpm>] [--resume] [--dag]
+    gizmo worker -q <queue_file> [-c <n>] [--exit-when-idle]
 
 Note: For the plan command, either -i or -p must be provided.
       The -s option allows specifying the size of the research plan: small (1-10 steps), 
@@ -18,6 +23,30 @@ Note: For the plan command, either -i or -p must be provided.
       For the research command, if -p is not provided, it looks for the plan in './output/plan.md' by default.
       The --deep flag enables deep research using GPT Researcher, which produces more comprehensive
       research for each step instead of using the standard multi-agent approach.
+      The --concurrency option sets how many independent steps are researched in parallel (default: 1).
+      The --pipeline flag runs the source search, research and summary of the steps as separate stages,
+      so the search for the next step overlaps with the research of the current one. The number of workers
+      of each stage is set with --source-workers, --research-workers and --summary-workers (default: 1).
+      The --resume flag continues an interrupted run of the same plan, skipping the steps it already completed.
+      The --incremental flag reuses the unchanged steps of the previous run after the plan was edited, so only
+      added and changed steps are researched again.
+      The --stream flag writes the step reports and the final summary to '.partial' files while they are
+      generated, and renames them to their final names once they are complete.
+      The --rolling-summary flag keeps a summary of the research so far up to date in the memory directory
+      while the steps run, so the final summary only has to merge the last steps into it.
+      The --context-budget option limits the tokens of the researcher input of each step (default: 6000). Only
+      the plan entries around the step and the most relevant source passages are kept within it.
+      The --dag flag schedules the steps by their declared dependencies: a step starts as soon as the steps
+      it depends on are finished, and only their summaries are used as context.
+      The --deep-concurrency option limits how many GPT Researcher instances run at once in deep mode.
+      The batch command runs all projects of a JSON batch file, a list of {"plan": ..., "output": ...}
+      entries, in one process. --max-projects limits the projects researched in parallel (default: 2),
+      --max-steps the steps in progress across all projects and --rate-limit the OpenAI requests per minute.
+      With --queue, the research command enqueues the steps into a work queue (a SQLite file) and waits
+      for worker processes, started with the worker command on any machine sharing the filesystem,
+      to execute them. It then writes the final summary.
+      All commands accept --cache-dir <dir>, which caches the model responses and web search results on disk,
+      so repeated identical requests (retries, resumed runs, reruns of similar plans) cost no tokens.
 """
 
 import argparse
@@ -25,7 +54,7 @@ import asyncio
 import os
 import sys
 
-from gizmo.workflows.workflow import run_plan, run_research
+from gizmo.workflows.workflow import run_plan, run_research, run_batch, run_worker, set_cache_dir
 
 
 def setup_parser():
@@ -57,6 +86,9 @@ def setup_parser():
     plan_parser.add_argument(
         "-k", "--api-key", help="OpenAI API key (overrides OPENAI_API_KEY environment variable)"
     )
+    plan_parser.add_argument(
+        "--cache-dir", help="Directory for caching model responses and search results on disk (default: no caching)"
+    )
 
     # Research command
     research_parser = subparsers.add_parser(
@@ -74,12 +106,128 @@ def setup_parser():
     research_parser.add_argument(
         "-k", "--api-key", help="OpenAI API key (overrides OPENAI_API_KEY environment variable)"
     )
+    research_parser.add_argument(
+        "--cache-dir", help="Directory for caching model responses and search results on disk (default: no caching)"
+    )
     research_parser.add_argument(
         "--deep", action="store_true", help="Use GPT Researcher for deep research"
     )
     research_parser.add_argument(
         "--initial-input", help="Path to a file containing initial input for the research"
     )
+    research_parser.add_argument(
+        "-c", "--concurrency", type=int, default=1,
+        help="Maximum number of research steps executed in parallel (default: 1)"
+    )
+    research_parser.add_argument(
+        "--pipeline", action="store_true",
+        help="Run the source search, research and summary of the steps as overlapping pipeline stages"
+    )
+    research_parser.add_argument(
+        "--source-workers", type=int, default=1,
+        help="Number of source search workers in pipeline mode (default: 1)"
+    )
+    research_parser.add_argument(
+        "--research-workers", type=int, default=1,
+        help="Number of research workers in pipeline mode (default: 1)"
+    )
+    research_parser.add_argument(
+        "--summary-workers", type=int, default=1,
+        help="Number of step summary workers in pipeline mode (default: 1)"
+    )
+    research_parser.add_argument(
+        "--resume", action="store_true",
+        help="Resume an interrupted run of the same plan, skipping the steps it already completed"
+    )
+    research_parser.add_argument(
+        "--dag", action="store_true",
+        help="Schedule the steps by their dependencies instead of assuming each step depends on all previous ones"
+    )
+    research_parser.add_argument(
+        "--deep-concurrency", type=int,
+        help="Maximum number of GPT Researcher instances running at once in deep mode (default: no extra limit)"
+    )
+    research_parser.add_argument(
+        "--incremental", action="store_true",
+        help="After editing the plan, only research the added and changed steps, reusing the rest of the previous run"
+    )
+    research_parser.add_argument(
+        "--stream", action="store_true",
+        help="Write the step reports and the final summary to '.partial' files while they are generated"
+    )
+    research_parser.add_argument(
+        "--rolling-summary", action="store_true",
+        help="Keep a summary of the research so far up to date while the steps run, shortening the final summary"
+    )
+    research_parser.add_argument(
+        "--context-budget", type=int,
+        help="Maximum number of tokens of the researcher input of each step (default: 6000)"
+    )
+    research_parser.add_argument(
+        "--queue",
+        help="Work queue file: enqueue the steps for 'gizmo worker' processes instead of executing them here"
+    )
+
+    # Batch command
+    batch_parser = subparsers.add_parser(
+        "batch", help="Execute the research workflows of many plans in one process"
+    )
+    batch_parser.add_argument(
+        "-f", "--file", required=True,
+        help="JSON batch file listing the projects, e.g. [{\"plan\": \"dogs/plan.md\", \"output\": \"dogs/output\"}]"
+    )
+    batch_parser.add_argument(
+        "-k", "--api-key", help="OpenAI API key (overrides OPENAI_API_KEY environment variable)"
+    )
+    batch_parser.add_argument(
+        "--cache-dir", help="Directory for caching model responses and search results on disk (default: no caching)"
+    )
+    batch_parser.add_argument(
+        "--max-projects", type=int, default=2,
+        help="Maximum number of projects researched in parallel (default: 2)"
+    )
+    batch_parser.add_argument(
+        "--max-steps", type=int,
+        help="Maximum number of research steps in progress across all projects (default: no extra limit)"
+    )
+    batch_parser.add_argument(
+        "--rate-limit", type=float,
+        help="Maximum number of OpenAI requests per minute across all projects (default: no limit)"
+    )
+    batch_parser.add_argument(
+        "--resume", action="store_true",
+        help="Resume interrupted runs of the projects, skipping the steps they already completed"
+    )
+    batch_parser.add_argument(
+        "--dag", action="store_true",
+        help="Schedule the steps of every project by their dependencies"
+    )
+    batch_parser.add_argument(
+        "--deep-concurrency", type=int,
+        help="Maximum number of GPT Researcher instances running at once in every deep project (default: no extra limit)"
+    )
+
+    # Worker command
+    worker_parser = subparsers.add_parser(
+        "worker", help="Execute research steps from a work queue"
+    )
+    worker_parser.add_argument(
+        "-q", "--queue", required=True, help="Work queue file shared with 'gizmo research --queue'"
+    )
+    worker_parser.add_argument(
+        "-k", "--api-key", help="OpenAI API key (overrides OPENAI_API_KEY environment variable)"
+    )
+    worker_parser.add_argument(
+        "--cache-dir", help="Directory for caching model responses and search results on disk (default: no caching)"
+    )
+    worker_parser.add_argument(
+        "-c", "--concurrency", type=int, default=1,
+        help="Maximum number of steps executed in parallel by this worker (default: 1)"
+    )
+    worker_parser.add_argument(
+        "--exit-when-idle", action="store_true",
+        help="Stop once the queue has no jobs left instead of waiting for new ones"
+    )
 
     return parser
 
@@ -93,6 +241,9 @@ def main():
         parser.print_help()
         sys.exit(1)
 
+    if args.cache_dir:
+        set_cache_dir(args.cache_dir)
+
     # Check if OpenAI API key is provided as argument or set as environment variable
     if hasattr(args, 'api_key') and args.api_key:
         # Use the API key provided as a command-line argument
@@ -165,10 +316,76 @@ def main():
                     initial_input = f.read()
                 print(f"Using initial input from '{args.initial_input}'")
 
+            # Validate concurrency
+            if args.concurrency < 1:
+                print("Error: --concurrency must be a positive integer.")
+                sys.exit(1)
+
+            if args.deep_concurrency is not None and args.deep_concurrency < 1:
+                print("Error: --deep-concurrency must be a positive integer.")
+                sys.exit(1)
+            if args.context_budget is not None and args.context_budget < 1:
+                print("Error: --context-budget must be a positive integer.")
+                sys.exit(1)
+
+            # Collect the stage workers for pipeline mode
+            stage_workers = None
+            if args.pipeline and args.dag:
+                print("Error: --pipeline and --dag cannot be used together.")
+                sys.exit(1)
+            if args.pipeline and args.queue:
+                print("Error: --pipeline and --queue cannot be used together.")
+                sys.exit(1)
+            if args.pipeline:
+                stage_workers = {
+                    "source": args.source_workers,
+                    "research": args.research_workers,
+                    "summary": args.summary_workers,
+                }
+                if min(stage_workers.values()) < 1:
+                    print("Error: The number of stage workers must be a positive integer.")
+                    sys.exit(1)
+
             print(f"Executing research based on plan '{args.plan}'...")
-            asyncio.run(run_research(args.plan, args.output, args.memory, args.deep, initial_input))
+            asyncio.run(run_research(plan_path=args.plan, output_dir=args.output, memory_dir=args.memory,
+                                     deep=args.deep, initial_input=initial_input,
+                                     concurrency=args.concurrency, stage_workers=stage_workers,
+                                     resume=args.resume, dag=args.dag, deep_concurrency=args.deep_concurrency,
+                                     work_queue=args.queue, incremental=args.incremental, stream=args.stream,
+                                     rolling_summary=args.rolling_summary, context_budget=args.context_budget))
             print(f"Research completed. Results saved to '{args.output}'")
 
+        elif args.command == "batch":
+            # Validate batch file exists
+            if not os.path.exists(args.file):
+                print(f"Error: Batch file '{args.file}' does not exist.")
+                sys.exit(1)
+
+            # Validate limits
+            for option, value in (("--max-projects", args.max_projects), ("--max-steps", args.max_steps),
+                                  ("--rate-limit", args.rate_limit), ("--deep-concurrency", args.deep_concurrency)):
+                if value is not None and value <= 0:
+                    print(f"Error: {option} must be a positive number.")
+                    sys.exit(1)
+
+            print(f"Executing research projects from batch '{args.file}'...")
+            results = asyncio.run(run_batch(args.file, args.max_projects, args.max_steps, args.rate_limit,
+                                            args.resume, args.dag, args.deep_concurrency))
+            failed = [name for name, error in results.items() if error is not None]
+            if failed:
+                print(f"Batch completed with errors. Failed projects: {', '.join(failed)}")
+                sys.exit(1)
+            print(f"Batch completed. All {len(results)} projects succeeded.")
+
+        elif args.command == "worker":
+            # Validate concurrency
+            if args.concurrency < 1:
+                print("Error: --concurrency must be a positive integer.")
+                sys.exit(1)
+
+            print(f"Processing research steps from work queue '{args.queue}'...")
+            asyncio.run(run_worker(args.queue, args.concurrency, exit_when_idle=args.exit_when_idle))
+
     except Exception as e:
         print(f"Error: {str(e)}")
         sys.exit(1)
@@ -0,0 +1,263 @@
+"""
+Page cache for Gizmo.
+
+This module caches the text of the web pages fetched during a research. The steps of a plan often
+read the same pages: the source agent finds them, the researcher agent reads them and, in deep mode,
+GPT Researcher scrapes them again. With the cache, each page is downloaded and extracted once and
+then shared by the `read_web_page` tool of the agents and the GPT Researcher scrapers.
+
+A cached page is used as is while it is fresh. After that, it is revalidated with a conditional
+request (`If-None-Match` / `If-Modified-Since`) if the server sent validators, so unchanged pages
+are not downloaded again. Pages are kept in memory and, if a cache directory is set, on disk, where
+the least recently used pages are evicted once the cache grows beyond its maximum size.
+"""
+
+import os
+import time
+from typing import Optional, Tuple
+from urllib.parse import urldefrag
+
+import requests
+from agno.tools.toolkit import Toolkit
+from bs4 import BeautifulSoup
+
+from gizmo.utils.cache_utils import DiskCache, TieredCache, hash_key
+from gizmo.utils.error_utils import logger
+
+# Seconds during which a cached page is used without revalidation
+PAGE_FRESHNESS = 24 * 60 * 60
+
+# Seconds after which a page is removed from the disk cache
+PAGE_CACHE_TTL = 30 * 24 * 60 * 60
+
+# Maximum size of the page cache on disk, in bytes
+PAGE_CACHE_MAX_SIZE = 256 * 1024 * 1024
+
+# Maximum total size of the pages kept in memory, in bytes
+MEMORY_CACHE_SIZE = 64 * 1024 * 1024
+
+# File name of the page cache in the cache directory
+PAGE_CACHE_FILE = "pages.sqlite"
+
+# Timeout of a page request in seconds
+FETCH_TIMEOUT = 20
+
+# Maximum number of characters of a page returned to an agent
+MAX_PAGE_CHARS = 20000
+
+# Headers of the fetched pages that are kept with the cached text
+_CACHED_HEADERS = ("etag", "last-modified", "content-type")
+
+_USER_AGENT = "Mozilla/5.0 (compatible; Gizmo research assistant)"
+
+# Page cache shared by the agents and GPT Researcher
+_page_cache = TieredCache(MEMORY_CACHE_SIZE)
+
+
+def set_page_cache_dir(cache_dir: Optional[str]):
+    """
+    Enable or disable the on-disk layer of the page cache.
+
+    Args:
+        cache_dir (Optional[str]): Directory of the cache, or None to only cache in memory
+    """
+    _page_cache.disk_cache = (
+        DiskCache(os.path.join(cache_dir, PAGE_CACHE_FILE), max_size=PAGE_CACHE_MAX_SIZE, ttl=PAGE_CACHE_TTL)
+        if cache_dir else None
+    )
+
+
+def _page_key(url: str) -> str:
+    """
+    Get the cache key of a page. URLs that only differ in their fragment share a key.
+
+    Args:
+        url (str): The URL of the page
+
+    Returns:
+        str: The cache key
+    """
+    return hash_key({"url": urldefrag(url.strip())[0]})
+
+
+def get_cached_page(url: str) -> Tuple[Optional[dict], bool]:
+    """
+    Look up a page in the cache.
+
+    Args:
+        url (str): The URL of the page
+
+    Returns:
+        Tuple[Optional[dict], bool]: The cached page (None if it is not cached) and whether it is still fresh
+    """
+    page = _page_cache.get(_page_key(url))
+    if page is None:
+        return None, False
+    return page, page["fetched_at"] + PAGE_FRESHNESS >= time.time()
+
+
+def store_page(url: str, content: str, title: str = "", image_urls: Optional[list] = None,
+               headers: Optional[dict] = None) -> dict:
+    """
+    Store the extracted text of a page in the cache.
+
+    Args:
+        url (str): The URL of the page
+        content (str): The extracted text
+        title (str, optional): The title of the page
+        image_urls (list, optional): URLs of the relevant images of the page
+        headers (dict, optional): The response headers; the validators and the content type are kept
+
+    Returns:
+        dict: The cached page
+    """
+    headers = {name.lower(): value for name, value in (headers or {}).items()}
+    page = {
+        "url": url,
+        "content": content,
+        "title": title or "",
+        "image_urls": image_urls or [],
+        "headers": {name: headers[name] for name in _CACHED_HEADERS if name in headers},
+        "fetched_at": time.time(),
+    }
+    _page_cache.set(_page_key(url), page)
+    return page
+
+
+def _conditional_headers(page: dict) -> dict:
+    """
+    Get the request headers that revalidate a cached page.
+
+    Args:
+        page (dict): The cached page
+
+    Returns:
+        dict: The conditional request headers, empty if the server sent no validators
+    """
+    headers = {}
+    if page["headers"].get("etag"):
+        headers["If-None-Match"] = page["headers"]["etag"]
+    if page["headers"].get("last-modified"):
+        headers["If-Modified-Since"] = page["headers"]["last-modified"]
+    return headers
+
+
+def revalidate_page(url: str, page: dict, session: Optional[requests.Session] = None) -> bool:
+    """
+    Check with a conditional request whether a stale cached page is still up to date.
+
+    If the server answers that the page has not been modified, the page is marked as fresh again.
+
+    Args:
+        url (str): The URL of the page
+        page (dict): The cached page
+        session (requests.Session, optional): The session to send the request with
+
+    Returns:
+        bool: Whether the cached page is still up to date
+    """
+    conditional_headers = _conditional_headers(page)
+    if not conditional_headers:
+        return False
+    try:
+        response = (session or requests).get(
+            url, headers={"User-Agent": _USER_AGENT, **conditional_headers}, timeout=FETCH_TIMEOUT, stream=True
+        )
+        response.close()
+    except requests.RequestException as e:
+        logger.warning(f"Could not revalidate cached page {url}: {str(e)}")
+        return False
+    if response.status_code != 304:
+        return False
+
+    # Keep validators the server may have updated
+    store_page(url, page["content"], page["title"], page["image_urls"], {**page["headers"], **response.headers})
+    logger.info(f"Cached page {url} is unchanged")
+    return True
+
+
+def extract_text(html: str) -> Tuple[str, str]:
+    """
+    Extract the readable text and the title of an HTML page.
+
+    Args:
+        html (str): The HTML of the page
+
+    Returns:
+        Tuple[str, str]: The text, one block per line, and the title
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    title = soup.title.get_text(strip=True) if soup.title else ""
+    for element in soup(["head", "script", "style", "noscript", "nav", "header", "footer", "aside", "form"]):
+        element.decompose()
+    lines = (line.strip() for line in soup.get_text(separator="\n").splitlines())
+    return "\n".join(line for line in lines if line), title
+
+
+def fetch_page(url: str) -> dict:
+    """
+    Get the extracted text of a page, from the cache if possible.
+
+    Args:
+        url (str): The URL of the page
+
+    Returns:
+        dict: The page, with its URL, text ("content"), title, image URLs, headers and fetch time
+
+    Raises:
+        requests.RequestException: If the page cannot be fetched
+    """
+    page, fresh = get_cached_page(url)
+    if page is not None and fresh:
+        logger.info(f"Using cached page {url}")
+        return page
+
+    headers = {"User-Agent": _USER_AGENT}
+    if page is not None:
+        headers.update(_conditional_headers(page))
+    response = requests.get(url, headers=headers, timeout=FETCH_TIMEOUT)
+    if page is not None and response.status_code == 304:
+        logger.info(f"Cached page {url} is unchanged")
+        return store_page(url, page["content"], page["title"], page["image_urls"],
+                          {**page["headers"], **response.headers})
+    response.raise_for_status()
+
+    if "html" in response.headers.get("content-type", "html"):
+        content, title = extract_text(response.text)
+    else:
+        content, title = response.text, ""
+    return store_page(url, content, title, headers=response.headers)
+
+
+class WebPageToolkit(Toolkit):
+    """Toolkit for reading web pages through the shared page cache."""
+
+    def __init__(self):
+        """
+        Initialize the WebPageToolkit.
+        """
+        super().__init__(name="web_page_tools")
+        self.register(self.read_web_page)
+
+    def read_web_page(self, url: str) -> str:
+        """
+        Read the text of a web page, e.g. a source found with a web search.
+
+        Args:
+            url (str): The full URL of the page
+
+        Returns:
+            str: The title and text of the page, or an error message
+        """
+        start_time = time.time()
+        try:
+            page = fetch_page(url)
+        except requests.RequestException as e:
+            logger.warning(f"WebPageToolkit: Could not read {url}: {str(e)}")
+            return f"Could not read {url}: {str(e)}"
+
+        content = page["content"]
+        if len(content) > MAX_PAGE_CHARS:
+            content = content[:MAX_PAGE_CHARS] + "\n\n(page truncated)"
+        logger.info(f"WebPageToolkit: read_web_page({url}) completed in {time.time() - start_time:.2f}s")
+        return f"# {page['title'] or url}\n\n{content}"
@@ -3,17 +3,83 @@ Research Context Toolkit for Gizmo.
 
 This module provides a toolkit for reading files in the research output directory.
 It allows the researcher agent to access previous research results and the plan.
+Previous results, analyses and summaries are searched through the step index of the run, see `step_index`.
+The search tools return the best-matching passages of the step documents, with their step and section,
+instead of whole files, and every tool call returns at most MAX_RESULT_TOKENS tokens of step content.
+Files are read through a file cache shared by all toolkits in the process, so repeated calls only
+re-read a file after it changed.
 """
 
 import os
-import re
 import time
-from typing import List, Dict, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from agno.tools.toolkit import Toolkit
 
+from gizmo.tools.step_index import PassageKey, StepIndex, get_step_index
+from gizmo.utils.cache_utils import FileCache
 from gizmo.utils.error_utils import logger
-from gizmo.utils.file_utils import read_file
+from gizmo.utils.token_utils import estimate_tokens, truncate_to_tokens
+
+# Maximum number of tokens of step content returned by one tool call
+MAX_RESULT_TOKENS = 3000
+
+# Maximum total length of the files kept in the file cache, in characters
+FILE_CACHE_SIZE = 32 * 1024 * 1024
+
+# Contents of the plan and step files, shared by all toolkits
+_file_cache = FileCache(FILE_CACHE_SIZE)
+
+
+def select_passages(index: StepIndex, ranked: Iterable[Tuple[PassageKey, float]],
+                    max_tokens: int = MAX_RESULT_TOKENS) -> List[Tuple[PassageKey, float, str, str]]:
+    """
+    Take the best passages of a search that fit into a token budget.
+
+    Passages that do not fit are skipped in favour of shorter, lower-ranked ones. If not even the
+    best passage fits, it is returned alone, to be truncated by the caller. Passages removed from
+    the index since the search, e.g. because the workflow rewrote their step, are skipped.
+
+    Args:
+        index (StepIndex): The index the passages were found in
+        ranked (Iterable[Tuple[PassageKey, float]]): The passages and their scores, best first
+        max_tokens (int, optional): The token budget. Defaults to MAX_RESULT_TOKENS.
+
+    Returns:
+        List[Tuple[PassageKey, float, str, str]]: The selected passages, best first, with their score,
+                                                  section heading and text
+    """
+    selected, first, used_tokens = [], None, 0
+    for key, score in ranked:
+        passage = index.get_passage(key)
+        if passage is None:
+            continue
+        first = first or (key, score) + passage
+        tokens = estimate_tokens(passage[1])
+        if used_tokens + tokens <= max_tokens:
+            selected.append((key, score) + passage)
+            used_tokens += tokens
+    if not selected and first is not None:
+        selected.append(first)
+    return selected
+
+
+def format_passages(passages: Iterable[Tuple[str, str]], max_tokens: int = MAX_RESULT_TOKENS) -> str:
+    """
+    Join passages of one step document, each under the heading of its section.
+
+    Args:
+        passages (Iterable[Tuple[str, str]]): The section headings and texts of the passages, in the order
+                                              to join them
+        max_tokens (int, optional): Maximum number of tokens of the text. Defaults to MAX_RESULT_TOKENS.
+
+    Returns:
+        str: The passages
+    """
+    parts = []
+    for section, text in passages:
+        parts.append(f"[{section}]\n{text}" if section else text)
+    return truncate_to_tokens("\n\n...\n\n".join(parts), max_tokens)
 
 
 class ResearchContextToolkit(Toolkit):
@@ -31,14 +97,22 @@ class ResearchContextToolkit(Toolkit):
         self.output_dir = output_dir
         self.memory_dir = memory_dir
         self.plan_path = plan_path
-        super().__init__()
+        super().__init__(name="research_context")
+        self.register(self.get_plan)
+        self.register(self.get_previous_step_result)
+        self.register(self.get_step_analysis)
+        self.register(self.get_step_summary)
+        self.register(self.find_relevant_steps)
+        self.register(self.search_research)
 
     @property
     def instructions(self) -> str:
         """Return instructions for using the toolkit."""
         return (
             "This toolkit allows you to read files from the research output directory. "
-            "You can use it to access previous research results and the plan."
+            "You can use it to access previous research results and the plan. "
+            "Use search_research to find the most relevant passages of previous results, analyses and summaries "
+            "in one call, and pass a query to get_previous_step_result to only read the relevant parts of a step."
         )
 
     def get_plan(self) -> str:
@@ -51,38 +125,51 @@ class ResearchContextToolkit(Toolkit):
         start_time = time.time()
         logger.info(f"ResearchContextToolkit: Calling get_plan()")
 
-        if not self.plan_path or not os.path.exists(self.plan_path):
+        result = _file_cache.read(self.plan_path) if self.plan_path else None
+        if result is None:
             logger.info(f"ResearchContextToolkit: No plan available")
             return "No plan available."
 
-        result = read_file(self.plan_path)
         elapsed_time = time.time() - start_time
         logger.info(f"ResearchContextToolkit: get_plan() completed in {elapsed_time:.2f}s")
         return result
 
-    def get_previous_step_result(self, step_number: int) -> str:
+    def get_previous_step_result(self, step_number: int, query: Optional[str] = None) -> str:
         """
-        Get the result of a previous research step.
+        Get the result of a previous research step, or only its passages relevant to a query.
 
         Args:
             step_number (int): The step number
+            query (Optional[str]): What to look for in the result, e.g. a few keywords. Without a query,
+                                   the whole result is returned, truncated if it is very long.
 
         Returns:
-            str: The result of the step
+            str: The result of the step, or its relevant passages with their section headings in brackets
         """
         start_time = time.time()
-        logger.info(f"ResearchContextToolkit: Calling get_previous_step_result(step_number={step_number})")
+        logger.info(f"ResearchContextToolkit: Calling get_previous_step_result(step_number={step_number}, query={query!r})")
 
         if step_number < 1:
             logger.info(f"ResearchContextToolkit: Invalid step number: {step_number}")
             return "Invalid step number."
 
-        step_file = os.path.join(self.output_dir, f"step{step_number}.md")
-        if not os.path.exists(step_file):
+        result = _file_cache.read(os.path.join(self.output_dir, f"step{step_number}.md"))
+        if result is None:
             logger.info(f"ResearchContextToolkit: No result available for step {step_number}")
             return f"No result available for step {step_number}."
 
-        result = read_file(step_file)
+        if query:
+            index = get_step_index(self.output_dir, self.memory_dir)
+            index.update_step(step_number)
+            ranked = [(key, score) for key, score in index.search(query, kinds=("result",)) if key[0] == step_number]
+            passages = sorted(select_passages(index, ranked))
+            if not passages:
+                result = f"Nothing in the result of step {step_number} matches '{query}'."
+            else:
+                result = format_passages((section, text) for _, _, section, text in passages)
+        elif estimate_tokens(result) > MAX_RESULT_TOKENS:
+            result = (truncate_to_tokens(result, MAX_RESULT_TOKENS) +
+                      "\n\n(result truncated; pass a query to get the passages relevant to it)")
         elapsed_time = time.time() - start_time
         logger.info(f"ResearchContextToolkit: get_previous_step_result() completed in {elapsed_time:.2f}s")
         return result
@@ -104,12 +191,11 @@ class ResearchContextToolkit(Toolkit):
             logger.info(f"ResearchContextToolkit: Invalid step number: {step_number}")
             return "Invalid step number."
 
-        analysis_file = os.path.join(self.memory_dir, f"step{step_number}_analysis.md")
-        if not os.path.exists(analysis_file):
+        result = _file_cache.read(os.path.join(self.memory_dir, f"step{step_number}_analysis.md"))
+        if result is None:
             logger.info(f"ResearchContextToolkit: No analysis available for step {step_number}")
             return f"No analysis available for step {step_number}."
 
-        result = read_file(analysis_file)
         elapsed_time = time.time() - start_time
         logger.info(f"ResearchContextToolkit: get_step_analysis() completed in {elapsed_time:.2f}s")
         return result
@@ -131,53 +217,74 @@ class ResearchContextToolkit(Toolkit):
             logger.info(f"ResearchContextToolkit: Invalid step number: {step_number}")
             return "Invalid step number."
 
-        summary_file = os.path.join(self.memory_dir, f"step{step_number}_summary.md")
-        if not os.path.exists(summary_file):
+        result = _file_cache.read(os.path.join(self.memory_dir, f"step{step_number}_summary.md"))
+        if result is None:
             logger.info(f"ResearchContextToolkit: No summary available for step {step_number}")
             return f"No summary available for step {step_number}."
 
-        result = read_file(summary_file)
         elapsed_time = time.time() - start_time
         logger.info(f"ResearchContextToolkit: get_step_summary() completed in {elapsed_time:.2f}s")
         return result
 
     def find_relevant_steps(self, query: str, max_steps: int = 3) -> List[Dict[str, str]]:
         """
-        Find steps relevant to a query.
+        Find the previous steps most relevant to a query.
 
         Args:
-            query (str): The query to search for
+            query (str): The query to search for; steps containing more of its words, or similar ones, rank higher
             max_steps (int, optional): Maximum number of steps to return. Defaults to 3.
 
         Returns:
-            List[Dict[str, str]]: List of relevant steps with their content
+            List[Dict[str, str]]: List of relevant steps with their passages matching the query, most relevant first
         """
         start_time = time.time()
         logger.info(f"ResearchContextToolkit: Calling find_relevant_steps(query='{query}', max_steps={max_steps})")
 
-        # Get all step files
-        step_files = []
-        for filename in os.listdir(self.output_dir):
-            if re.match(r"step\d+\.md", filename):
-                step_number = int(re.search(r"step(\d+)\.md", filename).group(1))
-                step_files.append((step_number, os.path.join(self.output_dir, filename)))
-
-        # Sort by step number
-        step_files.sort()
-
-        # Find relevant steps
-        relevant_steps = []
-        for step_number, file_path in step_files:
-            content = read_file(file_path)
-            # Simple relevance check: if query terms appear in the content
-            if query.lower() in content.lower():
-                relevant_steps.append({
-                    "step_number": step_number,
-                    "content": content
-                })
-                if len(relevant_steps) >= max_steps:
-                    break
+        index = get_step_index(self.output_dir, self.memory_dir)
+        ranked = index.hybrid_search(query, kinds=("result",))
+        step_numbers = list(dict.fromkeys(key[0] for key, _ in ranked))[:max_steps]
+        ranked = [(key, score) for key, score in ranked if key[0] in step_numbers]
+
+        passages_by_step = {step_number: [] for step_number in step_numbers}
+        for key, _, section, text in select_passages(index, ranked):
+            passages_by_step[key[0]].append((key, section, text))
+        relevant_steps = [
+            {"step_number": step_number,
+             "content": format_passages((section, text) for _, section, text in sorted(passages))}
+            for step_number, passages in passages_by_step.items() if passages
+        ]
 
         elapsed_time = time.time() - start_time
         logger.info(f"ResearchContextToolkit: find_relevant_steps() found {len(relevant_steps)} relevant steps in {elapsed_time:.2f}s")
         return relevant_steps
+
+    def search_research(self, query: str, max_results: int = 5) -> List[Dict[str, str]]:
+        """
+        Search the results, analyses and summaries of previous steps for the passages most relevant to a query.
+
+        Args:
+            query (str): The query to search for, e.g. a few keywords
+            max_results (int, optional): Maximum number of passages to return. Defaults to 5.
+
+        Returns:
+            List[Dict[str, str]]: The matching passages, most relevant first, with their step number, kind of
+                                  document ("result", "analysis" or "summary"), section heading, relevance
+                                  score and text
+        """
+        start_time = time.time()
+        logger.info(f"ResearchContextToolkit: Calling search_research(query='{query}', max_results={max_results})")
+
+        index = get_step_index(self.output_dir, self.memory_dir)
+        results = []
+        for key, score, section, text in select_passages(index, index.hybrid_search(query, max_results)):
+            results.append({
+                "step_number": key[0],
+                "kind": key[1],
+                "section": section,
+                "score": round(score, 3),
+                "content": truncate_to_tokens(text, MAX_RESULT_TOKENS),
+            })
+
+        elapsed_time = time.time() - start_time
+        logger.info(f"ResearchContextToolkit: search_research() found {len(results)} passages in {elapsed_time:.2f}s")
+        return results
@@ -0,0 +1,152 @@
+"""
+Search cache for Gizmo.
+
+This module caches the results of the web search toolkits (DuckDuckGo, Google and Arxiv) used by
+the agents. Steps of one plan, and projects of one batch, often issue the same or nearly the same
+queries; with the cache, repeated searches skip the network, which also keeps the agents clear of
+the search providers' rate limits.
+
+Results are kept in memory for the lifetime of the process and, if a cache directory is set, on
+disk, so they are shared across runs and processes. Every provider has its own time to live.
+"""
+
+import functools
+import json
+import os
+from typing import Any, Dict, Optional
+
+from agno.tools.toolkit import Toolkit
+
+from gizmo.utils.cache_utils import DiskCache, TieredCache, hash_key
+from gizmo.utils.error_utils import logger
+
+# Time to live of the search results in seconds, by toolkit name
+SEARCH_CACHE_TTLS = {
+    "duckduckgo": 6 * 60 * 60,
+    "googlesearch": 6 * 60 * 60,
+    "arxiv_tools": 7 * 24 * 60 * 60,
+}
+
+# Time to live of the search results of toolkits without their own entry, in seconds
+DEFAULT_SEARCH_CACHE_TTL = 60 * 60
+
+# Maximum total size of the search results kept in memory, in bytes
+MEMORY_CACHE_SIZE = 16 * 1024 * 1024
+
+# File name of the search cache in the cache directory
+SEARCH_CACHE_FILE = "search_results.sqlite"
+
+# Beginnings of the error messages some toolkits return instead of raising
+_ERROR_PREFIXES = ("error", "failed", "could not", "exception")
+
+
+def normalize_arguments(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normalize the arguments of a search call, so that equivalent queries share a cache entry.
+
+    Strings are lowercased and their whitespace is collapsed.
+
+    Args:
+        arguments (Dict[str, Any]): The arguments of the search call
+
+    Returns:
+        Dict[str, Any]: The normalized arguments
+    """
+    def normalize(value):
+        if isinstance(value, str):
+            return " ".join(value.lower().split())
+        if isinstance(value, (list, tuple)):
+            return [normalize(item) for item in value]
+        return value
+
+    return {name: normalize(value) for name, value in arguments.items()}
+
+
+def is_cacheable_result(result: Any) -> bool:
+    """
+    Check whether the result of a search call should be cached.
+
+    Empty results, e.g. `[]` when a search has no hits or the provider throttled the request,
+    and error messages are not cached, so that later steps search again.
+
+    Args:
+        result (Any): The result of the search call
+
+    Returns:
+        bool: Whether the result holds actual search results
+    """
+    if not isinstance(result, str) or not result.strip():
+        return False
+    try:
+        data = json.loads(result)
+    except ValueError:
+        return not result.strip().lower().startswith(_ERROR_PREFIXES)
+    if isinstance(data, dict) and "error" in data:
+        return False
+    return not (isinstance(data, (list, dict)) and not data)
+
+
+# Search cache shared by all toolkits wrapped with `with_search_cache`
+_search_cache = TieredCache(MEMORY_CACHE_SIZE)
+
+
+def set_search_cache_dir(cache_dir: Optional[str]):
+    """
+    Enable or disable the on-disk layer of the search cache.
+
+    Args:
+        cache_dir (Optional[str]): Directory of the cache, or None to only cache in memory
+    """
+    _search_cache.disk_cache = DiskCache(os.path.join(cache_dir, SEARCH_CACHE_FILE)) if cache_dir else None
+
+
+def _cached_function(provider: str, function):
+    """
+    Wrap a search function so that its results are taken from the search cache.
+
+    The wrapper keeps the signature and docstring of the function, which the agents use as the
+    tool description.
+
+    Args:
+        provider (str): Name of the toolkit providing the function
+        function (Callable): The search function
+
+    Returns:
+        Callable: The wrapped function
+    """
+    ttl = SEARCH_CACHE_TTLS.get(provider, DEFAULT_SEARCH_CACHE_TTL)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        key = hash_key({
+            "provider": provider,
+            "function": function.__name__,
+            "args": normalize_arguments({str(index): value for index, value in enumerate(args)}),
+            "kwargs": normalize_arguments(kwargs),
+        })
+        result = _search_cache.get(key, ttl)
+        if result is not None:
+            logger.info(f"Using cached {function.__name__} results for {kwargs or list(args)}")
+            return result
+
+        result = function(*args, **kwargs)
+        if is_cacheable_result(result):
+            _search_cache.set(key, result)
+        return result
+
+    return wrapper
+
+
+def with_search_cache(toolkit: Toolkit) -> Toolkit:
+    """
+    Make the functions of a search toolkit use the shared search cache.
+
+    Args:
+        toolkit (Toolkit): The toolkit, e.g. DuckDuckGoTools()
+
+    Returns:
+        Toolkit: The same toolkit, with its functions wrapped
+    """
+    for function in toolkit.functions.values():
+        function.entrypoint = _cached_function(toolkit.name, function.entrypoint)
+    return toolkit
@@ -0,0 +1,293 @@
+"""
+Semantic index for Gizmo.
+
+This module finds the passages of previous steps that are similar to a query even if they do not
+contain its exact words, e.g. "a changing climate reduces agricultural crop yields" for "climate
+change effects on agriculture". Passages are turned into vectors with a hashing vectorizer: their
+stemmed words and the character 4-grams of the words are hashed into a fixed number of dimensions,
+so no model or vocabulary is needed. Related word forms share most of their 4-grams, but words
+with nothing in common, like "dog" and "canine", are not matched. A query is compared to all passages at
+once, as the cosine similarity of its vector with the matrix of passage vectors.
+
+The vectors are saved in the `semantic_index` directory inside the memory directory of the run, one
+`.npy` file per step document, named after the document and the version of its file, and the files
+are memory-mapped when they are loaded. Only the files of documents that changed are written, and
+a run that is resumed, or another worker, only vectorizes the passages that changed. The index requires NumPy; without it, `is_available` returns
+False and the step index only searches by keywords.
+"""
+
+import functools
+import os
+import re
+import threading
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from gizmo.utils.context_utils import tokenize
+from gizmo.utils.error_utils import logger
+from gizmo.utils.similarity_utils import stem
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Number of dimensions of the passage vectors; a power of two
+DIMENSIONS = 1024
+
+# Length of the character n-grams of the words
+NGRAM_LENGTH = 4
+
+# Weight of a character n-gram relative to a whole word
+NGRAM_WEIGHT = 1.0
+
+# Directory of the vector files in the memory directory
+VECTORS_DIR = "semantic_index"
+
+# Vector files, e.g. "step3_summary_1718000000.123456_2048.npy" for the summary of step 3, with the
+# modification time and size of the file the vectors were computed from
+_VECTORS_FILE_PATTERN = re.compile(r"^step(\d+)_([a-z]+)_(\d+(?:\.\d+)?(?:e[+-]?\d+)?)_(\d+)\.npy$")
+
+# A document of the index: the step number and the kind of document
+DocumentKey = Tuple[int, str]
+
+# A passage of the index: the step number, the kind of document and the number of the passage
+PassageKey = Tuple[int, str, int]
+
+
+def is_available() -> bool:
+    """
+    Check whether semantic search can be used, i.e. whether NumPy is installed.
+
+    Returns:
+        bool: Whether semantic search is available
+    """
+    return np is not None
+
+
+@functools.lru_cache(maxsize=65536)
+def _feature_hash(feature: str) -> int:
+    """
+    Hash a feature of the vectorizer. Unlike `hash`, the hash is the same in every process.
+
+    Args:
+        feature (str): The feature, e.g. "w:dog" or "n:<dog"
+
+    Returns:
+        int: The 32-bit hash
+    """
+    return zlib.crc32(feature.encode('utf-8'))
+
+
+def vectorize(text: str, dimensions: int = DIMENSIONS):
+    """
+    Turn a text into a unit vector with the hashing vectorizer.
+
+    Every feature adds its weight to one dimension, with a sign taken from its hash so that
+    collisions cancel out on average. Repeated features count logarithmically.
+
+    Args:
+        text (str): The text
+        dimensions (int, optional): Number of dimensions. Defaults to DIMENSIONS.
+
+    Returns:
+        numpy.ndarray: The float32 vector, all zeros if the text has no words
+    """
+    indices, weights = [], []
+    for word in tokenize(text):
+        word = stem(word)
+        features = [(f"w:{word}", 1.0)]
+        padded = f"<{word}>"
+        features.extend((f"n:{padded[i:i + NGRAM_LENGTH]}", NGRAM_WEIGHT)
+                        for i in range(len(padded) - NGRAM_LENGTH + 1))
+        for feature, weight in features:
+            feature_hash = _feature_hash(feature)
+            indices.append(feature_hash & (dimensions - 1))
+            weights.append(weight if feature_hash & 0x80000000 else -weight)
+
+    vector = np.bincount(np.array(indices, dtype=np.int64), weights=np.array(weights, dtype=np.float64),
+                         minlength=dimensions) if indices else np.zeros(dimensions)
+    vector = np.sign(vector) * np.log1p(np.abs(vector))
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).astype(np.float32)
+
+
+class SemanticIndex:
+    """The passage vectors of the step documents of a research run."""
+
+    def __init__(self, memory_dir: str, dimensions: int = DIMENSIONS):
+        """
+        Initialize the SemanticIndex and load the vectors saved in the memory directory.
+
+        Args:
+            memory_dir (str): Directory containing the memory files of the run
+            dimensions (int, optional): Number of dimensions of the vectors. Defaults to DIMENSIONS.
+
+        Raises:
+            RuntimeError: If NumPy is not installed
+        """
+        if np is None:
+            raise RuntimeError("Semantic search requires NumPy")
+        self.memory_dir = memory_dir
+        self.vectors_dir = os.path.join(memory_dir, VECTORS_DIR)
+        self.dimensions = dimensions
+        self._documents: Dict[DocumentKey, dict] = {}
+        self._saved: Dict[DocumentKey, dict] = {}
+        self._files: Dict[DocumentKey, List[str]] = {}
+        self._unsaved = set()
+        self._matrix = None
+        self._matrix_keys: List[PassageKey] = []
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """
+        Load the saved vectors, memory-mapped. They are reused for documents that did not change.
+        """
+        if not os.path.isdir(self.vectors_dir):
+            return
+        for filename in sorted(os.listdir(self.vectors_dir)):
+            match = _VECTORS_FILE_PATTERN.match(filename)
+            if not match:
+                continue
+            key = (int(match.group(1)), match.group(2))
+            version = (float(match.group(3)), int(match.group(4)))
+            self._files.setdefault(key, []).append(filename)
+            saved = self._saved.get(key)
+            if saved is not None and saved["version"][0] >= version[0]:
+                continue
+            try:
+                vectors = np.load(os.path.join(self.vectors_dir, filename), mmap_mode="r")
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not load semantic index file {filename}: {str(e)}")
+                continue
+            if vectors.ndim == 2 and vectors.shape[1] == self.dimensions:
+                self._saved[key] = {"version": version, "vectors": vectors}
+
+    def vectorize_document(self, key: DocumentKey, version: Tuple[float, int], passages: List[str]):
+        """
+        Get the vectors of the passages of a document, reusing the saved ones if it did not change.
+
+        Args:
+            key (DocumentKey): The step number and kind of the document
+            version (Tuple[float, int]): The modification time and size of the document file
+            passages (List[str]): The texts of the passages, in document order
+
+        Returns:
+            numpy.ndarray: One row per passage
+        """
+        saved = self._saved.get(key)
+        if saved is not None and saved["version"] == version and len(saved["vectors"]) == len(passages):
+            return saved["vectors"]
+        if not passages:
+            return np.zeros((0, self.dimensions), dtype=np.float32)
+        return np.stack([vectorize(text, self.dimensions) for text in passages])
+
+    def set_document(self, key: DocumentKey, version: Tuple[float, int], vectors):
+        """
+        Add or replace the vectors of a document.
+
+        Args:
+            key (DocumentKey): The step number and kind of the document
+            version (Tuple[float, int]): The modification time and size of the document file
+            vectors (numpy.ndarray): The vectors of its passages, see `vectorize_document`
+        """
+        with self._lock:
+            self._documents[key] = {"version": version, "vectors": vectors}
+            self._matrix = None
+            saved = self._saved.get(key)
+            if saved is None or saved["vectors"] is not vectors:
+                self._unsaved.add(key)
+
+    def remove_document(self, key: DocumentKey):
+        """
+        Remove the vectors of a document.
+
+        Args:
+            key (DocumentKey): The step number and kind of the document
+        """
+        with self._lock:
+            if self._documents.pop(key, None) is not None:
+                self._matrix = None
+                self._unsaved.add(key)
+
+    def search(self, query: str, max_results: int, kinds: Optional[Iterable[str]] = None,
+               min_similarity: float = 0.0) -> List[Tuple[PassageKey, float]]:
+        """
+        Find the passages most similar to a query by the cosine similarity of their vectors.
+
+        Args:
+            query (str): The query
+            max_results (int): Maximum number of passages to return
+            kinds (Iterable[str], optional): The kinds of documents to search. Defaults to all kinds.
+            min_similarity (float, optional): Minimum similarity of a result. Defaults to 0.0.
+
+        Returns:
+            List[Tuple[PassageKey, float]]: The passages and their similarities, most similar first
+        """
+        query_vector = vectorize(query, self.dimensions)
+        with self._lock:
+            if self._matrix is None:
+                self._matrix_keys = [key + (number,) for key in sorted(self._documents)
+                                     for number in range(len(self._documents[key]["vectors"]))]
+                self._matrix = (np.concatenate([self._documents[key]["vectors"] for key in sorted(self._documents)])
+                                if self._documents else np.zeros((0, self.dimensions), dtype=np.float32))
+            matrix, matrix_keys = self._matrix, self._matrix_keys
+        if not matrix_keys or not query_vector.any():
+            return []
+
+        # The vectors have unit length, so the dot products are the cosine similarities
+        similarities = matrix @ query_vector
+        if kinds is not None:
+            kinds = set(kinds)
+            similarities[[key[1] not in kinds for key in matrix_keys]] = -1.0
+        candidates = np.flatnonzero(similarities >= min_similarity)
+        if len(candidates) > max_results:
+            candidates = candidates[np.argpartition(-similarities[candidates], max_results - 1)[:max_results]]
+        candidates = candidates[np.argsort(-similarities[candidates], kind="stable")]
+        return [(matrix_keys[row], float(similarities[row])) for row in candidates]
+
+    def save(self):
+        """
+        Save the vectors of the documents that changed since they were loaded or saved.
+
+        Every document is written to a new file named after its version, which then replaces the
+        files of its earlier versions, so other processes never load a partly written file. The
+        files of removed documents are deleted.
+        """
+        with self._save_lock:
+            self._save()
+
+    def _save(self):
+        """
+        Save the vectors of the changed documents. The caller holds the save lock.
+        """
+        with self._lock:
+            if not self._unsaved or not os.path.isdir(self.memory_dir):
+                return
+            changes = {key: self._documents.get(key) for key in self._unsaved}
+            self._unsaved = set()
+
+        for key, document in sorted(changes.items()):
+            filename = None
+            try:
+                if document is not None:
+                    filename = f"step{key[0]}_{key[1]}_{document['version'][0]!r}_{document['version'][1]}.npy"
+                    path = os.path.join(self.vectors_dir, filename)
+                    os.makedirs(self.vectors_dir, exist_ok=True)
+                    with open(path + ".tmp", 'wb') as file:
+                        np.save(file, np.asarray(document["vectors"], dtype=np.float32))
+                    os.replace(path + ".tmp", path)
+            except OSError as e:
+                logger.warning(f"Could not save the semantic index of step {key[0]} ({key[1]}): {str(e)}")
+                continue
+
+            for previous_file in self._files.pop(key, []):
+                if previous_file != filename:
+                    try:
+                        os.remove(os.path.join(self.vectors_dir, previous_file))
+                    except OSError:
+                        pass
+            if filename:
+                self._files[key] = [filename]
@@ -0,0 +1,400 @@
+"""
+Step index for Gizmo.
+
+This module keeps an inverted index of the files a research run writes for every step: the step
+result (`stepN.md`), the researcher's analysis (`stepN_analysis.md`) and the step summary
+(`stepN_summary.md`). The research toolkit searches previous steps through the index instead of
+reading every file on every tool call. The workflow updates the index whenever it writes the files of
+a step; files written before the index was created, e.g. by a previous run or another worker, are
+indexed when it is created.
+
+Documents are split into passages, i.e. paragraphs grouped by the section they are in, so searches
+return the relevant parts of a document instead of the whole file. Passages are indexed by their
+stemmed words without stop words, and search results are ranked with BM25, so passages that contain
+more of the query words, and rarer ones, rank higher. If NumPy is installed, the passages are also
+kept in a semantic index (see `semantic_index`), and `hybrid_search` combines the keyword ranking
+with the ranking by similarity of meaning, so passages that paraphrase a query are found as well.
+"""
+
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from gizmo.tools import semantic_index
+from gizmo.utils.context_utils import tokenize
+from gizmo.utils.file_utils import read_file
+from gizmo.utils.similarity_utils import stem
+from gizmo.utils.token_utils import estimate_tokens
+
+# Kinds of step documents, with the directory they are in ("output" or "memory") and their file name
+DOCUMENT_KINDS = {
+    "result": ("output", "step{}.md"),
+    "analysis": ("memory", "step{}_analysis.md"),
+    "summary": ("memory", "step{}_summary.md"),
+}
+
+# BM25 parameters: term frequency saturation and passage length normalization
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Number of tokens up to which consecutive paragraphs of a section are joined into one passage
+PASSAGE_TOKENS = 150
+
+# Minimum cosine similarity of a passage found by the semantic index
+SEMANTIC_MIN_SIMILARITY = 0.2
+
+# Number of passages taken from each ranking before they are combined by `hybrid_search`
+HYBRID_CANDIDATES = 50
+
+# Rank offset of reciprocal rank fusion; larger values give lower-ranked passages more weight
+RRF_K = 60
+
+# Step document files, e.g. "step3.md" or "step3_summary.md"
+_STEP_FILE_PATTERN = re.compile(r"^step(\d+)(?:_(analysis|summary))?\.md$")
+
+# Markdown headings, e.g. "## Findings"
+_HEADING_PATTERN = re.compile(r"^#{1,6}\s+(.+?)\s*#*$")
+
+# A document of the index: the step number and the kind of document
+DocumentKey = Tuple[int, str]
+
+# A passage of the index: the step number, the kind of document and the number of the passage
+PassageKey = Tuple[int, str, int]
+
+# Indexes by output and memory directory
+_indexes: Dict[Tuple[str, str], "StepIndex"] = {}
+_indexes_lock = threading.Lock()
+
+
+def index_terms(text: str) -> List[str]:
+    """
+    Split a text into the terms of the index.
+
+    Args:
+        text (str): The text
+
+    Returns:
+        List[str]: The stemmed words of the text without stop words, in order
+    """
+    return [stem(word) for word in tokenize(text)]
+
+
+def split_passages(text: str) -> List[Tuple[str, str]]:
+    """
+    Split a Markdown document into passages.
+
+    Paragraphs are joined with the following paragraphs of the same section until they reach
+    PASSAGE_TOKENS tokens; a heading always starts a new passage.
+
+    Args:
+        text (str): The document
+
+    Returns:
+        List[Tuple[str, str]]: The heading of the section of every passage ("" before the first heading)
+                               and the passage text, in document order
+    """
+    passages = []
+    section, paragraphs, tokens = "", [], 0
+
+    def flush():
+        nonlocal paragraphs, tokens
+        if paragraphs:
+            passages.append((section, "\n\n".join(paragraphs)))
+        paragraphs, tokens = [], 0
+
+    for block in re.split(r"\n\s*\n", text):
+        block = block.strip()
+        if not block:
+            continue
+        first_line, _, rest = block.partition("\n")
+        heading = _HEADING_PATTERN.match(first_line)
+        if heading:
+            flush()
+            section = heading.group(1).replace("**", "")
+            block = rest.strip()
+            if not block:
+                continue
+        block_tokens = estimate_tokens(block)
+        if paragraphs and tokens + block_tokens > PASSAGE_TOKENS:
+            flush()
+        paragraphs.append(block)
+        tokens += block_tokens
+    flush()
+    return passages
+
+
+class StepIndex:
+    """An inverted index of the step documents of a research run."""
+
+    def __init__(self, output_dir: str, memory_dir: str):
+        """
+        Initialize the StepIndex and index the step documents that already exist.
+
+        Args:
+            output_dir (str): Directory containing the step results
+            memory_dir (str): Directory containing the analyses and summaries
+        """
+        self.output_dir = output_dir
+        self.memory_dir = memory_dir
+        self._postings: Dict[str, Dict[PassageKey, int]] = {}
+        self._documents: Dict[DocumentKey, dict] = {}
+        self._passages: Dict[PassageKey, dict] = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+        self.semantic = semantic_index.SemanticIndex(memory_dir) if semantic_index.is_available() else None
+
+        step_numbers = set()
+        for directory in {output_dir, memory_dir}:
+            if os.path.isdir(directory):
+                for filename in os.listdir(directory):
+                    match = _STEP_FILE_PATTERN.match(filename)
+                    if match:
+                        step_numbers.add(int(match.group(1)))
+        for step_number in sorted(step_numbers):
+            self._update_step(step_number)
+        if self.semantic is not None:
+            self.semantic.save()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    @property
+    def passage_count(self) -> int:
+        return len(self._passages)
+
+    def _path(self, step_number: int, kind: str) -> str:
+        """
+        Get the path of a step document.
+
+        Args:
+            step_number (int): The step number
+            kind (str): The kind of document, see DOCUMENT_KINDS
+
+        Returns:
+            str: The path of the file
+        """
+        directory, pattern = DOCUMENT_KINDS[kind]
+        return os.path.join(self.output_dir if directory == "output" else self.memory_dir, pattern.format(step_number))
+
+    def update_step(self, step_number: int):
+        """
+        Index the documents of a step, re-indexing those that changed since they were indexed.
+
+        Args:
+            step_number (int): The step number
+        """
+        self._update_step(step_number)
+        if self.semantic is not None:
+            self.semantic.save()
+
+    def _update_step(self, step_number: int):
+        """
+        Index the documents of a step without saving the semantic index.
+
+        Args:
+            step_number (int): The step number
+        """
+        for kind in DOCUMENT_KINDS:
+            self._update_document((step_number, kind))
+
+    def _update_document(self, key: DocumentKey):
+        """
+        Index a step document if it is new or changed, and remove it from the index if it was deleted.
+
+        Args:
+            key (DocumentKey): The step number and kind of the document
+        """
+        path = self._path(*key)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._remove(key)
+            return
+
+        document = self._documents.get(key)
+        if document is not None and (document["mtime"], document["size"]) == (stat.st_mtime, stat.st_size):
+            return
+
+        content = read_file(path)
+        passages = split_passages(content)
+        version = (stat.st_mtime, stat.st_size)
+        vectors = None
+        if self.semantic is not None:
+            vectors = self.semantic.vectorize_document(key, version, [text for _, text in passages])
+        with self._lock:
+            self._remove(key)
+            if vectors is not None:
+                self.semantic.set_document(key, version, vectors)
+            self._documents[key] = {
+                "content": content,
+                "mtime": stat.st_mtime,
+                "size": stat.st_size,
+                "passages": len(passages),
+            }
+            for number, (section, text) in enumerate(passages):
+                term_counts = Counter(index_terms(text))
+                length = sum(term_counts.values())
+                self._passages[key + (number,)] = {
+                    "section": section,
+                    "text": text,
+                    "terms": term_counts,
+                    "length": length,
+                }
+                self._total_length += length
+                for term, count in term_counts.items():
+                    self._postings.setdefault(term, {})[key + (number,)] = count
+
+    def remove_step(self, step_number: int):
+        """
+        Remove the documents of a step from the index.
+
+        Args:
+            step_number (int): The step number
+        """
+        with self._lock:
+            for kind in DOCUMENT_KINDS:
+                self._remove((step_number, kind))
+        if self.semantic is not None:
+            self.semantic.save()
+
+    def _remove(self, key: DocumentKey):
+        """
+        Remove a document from the index. The caller holds the lock.
+
+        Args:
+            key (DocumentKey): The step number and kind of the document
+        """
+        document = self._documents.pop(key, None)
+        if document is None:
+            return
+        if self.semantic is not None:
+            self.semantic.remove_document(key)
+        for number in range(document["passages"]):
+            passage = self._passages.pop(key + (number,))
+            self._total_length -= passage["length"]
+            for term in passage["terms"]:
+                postings = self._postings.get(term)
+                if postings is not None:
+                    postings.pop(key + (number,), None)
+                    if not postings:
+                        del self._postings[term]
+
+    def get_content(self, step_number: int, kind: str = "result") -> Optional[str]:
+        """
+        Get an indexed step document.
+
+        Args:
+            step_number (int): The step number
+            kind (str, optional): The kind of document, see DOCUMENT_KINDS. Defaults to "result".
+
+        Returns:
+            Optional[str]: The content of the document, or None if it is not indexed
+        """
+        document = self._documents.get((step_number, kind))
+        return document["content"] if document is not None else None
+
+    def get_passage(self, key: PassageKey) -> Optional[Tuple[str, str]]:
+        """
+        Get an indexed passage.
+
+        A passage found by a search may have been removed since, e.g. because its document was
+        rewritten by the workflow, so callers have to handle a missing passage.
+
+        Args:
+            key (PassageKey): The step number, kind of document and number of the passage
+
+        Returns:
+            Optional[Tuple[str, str]]: The heading of the section of the passage and its text, or None if
+                                       the passage is no longer indexed
+        """
+        with self._lock:
+            passage = self._passages.get(key)
+        return (passage["section"], passage["text"]) if passage is not None else None
+
+    def search(self, query: str, max_results: Optional[int] = None,
+               kinds: Optional[Iterable[str]] = None) -> List[Tuple[PassageKey, float]]:
+        """
+        Find the passages of the step documents most relevant to a query, ranked with BM25.
+
+        Args:
+            query (str): The query
+            max_results (int, optional): Maximum number of passages to return. Defaults to all matching passages.
+            kinds (Iterable[str], optional): The kinds of documents to search. Defaults to all kinds.
+
+        Returns:
+            List[Tuple[PassageKey, float]]: The passages and their scores, best first
+        """
+        kinds = set(kinds or DOCUMENT_KINDS)
+        scores: Counter = Counter()
+        with self._lock:
+            if not self._passages:
+                return []
+            passage_count = len(self._passages)
+            average_length = self._total_length / passage_count or 1.0
+            for term in set(index_terms(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (passage_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for key, count in postings.items():
+                    if key[1] not in kinds:
+                        continue
+                    length_norm = 1 - BM25_B + BM25_B * self._passages[key]["length"] / average_length
+                    scores[key] += idf * count * (BM25_K1 + 1) / (count + BM25_K1 * length_norm)
+
+        ranked = sorted(scores, key=lambda key: (-scores[key], key))
+        return [(key, scores[key]) for key in ranked[:max_results]]
+
+    def hybrid_search(self, query: str, max_results: Optional[int] = None,
+                      kinds: Optional[Iterable[str]] = None) -> List[Tuple[PassageKey, float]]:
+        """
+        Find the passages most relevant to a query by their keywords and, if available, their meaning.
+
+        The keyword and semantic rankings are combined with reciprocal rank fusion: every passage scores
+        1 / (RRF_K + rank) in each ranking it appears in. Without a semantic index, this is `search`.
+
+        Args:
+            query (str): The query
+            max_results (int, optional): Maximum number of passages to return. Defaults to all matching passages.
+            kinds (Iterable[str], optional): The kinds of documents to search. Defaults to all kinds.
+
+        Returns:
+            List[Tuple[PassageKey, float]]: The passages and their scores, best first
+        """
+        if self.semantic is None:
+            return self.search(query, max_results, kinds)
+
+        rankings = [
+            self.search(query, HYBRID_CANDIDATES, kinds),
+            self.semantic.search(query, HYBRID_CANDIDATES, kinds or DOCUMENT_KINDS, SEMANTIC_MIN_SIMILARITY),
+        ]
+        scores: Counter = Counter()
+        for ranking in rankings:
+            for rank, (key, _) in enumerate(ranking, start=1):
+                scores[key] += 1 / (RRF_K + rank)
+        ranked = sorted(scores, key=lambda key: (-scores[key], key))
+        return [(key, scores[key]) for key in ranked[:max_results]]
+
+
+def get_step_index(output_dir: str, memory_dir: str) -> StepIndex:
+    """
+    Get the step index of a research run, creating it on first use.
+
+    Args:
+        output_dir (str): Directory containing the step results
+        memory_dir (str): Directory containing the analyses and summaries
+
+    Returns:
+        StepIndex: The index shared by all toolkits and workflows of the run in this process
+    """
+    key = (os.path.abspath(output_dir), os.path.abspath(memory_dir))
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = StepIndex(output_dir, memory_dir)
+            _indexes[key] = index
+        return index
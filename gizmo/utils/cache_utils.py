@@ -0,0 +1,310 @@
+"""
+Cache utilities for Gizmo.
+
+This module provides a persistent key-value cache backed by a SQLite database. Values are stored
+as JSON under the hash of their key, expire after a time to live, and the least recently used
+entries are evicted once the cache grows beyond its maximum size. The cache can be shared by
+several processes. A tiered cache keeps the recently used values in memory in front of an
+optional persistent cache, and a file cache keeps the content of recently read files in memory
+for as long as the files do not change.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterator, Optional
+
+from gizmo.utils.error_utils import logger
+from gizmo.utils.file_utils import read_file
+
+# Default maximum size of a cache in bytes
+DEFAULT_MAX_SIZE = 512 * 1024 * 1024
+
+# Default time to live of a cache entry in seconds
+DEFAULT_TTL = 7 * 24 * 60 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+"""
+
+
+def hash_key(data: Any) -> str:
+    """
+    Hash a JSON-serializable key into a cache key.
+
+    Args:
+        data (Any): The key data, e.g. a dictionary of request parameters
+
+    Returns:
+        str: The SHA-256 hex digest of the canonical JSON of the data
+    """
+    canonical = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class DiskCache:
+    """A persistent key-value cache with a time to live and least-recently-used eviction."""
+
+    def __init__(self, path: str, max_size: int = DEFAULT_MAX_SIZE, ttl: Optional[float] = DEFAULT_TTL):
+        """
+        Initialize the DiskCache, creating the database if needed.
+
+        Args:
+            path (str): Path to the SQLite database file
+            max_size (int, optional): Maximum total size of the cached values in bytes. Defaults to DEFAULT_MAX_SIZE.
+            ttl (float, optional): Seconds after which an entry expires, or None to keep entries until they
+                                   are evicted. Defaults to DEFAULT_TTL.
+        """
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        Open a connection to the cache database and close it afterwards.
+
+        Yields:
+            sqlite3.Connection: The connection, in autocommit mode
+        """
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def get(self, key: str, ttl: Optional[float] = None) -> Optional[Any]:
+        """
+        Get a cached value and mark it as recently used.
+
+        Args:
+            key (str): The cache key, see `hash_key`
+            ttl (float, optional): Seconds after which the entry expires, overriding the cache's time to live
+
+        Returns:
+            Optional[Any]: The value, or None if it is not cached or expired
+        """
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        try:
+            with self._connect() as connection:
+                row = connection.execute("SELECT value, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                if ttl is not None and row[1] + ttl < now:
+                    connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    return None
+                connection.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            return json.loads(row[0])
+        except (sqlite3.Error, ValueError) as e:
+            # A broken cache must never break the research
+            logger.warning(f"Could not read from cache '{self.path}': {str(e)}")
+            return None
+
+    def set(self, key: str, value: Any):
+        """
+        Store a value and evict the least recently used entries if the cache is too large.
+
+        Args:
+            key (str): The cache key, see `hash_key`
+            value (Any): The JSON-serializable value
+        """
+        now = time.time()
+        data = json.dumps(value, ensure_ascii=False)
+        try:
+            with self._connect() as connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, data, len(data.encode('utf-8')), now, now)
+                )
+                self._evict(connection)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not write to cache '{self.path}': {str(e)}")
+
+    def _evict(self, connection: sqlite3.Connection):
+        """
+        Delete the least recently used entries until the cache fits into its maximum size.
+
+        Args:
+            connection (sqlite3.Connection): The open connection
+        """
+        total_size = connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total_size <= self.max_size:
+            return
+
+        evicted = 0
+        rows = connection.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall()
+        for key, size in rows:
+            if total_size <= self.max_size:
+                break
+            connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total_size -= size
+            evicted += 1
+        logger.info(f"Evicted {evicted} entries from cache '{self.path}'")
+
+    def clear(self):
+        """
+        Delete all entries.
+        """
+        with self._connect() as connection:
+            connection.execute("DELETE FROM entries")
+
+
+class TieredCache:
+    """A cache that keeps recently used values in memory in front of an optional DiskCache."""
+
+    def __init__(self, max_memory_size: int):
+        """
+        Initialize the TieredCache without a disk layer.
+
+        Args:
+            max_memory_size (int): Maximum total size of the values kept in memory, in bytes of their JSON
+        """
+        self.max_memory_size = max_memory_size
+        self.disk_cache: Optional[DiskCache] = None
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str, ttl: Optional[float] = None) -> Optional[Any]:
+        """
+        Get a cached value from memory or, if it is not there, from disk.
+
+        Args:
+            key (str): The cache key, see `hash_key`
+            ttl (float, optional): Seconds after which the value expires. Defaults to no expiry in memory
+                                   and the time to live of the disk cache on disk.
+
+        Returns:
+            Optional[Any]: The value, or None if it is not cached or expired
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, size, value = entry
+                if ttl is None or stored_at + ttl >= time.time():
+                    self._memory.move_to_end(key)
+                    return value
+                del self._memory[key]
+                self._memory_size -= size
+
+        if self.disk_cache is not None:
+            value = self.disk_cache.get(key, ttl=ttl)
+            if value is not None:
+                self._remember(key, value)
+                return value
+        return None
+
+    def set(self, key: str, value: Any):
+        """
+        Store a value in memory and, if there is a disk layer, on disk.
+
+        Args:
+            key (str): The cache key, see `hash_key`
+            value (Any): The JSON-serializable value
+        """
+        self._remember(key, value)
+        if self.disk_cache is not None:
+            self.disk_cache.set(key, value)
+
+    def _remember(self, key: str, value: Any):
+        """
+        Store a value in memory, evicting the least recently used values if the memory layer is full.
+
+        Args:
+            key (str): The cache key
+            value (Any): The value
+        """
+        size = len(json.dumps(value, ensure_ascii=False))
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_size -= previous[1]
+            self._memory[key] = (time.time(), size, value)
+            self._memory_size += size
+            while self._memory_size > self.max_memory_size and len(self._memory) > 1:
+                _, (_, evicted_size, _) = self._memory.popitem(last=False)
+                self._memory_size -= evicted_size
+
+
+class FileCache:
+    """An in-memory cache of file contents that are re-read when a file's modification time or size changes."""
+
+    def __init__(self, max_size: int):
+        """
+        Initialize the FileCache.
+
+        Args:
+            max_size (int): Maximum total length of the cached contents, in characters
+        """
+        self.max_size = max_size
+        self._files = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def read(self, path: str) -> Optional[str]:
+        """
+        Read a file, from the cache if it has not changed since it was cached.
+
+        Args:
+            path (str): Path to the file
+
+        Returns:
+            Optional[str]: The content of the file, or None if it does not exist
+
+        Raises:
+            IOError: If there's an error reading the file
+        """
+        path = os.path.abspath(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._forget(path)
+            return None
+
+        with self._lock:
+            entry = self._files.get(path)
+            if entry is not None and entry[:2] == (stat.st_mtime, stat.st_size):
+                self._files.move_to_end(path)
+                return entry[2]
+
+        try:
+            content = read_file(path)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._forget(path)
+            self._files[path] = (stat.st_mtime, stat.st_size, content)
+            self._size += len(content)
+            while self._size > self.max_size and len(self._files) > 1:
+                _, (_, _, evicted) = self._files.popitem(last=False)
+                self._size -= len(evicted)
+        return content
+
+    def _forget(self, path: str):
+        """
+        Remove a file from the cache. The caller holds the lock.
+
+        Args:
+            path (str): The absolute path of the file
+        """
+        entry = self._files.pop(path, None)
+        if entry is not None:
+            self._size -= len(entry[2])
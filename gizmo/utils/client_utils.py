@@ -0,0 +1,292 @@
+"""
+Client utilities for Gizmo.
+
+This module provides the OpenAI models used by the agents. All models created with `create_model`
+share one OpenAI client per event loop, so the HTTP connections are kept alive across agent runs,
+steps and, in batch mode, projects. Requests through the shared client can be rate limited, and
+their responses can be cached on disk, so that repeated identical requests cost no tokens.
+"""
+
+import asyncio
+import os
+import time
+import weakref
+from typing import Any, Dict, List, Optional
+
+import httpx
+from agno.models.message import Message
+from agno.models.openai import OpenAIChat
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion, ParsedChatCompletion
+from pydantic import BaseModel
+
+from gizmo.utils.cache_utils import DiskCache, hash_key
+
+# Connection limits of the shared HTTP client
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+
+# Shared OpenAI clients by event loop
+_async_clients = weakref.WeakKeyDictionary()
+
+# Rate limiter applied to every request of the shared clients
+_rate_limiter = None
+
+# File name of the model response cache in the cache directory
+RESPONSE_CACHE_FILE = "llm_responses.sqlite"
+
+# Cache of the model responses, shared by all models created with `create_model`
+_response_cache = None
+
+# Cache status of a model response, reported in the additional metrics of the response
+CACHE_HIT = "cache_hits"
+CACHE_MISS = "cache_misses"
+
+
+class RateLimiter:
+    """Spreads requests evenly so that at most `requests_per_minute` requests start per minute."""
+
+    def __init__(self, requests_per_minute: float):
+        """
+        Initialize the RateLimiter.
+
+        Args:
+            requests_per_minute (float): Maximum number of requests per minute
+
+        Raises:
+            ValueError: If requests_per_minute is not positive
+        """
+        if requests_per_minute <= 0:
+            raise ValueError("The rate limit must be a positive number of requests per minute")
+        self.interval = 60.0 / requests_per_minute
+        self._next_time = 0.0
+
+    async def acquire(self):
+        """
+        Wait until the next request may be sent.
+        """
+        # Reserve a time slot before suspending, so concurrent callers get consecutive slots
+        now = time.monotonic()
+        start_time = max(now, self._next_time)
+        self._next_time = start_time + self.interval
+        if start_time > now:
+            await asyncio.sleep(start_time - now)
+
+
+def set_rate_limit(requests_per_minute: Optional[float]):
+    """
+    Set the rate limit of all requests sent through the shared OpenAI clients.
+
+    Args:
+        requests_per_minute (Optional[float]): Maximum number of requests per minute, or None to disable the limit
+    """
+    global _rate_limiter
+    _rate_limiter = RateLimiter(requests_per_minute) if requests_per_minute else None
+
+
+async def _throttle_request(request: httpx.Request):
+    """
+    HTTP client hook that waits for the rate limiter before a request is sent.
+
+    Args:
+        request (httpx.Request): The outgoing request
+    """
+    if _rate_limiter is not None:
+        await _rate_limiter.acquire()
+
+
+def set_response_cache(cache_dir: Optional[str]):
+    """
+    Enable or disable the on-disk cache of model responses.
+
+    Args:
+        cache_dir (Optional[str]): Directory of the cache, or None to disable the cache
+    """
+    global _response_cache
+    _response_cache = DiskCache(os.path.join(cache_dir, RESPONSE_CACHE_FILE)) if cache_dir else None
+
+
+class CachingOpenAIChat(OpenAIChat):
+    """
+    An OpenAI chat model that serves repeated requests from the response cache, if it is enabled.
+
+    Requests are identified by the model ID, the messages (including the instructions), the tool
+    schemas and all other request parameters. Cached responses report no token usage. Streaming
+    requests are not cached.
+    """
+
+    def _cache_key(self, messages: List[Message]) -> str:
+        """
+        Get the cache key of a request.
+
+        Args:
+            messages (List[Message]): The messages of the request
+
+        Returns:
+            str: The cache key
+        """
+        request = dict(self.request_kwargs)
+        if isinstance(self.response_format, type) and issubclass(self.response_format, BaseModel):
+            request["response_format"] = self.response_format.model_json_schema()
+        return hash_key({
+            "model": self.id,
+            "messages": [self._format_message(message) for message in messages],
+            "request": request,
+        })
+
+    def _load_response(self, data: Dict[str, Any]):
+        """
+        Rebuild a cached response.
+
+        Args:
+            data (Dict[str, Any]): The cached response as JSON data
+
+        Returns:
+            The response, parsed into the response format if the request uses structured outputs
+        """
+        if self.response_format is not None and self.structured_outputs:
+            return ParsedChatCompletion[self.response_format].model_validate(data)
+        return ChatCompletion.model_validate(data)
+
+    def _get_cached(self, key: str):
+        """
+        Get the cached response of a request.
+
+        Args:
+            key (str): The cache key
+
+        Returns:
+            The response, or None on a cache miss
+        """
+        data = _response_cache.get(key)
+        if data is None:
+            return None
+        try:
+            response = self._load_response(data)
+        except ValueError:
+            return None
+        self._cache_status = CACHE_HIT
+        return response
+
+    def _store(self, key: str, response):
+        """
+        Store the response of a request in the cache.
+
+        Args:
+            key (str): The cache key
+            response: The response
+        """
+        _response_cache.set(key, response.model_dump(mode="json"))
+        self._cache_status = CACHE_MISS
+
+    def invoke(self, messages: List[Message]):
+        """
+        Send a chat completion request, or take its response from the cache.
+
+        Args:
+            messages (List[Message]): The messages to send to the model
+
+        Returns:
+            ChatCompletion: The chat completion response
+        """
+        if _response_cache is None:
+            return super().invoke(messages)
+        key = self._cache_key(messages)
+        response = self._get_cached(key)
+        if response is None:
+            response = super().invoke(messages)
+            self._store(key, response)
+        return response
+
+    async def ainvoke(self, messages: List[Message]):
+        """
+        Send an asynchronous chat completion request, or take its response from the cache.
+
+        Args:
+            messages (List[Message]): The messages to send to the model
+
+        Returns:
+            ChatCompletion: The chat completion response
+        """
+        if _response_cache is None:
+            return await super().ainvoke(messages)
+        key = self._cache_key(messages)
+        response = self._get_cached(key)
+        if response is None:
+            response = await super().ainvoke(messages)
+            self._store(key, response)
+        return response
+
+    def parse_provider_response(self, response):
+        """
+        Parse a chat completion response, reporting its cache status in the usage metrics.
+
+        Args:
+            response: The chat completion response
+
+        Returns:
+            ModelResponse: The parsed response
+        """
+        model_response = super().parse_provider_response(response)
+        cache_status, self._cache_status = getattr(self, "_cache_status", None), None
+        if cache_status is None:
+            return model_response
+
+        usage = response.usage
+        if cache_status == CACHE_HIT or usage is None:
+            model_response.response_usage = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+        else:
+            model_response.response_usage = {
+                "input_tokens": usage.prompt_tokens,
+                "output_tokens": usage.completion_tokens,
+                "total_tokens": usage.total_tokens,
+            }
+        model_response.response_usage["additional_metrics"] = {cache_status: 1}
+        return model_response
+
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """
+    Get the OpenAI client shared by all models running in the current event loop.
+
+    Returns:
+        AsyncOpenAI: The shared client
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS),
+            event_hooks={"request": [_throttle_request]}
+        )
+        client = AsyncOpenAI(http_client=http_client)
+        _async_clients[loop] = client
+    return client
+
+
+async def close_async_openai_client():
+    """
+    Close the OpenAI client shared in the current event loop, if there is one.
+    """
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+def create_model(model_id: str) -> OpenAIChat:
+    """
+    Create an OpenAI chat model that uses the shared client of the current event loop.
+
+    Outside of an event loop, the model falls back to its own client. If the response cache is
+    enabled, the model takes repeated requests from it.
+
+    Args:
+        model_id (str): The OpenAI model ID (e.g. "gpt-4o")
+
+    Returns:
+        OpenAIChat: The model
+    """
+    try:
+        return CachingOpenAIChat(id=model_id, async_client=get_async_openai_client())
+    except RuntimeError:
+        return CachingOpenAIChat(id=model_id)
@@ -0,0 +1,266 @@
+"""
+Context utilities for Gizmo.
+
+This module assembles agent prompts within a token budget. A prompt is built from sections, e.g.
+the research question, the plan and the source material. Required sections are always included in
+full; the remaining budget is shared by the optional sections, and sections that do not fit into
+their share are cut down to the parts most relevant to the current step.
+"""
+
+import re
+from typing import Callable, List, Optional, Tuple
+
+from gizmo.utils.error_utils import logger
+from gizmo.utils.token_utils import estimate_tokens, truncate_to_tokens
+
+# Number of plan entries kept before and after the current step
+PLAN_NEIGHBOURS = 1
+
+# Top-level entries of a numbered Markdown list, e.g. "3. Topic" or "3) Topic"
+_PLAN_ENTRY_PATTERN = re.compile(r'^ ?(\d+)[\.\)]\s', re.MULTILINE)
+
+# Words that carry no meaning for the relevance of a passage
+_STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "into", "is", "it", "its",
+    "of", "on", "or", "such", "that", "the", "their", "these", "this", "to", "what", "which", "with",
+}
+
+# Selects the parts of a section text that fit into a number of tokens
+Selector = Callable[[str, int], str]
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split a text into lowercase words, without stop words.
+
+    Args:
+        text (str): The text
+
+    Returns:
+        List[str]: The words, in order
+    """
+    return [word for word in re.findall(r'[a-z0-9]+', text.lower()) if word not in _STOP_WORDS and len(word) > 1]
+
+
+def relevance(text: str, query_words: set) -> float:
+    """
+    Score how relevant a text is to a query.
+
+    Args:
+        text (str): The text
+        query_words (set): The words of the query, see `tokenize`
+
+    Returns:
+        float: The share of query words that occur in the text, between 0 and 1
+    """
+    if not query_words:
+        return 0.0
+    return len(query_words.intersection(tokenize(text))) / len(query_words)
+
+
+def select_plan_entries(plan: str, step_number: int, neighbours: int = PLAN_NEIGHBOURS) -> str:
+    """
+    Keep the introduction of a plan and the entries around the given step.
+
+    Args:
+        plan (str): The plan in Markdown
+        step_number (int): The number of the current step
+        neighbours (int, optional): Number of entries kept before and after the current step
+
+    Returns:
+        str: The reduced plan, or the full plan if its entries cannot be found
+    """
+    matches = list(_PLAN_ENTRY_PATTERN.finditer(plan))
+    if not matches:
+        return plan
+
+    introduction = plan[:matches[0].start()].strip()
+    kept, omitted = [], 0
+    for index, match in enumerate(matches):
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(plan)
+        if abs(int(match.group(1)) - step_number) <= neighbours:
+            kept.append(plan[match.start():end].strip())
+        else:
+            omitted += 1
+
+    if not omitted:
+        return plan
+    parts = [introduction] if introduction else []
+    parts.extend(kept)
+    parts.append(f"({omitted} other steps of the plan omitted)")
+    return "\n\n".join(parts)
+
+
+def select_relevant_passages(text: str, query: str, max_tokens: int) -> str:
+    """
+    Keep the passages of a text that are most relevant to a query, within a number of tokens.
+
+    Passages are paragraphs and list items. They are ranked by the share of query words they
+    contain, passages without any query word are dropped, and the selected passages are returned
+    in their original order.
+
+    Args:
+        text (str): The text, e.g. the Markdown collected by the source agent
+        query (str): The query, e.g. the topic of the current step
+        max_tokens (int): Maximum number of tokens to keep
+
+    Returns:
+        str: The selected passages
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    passages = [passage.strip() for passage in re.split(r'\n\s*\n|\n(?=\s*[-*] |\s*\d+[\.\)] |#)', text)]
+    passages = [passage for passage in passages if passage]
+    query_words = set(tokenize(query))
+    scores = [relevance(passage, query_words) for passage in passages]
+    ranked = sorted(range(len(passages)), key=lambda index: scores[index], reverse=True)
+    # Passages without any query word are only kept if no passage has one
+    if scores[ranked[0]] > 0:
+        ranked = [index for index in ranked if scores[index] > 0]
+    selected, used = set(), 0
+    for index in ranked:
+        tokens = estimate_tokens(passages[index])
+        if used + tokens > max_tokens:
+            continue
+        selected.add(index)
+        used += tokens
+
+    if not selected:
+        return truncate_to_tokens(passages[ranked[0]], max_tokens)
+    return "\n\n".join(passages[index] for index in sorted(selected))
+
+
+def select_relevant_summaries(summaries: List[str], query: str, max_count: int, recent: int = 0,
+                              max_tokens: Optional[int] = None) -> List[str]:
+    """
+    Select the summaries of previous steps that are most relevant to a step.
+
+    The most recent summaries are always selected; the others are selected by their relevance to
+    the query until `max_count` summaries or `max_tokens` tokens are reached, so the selected context
+    does not grow with the number of previous steps.
+
+    Args:
+        summaries (List[str]): The summaries, oldest first
+        query (str): The query, e.g. the topic of the current step
+        max_count (int): Maximum number of summaries to select
+        recent (int, optional): Number of most recent summaries that are always selected. Defaults to 0.
+        max_tokens (int, optional): Maximum number of tokens of the selected summaries
+
+    Returns:
+        List[str]: The selected summaries, in their original order
+    """
+    if not summaries or max_count <= 0:
+        return []
+
+    query_words = set(tokenize(query))
+    newest_first = list(range(len(summaries) - 1, -1, -1))
+    window = newest_first[:min(recent, max_count)]
+    # Sorting is stable, so equally relevant summaries keep the newest first
+    ranked = window + sorted(newest_first[len(window):],
+                             key=lambda index: relevance(summaries[index], query_words), reverse=True)
+
+    selected, used = [], 0
+    for index in ranked:
+        if len(selected) >= max_count:
+            break
+        tokens = estimate_tokens(summaries[index])
+        if max_tokens is not None and used + tokens > max_tokens:
+            continue
+        selected.append(index)
+        used += tokens
+    return [summaries[index] for index in sorted(selected)]
+
+
+class ContextBuilder:
+    """Assembles the sections of an agent prompt within a token budget."""
+
+    def __init__(self, agent_name: str, max_tokens: int):
+        """
+        Initialize the ContextBuilder.
+
+        Args:
+            agent_name (str): Name of the agent the prompt is for, used for logging
+            max_tokens (int): Maximum number of tokens of the prompt
+        """
+        self.agent_name = agent_name
+        self.max_tokens = max_tokens
+        self.sections = []
+
+    def add_section(self, title: str, text: Optional[str], required: bool = False, weight: float = 1.0,
+                    selector: Optional[Selector] = None):
+        """
+        Add a section to the prompt. Empty sections are skipped.
+
+        Args:
+            title (str): The heading of the section
+            text (str): The content of the section
+            required (bool, optional): Whether the section is always included in full. Defaults to False.
+            weight (float, optional): Share of the remaining budget the section gets relative to the other
+                                      optional sections. Defaults to 1.0.
+            selector (Selector, optional): Cuts the content down to a number of tokens. Defaults to truncation.
+        """
+        if not text:
+            return
+        self.sections.append({
+            "title": title,
+            "text": text,
+            "tokens": estimate_tokens(text),
+            "required": required,
+            "weight": weight,
+            "selector": selector or truncate_to_tokens,
+        })
+
+    def build(self) -> str:
+        """
+        Assemble the prompt, cutting down the optional sections that exceed their share of the budget.
+
+        Returns:
+            str: The prompt with one Markdown section per added section, in the order they were added
+        """
+        available = self.max_tokens - sum(section["tokens"] for section in self.sections if section["required"])
+        allocation = self._allocate(max(0, available))
+
+        parts, trimmed = [], []
+        for section in self.sections:
+            text = section["text"]
+            max_tokens = allocation.get(id(section))
+            if max_tokens is not None and section["tokens"] > max_tokens:
+                text = section["selector"](text, max_tokens) if max_tokens > 0 else ""
+                trimmed.append(f"'{section['title']}' from {section['tokens']} to {estimate_tokens(text)} tokens")
+            if text:
+                parts.append(f"# {section['title']}\n\n{text}\n\n")
+
+        if trimmed:
+            logger.info(f"Trimmed {self.agent_name} context to {self.max_tokens} tokens: {', '.join(trimmed)}")
+        return "".join(parts)
+
+    def _allocate(self, available: int) -> dict:
+        """
+        Share the available tokens among the optional sections by their weights.
+
+        Sections that need less than their share keep their full size, and the tokens they leave
+        are shared among the others.
+
+        Args:
+            available (int): Number of tokens left after the required sections
+
+        Returns:
+            dict: The number of tokens of every optional section, by section ID
+        """
+        allocation = {}
+        pending: List[dict] = [section for section in self.sections if not section["required"]]
+        while pending:
+            total_weight = sum(section["weight"] for section in pending) or 1.0
+            shares: List[Tuple[dict, int]] = [
+                (section, int(available * section["weight"] / total_weight)) for section in pending
+            ]
+            fitting = [section for section, share in shares if section["tokens"] <= share]
+            if not fitting:
+                allocation.update((id(section), share) for section, share in shares)
+                break
+            for section in fitting:
+                allocation[id(section)] = section["tokens"]
+                available -= section["tokens"]
+                pending.remove(section)
+        return allocation
@@ -5,9 +5,9 @@ This module provides utility functions for error handling and recovery strategie
 """
 
 import asyncio
+import contextvars
 import functools
 import logging
-import threading
 import time
 from typing import Callable, Any, Optional, Type, Union, Tuple, TypeVar, Awaitable
 
@@ -17,8 +17,12 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
-# Create a thread-local storage for step context
-_step_context = threading.local()
+# Create a context variable for the step context. Every asyncio task (and thread)
+# sees its own value, so concurrently running steps keep their own log prefix.
+_step_context = contextvars.ContextVar('gizmo_step_context', default=None)
+
+# Create a context variable for the project context, used to tell the projects of a batch apart
+_project_context = contextvars.ContextVar('gizmo_project_context', default=None)
 
 
 class StepLoggerAdapter(logging.LoggerAdapter):
@@ -37,7 +41,7 @@ class StepLoggerAdapter(logging.LoggerAdapter):
 
     def process(self, msg, kwargs):
         """
-        Process the log message to add step information if available.
+        Process the log message to add project and step information if available.
 
         Args:
             msg (str): The log message
@@ -47,10 +51,14 @@ class StepLoggerAdapter(logging.LoggerAdapter):
             tuple: The processed message and kwargs
         """
         # Check if we have step context
-        step_num = getattr(_step_context, 'step_num', None)
+        step_num = _step_context.get()
         if step_num is not None:
             # Add step prefix to the message
             msg = f"[Step #{step_num}] {msg}"
+        # Check if we have project context
+        project = _project_context.get()
+        if project is not None:
+            msg = f"[{project}] {msg}"
         return msg, kwargs
 
 
@@ -61,15 +69,24 @@ def set_step_context(step_num):
     Args:
         step_num (int): The current step number
     """
-    _step_context.step_num = step_num
+    _step_context.set(step_num)
 
 
 def clear_step_context():
     """
     Clear the current step context for logging.
     """
-    if hasattr(_step_context, 'step_num'):
-        delattr(_step_context, 'step_num')
+    _step_context.set(None)
+
+
+def set_project_context(project):
+    """
+    Set the current project context for logging.
+
+    Args:
+        project (str): The name of the current project
+    """
+    _project_context.set(project)
 
 
 # Create the base logger and wrap it with our adapter
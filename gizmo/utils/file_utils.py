@@ -8,6 +8,11 @@ import json
 import os
 import re
 
+from gizmo.utils.error_utils import logger
+
+# Top-level entry of a plan: "1. Topic", "1) Topic", "Step 1: Topic" or a heading like "### 1. Topic"
+_PLAN_STEP_PATTERN = re.compile(r'^\s?(?:#{1,6}\s*)?(?:Step\s+)?(\d+)[\.\):]\s+(.+)$', re.IGNORECASE)
+
 
 def read_file(file_path):
     """
@@ -55,6 +60,28 @@ def write_file(file_path, content):
         raise IOError(f"Error writing to file {file_path}: {str(e)}")
 
 
+def write_file_atomic(file_path, content):
+    """
+    Write content to a file atomically.
+
+    The content is written to a temporary file next to the target, which then replaces the target,
+    so readers never see a partially written file.
+
+    Args:
+        file_path (str): Path to the file to write
+        content (str): Content to write to the file
+
+    Raises:
+        IOError: If there's an error writing to the file
+    """
+    temp_path = f"{file_path}.tmp"
+    write_file(temp_path, content)
+    try:
+        os.replace(temp_path, file_path)
+    except OSError as e:
+        raise IOError(f"Error writing to file {file_path}: {str(e)}")
+
+
 def ensure_dir(directory):
     """
     Ensure a directory exists, creating it if necessary.
@@ -72,20 +99,17 @@ def ensure_dir(directory):
         raise IOError(f"Error creating directory {directory}: {str(e)}")
 
 
-def parse_plan_file(plan_path):
+def find_plan_json(plan_path):
     """
-    Parse a plan file to extract the list of steps.
+    Find the JSON sidecar file of a plan file.
 
     Args:
         plan_path (str): Path to the plan file
 
     Returns:
-        list: List of steps extracted from the plan
-
-    Raises:
-        ValueError: If the plan file doesn't contain a valid list of steps
+        str: Path to the JSON file, or None if the plan has no JSON sidecar
     """
-    # First, check if there's a corresponding JSON file with the new naming convention (with a '.' at the beginning)
+    # Check the new naming convention first (with a '.' at the beginning)
     dir_path, filename = os.path.split(plan_path)
     if filename.endswith(".md"):
         json_filename = "." + filename.replace(".md", ".json")
@@ -97,7 +121,131 @@ def parse_plan_file(plan_path):
     if not os.path.exists(json_path):
         json_path = plan_path.replace(".md", ".json")
 
-    if os.path.exists(json_path):
+    if json_path != plan_path and os.path.exists(json_path):
+        return json_path
+    return None
+
+
+def find_current_plan_json(plan_path):
+    """
+    Find the JSON sidecar file of a plan file, unless it is older than the plan.
+
+    A sidecar older than the plan describes an earlier version of the plan, e.g. before the user
+    edited or renumbered the steps, so neither its topics nor its dependencies apply.
+
+    Args:
+        plan_path (str): Path to the plan file
+
+    Returns:
+        str: Path to the JSON file, or None if the plan has no current JSON sidecar
+    """
+    json_path = find_plan_json(plan_path)
+    if json_path and os.path.getmtime(json_path) < os.path.getmtime(plan_path):
+        return None
+    return json_path
+
+
+def parse_plan_dependencies(plan_path):
+    """
+    Read the step dependencies from the JSON sidecar of a plan file.
+
+    The sidecar is a list of steps, where every step may declare the numbers of the steps it
+    depends on, e.g. `[{"step": 2, "topic": "...", "depends_on": [1]}]`.
+
+    Args:
+        plan_path (str): Path to the plan file
+
+    Returns:
+        dict: The dependencies by step number; empty if the plan has no current sidecar or it declares none
+    """
+    json_path = find_current_plan_json(plan_path)
+    if not json_path:
+        return {}
+
+    try:
+        plan_data = json.loads(read_file(json_path))
+    except (json.JSONDecodeError, IOError):
+        return {}
+    if not isinstance(plan_data, list):
+        return {}
+
+    dependencies = {}
+    for index, item in enumerate(plan_data, start=1):
+        if not isinstance(item, dict) or not isinstance(item.get("depends_on"), list):
+            continue
+        try:
+            dependencies[int(item.get("step", index))] = [int(dep) for dep in item["depends_on"]]
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring malformed dependencies of step {item.get('step', index)} in {json_path}")
+    return dependencies
+
+
+def _format_plan_entry(lines):
+    """
+    Join the lines of a plan entry into a step topic.
+
+    Args:
+        lines (list): The title of the entry, followed by its detail lines
+
+    Returns:
+        str: The title, followed by the details on the same line
+    """
+    title = lines[0].replace("**", "").strip()
+    details = [re.sub(r'^[-*+]\s+', '', line) for line in lines[1:]]
+    if not details:
+        return title
+    separator = " " if title.endswith((".", "?", "!", ":")) else ": "
+    return title + separator + " ".join(details)
+
+
+def _parse_plan_entries(content):
+    """
+    Extract the top-level numbered entries of a plan, together with their indented details.
+
+    Entries may be written as "1. Topic", "1) Topic", "Step 1: Topic" or as headings, e.g.
+    "### 1. Topic". An unindented paragraph after an entry, e.g. a closing remark, ends it.
+
+    Args:
+        content (str): The plan in Markdown
+
+    Returns:
+        list: The step topics, or an empty list if the entries are not numbered 1, 2, 3, ...
+    """
+    entries, current = [], None
+    for line in content.splitlines():
+        stripped = line.strip()
+        match = _PLAN_STEP_PATTERN.match(line) if len(line) - len(line.lstrip()) <= 1 else None
+        if match:
+            # Numbering that restarts or skips is ambiguous, e.g. steps grouped into phases
+            if int(match.group(1)) != len(entries) + 1:
+                return []
+            current = [match.group(2)]
+            entries.append(current)
+        elif current is not None and stripped:
+            if line[0].isspace() or stripped[0] in "-*+":
+                current.append(stripped)
+            else:
+                current = None
+    return [_format_plan_entry(lines) for lines in entries]
+
+
+def parse_plan_file(plan_path):
+    """
+    Parse a plan file to extract the list of steps.
+
+    Args:
+        plan_path (str): Path to the plan file
+
+    Returns:
+        list: List of steps extracted from the plan
+
+    Raises:
+        ValueError: If the plan file doesn't contain a valid list of steps
+    """
+    # First, check if there's a corresponding JSON file that is not older than the plan
+    json_path = find_current_plan_json(plan_path)
+
+    if json_path:
         try:
             # Try to parse the JSON file
             json_content = read_file(json_path)
@@ -108,7 +256,7 @@ def parse_plan_file(plan_path):
 
             if steps:
                 return steps
-        except (json.JSONDecodeError, IOError):
+        except (json.JSONDecodeError, IOError, AttributeError, TypeError):
             # If there's an error parsing the JSON, fall back to the Markdown file
             pass
 
@@ -121,21 +269,16 @@ def parse_plan_file(plan_path):
         steps = [item.get("topic", "") for item in plan_data if item.get("topic")]
         if steps:
             return steps
-    except json.JSONDecodeError:
+    except (json.JSONDecodeError, AttributeError, TypeError):
         # If JSON parsing fails, fall back to regex-based parsing
         pass
 
-    # Extract numbered list items using regex
-    # This pattern matches lines starting with a number followed by a period or parenthesis
-    steps = re.findall(r'^\s*\d+[\.\)]\s*(.+)$', content, re.MULTILINE)
+    # Extract the top-level numbered entries with their details
+    steps = _parse_plan_entries(content)
 
     if not steps:
-        # Try to match Markdown list items (lines starting with *)
-        steps = re.findall(r'^\s*\*\s*(.+)$', content, re.MULTILINE)
-
-    if not steps:
-        # Try to match lines with "Step X:" format
-        steps = re.findall(r'^\s*Step\s+\d+:?\s*(.+)$', content, re.MULTILINE)
+        # Try to match top-level Markdown list items (lines starting with * or -)
+        steps = re.findall(r'^[*-]\s+(.+)$', content, re.MULTILINE)
 
     if not steps:
         raise ValueError(f"Could not extract steps from plan file: {plan_path}")
@@ -143,6 +286,65 @@ def parse_plan_file(plan_path):
     return steps
 
 
+def parse_batch_file(batch_path):
+    """
+    Parse a batch file listing the research projects to run.
+
+    The batch file is a JSON list of projects, e.g.
+    `[{"plan": "dogs/plan.md", "output": "dogs/output", "deep": true}]`. Every project needs a
+    `plan` and an `output`; it may also set `memory` (default: `.memory` inside the output directory),
+    `deep`, `initial_input` (path to a file), `concurrency` and `name`. Relative paths are resolved
+    against the directory of the batch file.
+
+    Args:
+        batch_path (str): Path to the batch file
+
+    Returns:
+        list: The projects as dictionaries with all fields set
+
+    Raises:
+        ValueError: If the batch file is not a valid list of projects
+    """
+    try:
+        batch_data = json.loads(read_file(batch_path))
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Batch file '{batch_path}' is not valid JSON: {str(e)}")
+
+    if not isinstance(batch_data, list):
+        raise ValueError(f"Batch file '{batch_path}' must contain a list of projects")
+
+    base_dir = os.path.dirname(os.path.abspath(batch_path))
+
+    def resolve(path):
+        return path if os.path.isabs(path) else os.path.join(base_dir, path)
+
+    projects = []
+    for index, item in enumerate(batch_data, start=1):
+        if not isinstance(item, dict) or not item.get("plan") or not item.get("output"):
+            raise ValueError(f"Project #{index} of batch file '{batch_path}' needs a 'plan' and an 'output'")
+        output_dir = resolve(item["output"])
+        projects.append({
+            "name": item.get("name") or f"project{index}",
+            "plan": resolve(item["plan"]),
+            "output": output_dir,
+            "memory": resolve(item["memory"]) if item.get("memory") else os.path.join(output_dir, ".memory"),
+            "deep": bool(item.get("deep", False)),
+            "initial_input": resolve(item["initial_input"]) if item.get("initial_input") else None,
+            "concurrency": int(item.get("concurrency", 1)),
+        })
+
+    # Projects writing to the same directories would overwrite each other's files
+    for key in ("output", "memory"):
+        directories = [os.path.normpath(project[key]) for project in projects]
+        if len(set(directories)) != len(directories):
+            raise ValueError(f"The projects of batch file '{batch_path}' must use different {key} directories")
+    names = [project["name"] for project in projects]
+    if len(set(names)) != len(names):
+        raise ValueError(f"The projects of batch file '{batch_path}' must have different names")
+
+    return projects
+
+
 def formulate_search_query(step):
     """
     Formulate a search query from a step description.
@@ -0,0 +1,296 @@
+"""
+Run manifest utilities for Gizmo.
+
+This module provides the run manifest, a JSON file in the memory directory that records the
+progress of a research run: the hash of the plan, the parsed steps, the status of every step,
+the artifacts it produced and its usage metrics. The manifest allows an interrupted run to be
+resumed without redoing the steps that were already completed.
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from gizmo.utils.error_utils import logger
+from gizmo.utils.file_utils import read_file, write_file_atomic
+
+# Name of the manifest file inside the memory directory
+MANIFEST_FILENAME = "run_manifest.json"
+
+# Version of the manifest format
+MANIFEST_VERSION = 1
+
+# Step statuses
+STEP_PENDING = "pending"
+STEP_RUNNING = "running"
+STEP_COMPLETED = "completed"
+STEP_FAILED = "failed"
+
+
+def hash_text(text: Optional[str]) -> str:
+    """
+    Compute a stable hash of a text.
+
+    Args:
+        text (Optional[str]): The text to hash
+
+    Returns:
+        str: The hex digest of the SHA-256 hash of the text
+    """
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def step_fingerprint(step: Dict[str, Any], input_hash: str, deep: bool, dag: bool = False) -> str:
+    """
+    Compute the fingerprint of a parsed plan step.
+
+    Two runs produce the same result for a step only if its fingerprint is the same: the topic, the
+    position in the plan, the initial input and the research mode. When the steps are scheduled by
+    their dependencies, the declared dependencies are part of the fingerprint too; otherwise they do
+    not change what the step sees, so a step whose dependencies changed is not researched again.
+
+    Args:
+        step (Dict[str, Any]): The parsed step
+        input_hash (str): Hash of the initial input of the research
+        deep (bool): Whether the run uses GPT Researcher for deep research
+        dag (bool, optional): Whether the run schedules the steps by their dependencies. Defaults to False.
+
+    Returns:
+        str: The hex digest of the fingerprint
+    """
+    fingerprint = {
+        "step": step["step"],
+        "topic": step["topic"],
+        "input_hash": input_hash,
+        "deep": deep,
+    }
+    if dag:
+        fingerprint["depends_on"] = sorted(step.get("depends_on") or [])
+    return hash_text(json.dumps(fingerprint, sort_keys=True))
+
+
+class RunManifest:
+    """The manifest of a research run, stored as JSON in the memory directory."""
+
+    def __init__(self, path: str, data: Dict[str, Any]):
+        """
+        Initialize the RunManifest.
+
+        Args:
+            path (str): Path to the manifest file, or None to keep the manifest in memory only
+            data (Dict[str, Any]): The manifest content
+        """
+        self.path = path
+        self.data = data
+
+    @classmethod
+    def create(cls, memory_dir: str, plan_hash: str, input_hash: str, plan_path: str, output_dir: str,
+               deep: bool) -> "RunManifest":
+        """
+        Create a new, empty manifest for a run.
+
+        Args:
+            memory_dir (str): Directory to save intermediate files
+            plan_hash (str): Hash of the plan content
+            input_hash (str): Hash of the initial input of the research
+            plan_path (str): Path to the plan file
+            output_dir (str): Directory to save the output files
+            deep (bool): Whether the run uses GPT Researcher for deep research
+
+        Returns:
+            RunManifest: The new manifest
+        """
+        now = time.time()
+        data = {
+            "version": MANIFEST_VERSION,
+            "plan_hash": plan_hash,
+            "input_hash": input_hash,
+            "plan_path": plan_path,
+            "output_dir": output_dir,
+            "deep": deep,
+            "status": STEP_RUNNING,
+            "created_at": now,
+            "updated_at": now,
+            "plan_steps": [],
+            "steps": {},
+            "final_summary": {"status": STEP_PENDING},
+            "metrics": {},
+        }
+        return cls(os.path.join(memory_dir, MANIFEST_FILENAME), data)
+
+    @classmethod
+    def in_memory(cls) -> "RunManifest":
+        """
+        Create a manifest that is never written to disk.
+
+        Workers use it to collect the state of the step they execute, which the coordinator
+        then records in the real manifest.
+
+        Returns:
+            RunManifest: The new manifest
+        """
+        return cls(None, {"steps": {}, "final_summary": {"status": STEP_PENDING}, "metrics": {}})
+
+    @classmethod
+    def load(cls, memory_dir: str) -> Optional["RunManifest"]:
+        """
+        Load the manifest of a previous run.
+
+        Args:
+            memory_dir (str): Directory containing the intermediate files
+
+        Returns:
+            Optional[RunManifest]: The manifest, or None if there is no valid manifest
+        """
+        path = os.path.join(memory_dir, MANIFEST_FILENAME)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            data = json.loads(read_file(path))
+        except (json.JSONDecodeError, IOError) as e:
+            logger.warning(f"Ignoring unreadable run manifest '{path}': {str(e)}")
+            return None
+
+        if data.get("version") != MANIFEST_VERSION:
+            logger.warning(f"Ignoring run manifest '{path}' with unsupported version {data.get('version')}")
+            return None
+
+        return cls(path, data)
+
+    def matches(self, plan_hash: str, input_hash: str, deep: bool) -> bool:
+        """
+        Check whether the manifest belongs to a run of the given plan, initial input and mode.
+
+        Args:
+            plan_hash (str): Hash of the plan content
+            input_hash (str): Hash of the initial input of the research
+            deep (bool): Whether the run uses GPT Researcher for deep research
+
+        Returns:
+            bool: True if the manifest was written for the same plan, initial input and mode
+        """
+        return (self.data.get("plan_hash") == plan_hash
+                and self.data.get("input_hash") == input_hash
+                and self.data.get("deep") == deep)
+
+    def update_plan(self, plan_hash: str, input_hash: str, deep: bool):
+        """
+        Record that the run continues with a changed plan, initial input or mode.
+
+        Args:
+            plan_hash (str): Hash of the plan content
+            input_hash (str): Hash of the initial input of the research
+            deep (bool): Whether the run uses GPT Researcher for deep research
+        """
+        self.data.update(plan_hash=plan_hash, input_hash=input_hash, deep=deep, status=STEP_RUNNING)
+
+    def save(self):
+        """
+        Write the manifest to disk atomically.
+        """
+        self.data["updated_at"] = time.time()
+        if self.path is None:
+            return
+        write_file_atomic(self.path, json.dumps(self.data, indent=2))
+
+    def get_plan_steps(self) -> List[Dict[str, Any]]:
+        """
+        Get the parsed plan steps recorded in the manifest.
+
+        Returns:
+            List[Dict[str, Any]]: The parsed steps
+        """
+        return self.data.get("plan_steps", [])
+
+    def set_plan_steps(self, steps: List[Dict[str, Any]]):
+        """
+        Record the parsed plan steps, keeping the state of steps that already exist.
+
+        Args:
+            steps (List[Dict[str, Any]]): The parsed steps
+        """
+        self.data["plan_steps"] = steps
+        for step in steps:
+            self.data["steps"].setdefault(str(step["step"]), {
+                "topic": step["topic"],
+                "status": STEP_PENDING,
+                "artifacts": {},
+                "metrics": {},
+            })
+
+    def get_step(self, step_number: int) -> Dict[str, Any]:
+        """
+        Get the recorded state of a step.
+
+        Args:
+            step_number (int): The step number
+
+        Returns:
+            Dict[str, Any]: The state of the step, empty if the step is unknown
+        """
+        return self.data["steps"].get(str(step_number), {})
+
+    def update_step(self, step_number: int, **fields):
+        """
+        Update the recorded state of a step and save the manifest.
+
+        Args:
+            step_number (int): The step number
+            **fields: The fields to update (e.g. status, artifacts, metrics, error)
+        """
+        step = self.data["steps"].setdefault(str(step_number), {})
+        step.update(fields)
+        step["updated_at"] = time.time()
+        self.save()
+
+    def remove_step(self, step_number: int) -> Dict[str, Any]:
+        """
+        Forget a step that is no longer part of the plan.
+
+        Args:
+            step_number (int): The step number
+
+        Returns:
+            Dict[str, Any]: The last recorded state of the step, empty if the step is unknown
+        """
+        return self.data["steps"].pop(str(step_number), {})
+
+    def is_step_completed(self, step_number: int) -> bool:
+        """
+        Check whether a step was completed and all of its artifacts are still on disk.
+
+        Args:
+            step_number (int): The step number
+
+        Returns:
+            bool: True if the step can be skipped
+        """
+        step = self.get_step(step_number)
+        if step.get("status") != STEP_COMPLETED:
+            return False
+        artifacts = step.get("artifacts", {})
+        return bool(artifacts) and all(os.path.exists(path) for path in artifacts.values())
+
+    def update_final_summary(self, **fields):
+        """
+        Update the recorded state of the final summary and save the manifest.
+
+        Args:
+            **fields: The fields to update (e.g. status, path, error)
+        """
+        self.data["final_summary"].update(fields)
+        self.save()
+
+    def complete(self, metrics: Dict[str, Any]):
+        """
+        Mark the run as completed and save the manifest.
+
+        Args:
+            metrics (Dict[str, Any]): The accumulated metrics of the run
+        """
+        self.data["status"] = STEP_COMPLETED
+        self.data["metrics"] = dict(metrics)
+        self.save()
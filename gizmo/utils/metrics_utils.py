@@ -4,6 +4,7 @@ Metrics utilities for Gizmo.
 This module provides utilities for tracking and accumulating usage metrics
 from agno RunResponse objects.
 """
+import threading
 from typing import Dict, Any
 
 
@@ -12,16 +13,23 @@ class UsageAccumulator:
     A class for accumulating usage metrics from agno RunResponse objects.
     
     This class tracks metrics such as total tokens used and model time
-    across multiple RunResponse objects.
+    across multiple RunResponse objects, as well as the costs reported by
+    GPT Researcher and the hits and misses of the model response cache.
+    Recording is thread-safe, so a single accumulator can be shared by steps
+    running concurrently.
     """
     
     def __init__(self):
         """
         Initialize a new UsageAccumulator with zero metrics.
         """
+        self._lock = threading.Lock()
         self.overall_metrics = {
             'total_tokens': 0,
-            'model_time': 0
+            'model_time': 0,
+            'total_cost': 0.0,
+            'cache_hits': 0,
+            'cache_misses': 0
         }
     
     def record(self, response):
@@ -33,11 +41,38 @@ class UsageAccumulator:
         """
         if response.metrics:
             metrics = response.metrics
-            if 'total_tokens' in metrics and metrics['total_tokens']:
-                self.overall_metrics['total_tokens'] += metrics['total_tokens'][0]
-            if 'time' in metrics and metrics['time']:
-                self.overall_metrics['model_time'] += metrics['time'][0]
+            with self._lock:
+                if 'total_tokens' in metrics and metrics['total_tokens']:
+                    self.overall_metrics['total_tokens'] += metrics['total_tokens'][0]
+                if 'time' in metrics and metrics['time']:
+                    self.overall_metrics['model_time'] += metrics['time'][0]
+                # Cache statuses of the model responses, one entry per response
+                for additional_metrics in metrics.get('additional_metrics') or []:
+                    for key in ('cache_hits', 'cache_misses'):
+                        self.overall_metrics[key] += additional_metrics.get(key, 0)
     
+    def record_cost(self, cost):
+        """
+        Record a cost in USD, e.g. the costs of a GPT Researcher instance.
+
+        Args:
+            cost (float): The cost to record
+        """
+        if cost:
+            with self._lock:
+                self.overall_metrics['total_cost'] += cost
+
+    def add_metrics(self, metrics: Dict[str, Any]):
+        """
+        Add metrics accumulated elsewhere, e.g. by a worker process.
+
+        Args:
+            metrics (Dict[str, Any]): Metrics as returned by get_metrics
+        """
+        with self._lock:
+            for key in self.overall_metrics:
+                self.overall_metrics[key] += metrics.get(key) or 0
+
     def get_metrics(self) -> Dict[str, Any]:
         """
         Get the accumulated metrics.
@@ -53,5 +88,8 @@ class UsageAccumulator:
         """
         self.overall_metrics = {
             'total_tokens': 0,
-            'model_time': 0
+            'model_time': 0,
+            'total_cost': 0.0,
+            'cache_hits': 0,
+            'cache_misses': 0
         }
\ No newline at end of file
@@ -0,0 +1,367 @@
+"""
+Work queue utilities for Gizmo.
+
+This module provides a durable work queue backed by a SQLite database. A coordinator enqueues the
+steps of a research run, and worker processes, on the same machine or on machines sharing the
+filesystem, claim, execute and complete them. A claimed job carries a lease that the worker renews
+while it is busy; if a worker dies, its job becomes claimable again once the lease expires. A job
+whose workers keep dying, e.g. because the step runs out of memory, fails after a maximum number
+of attempts.
+
+The queue methods are blocking: they wait up to 30 seconds for other processes to release the
+database. Async callers should run them in a thread, e.g. with `asyncio.to_thread`.
+"""
+
+import contextlib
+import json
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+
+from gizmo.utils.error_utils import logger
+
+# Job statuses
+JOB_PENDING = "pending"
+JOB_CLAIMED = "claimed"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+# Statuses of jobs that will not change anymore
+FINAL_JOB_STATUSES = (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)
+
+# Seconds a claimed job stays reserved for a worker without a heartbeat
+DEFAULT_LEASE_SECONDS = 600
+
+# Number of times a job is claimed before it fails if its workers never finish it
+DEFAULT_MAX_ATTEMPTS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    step INTEGER NOT NULL,
+    depends_on TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_expires_at REAL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_run_status ON jobs (run_id, status);
+"""
+
+
+def new_worker_id() -> str:
+    """
+    Create an identifier for a worker process.
+
+    Returns:
+        str: The host name, process ID and a random suffix
+    """
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class WorkQueue:
+    """A durable queue of research step jobs stored in a SQLite database."""
+
+    def __init__(self, path: str, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        """
+        Initialize the WorkQueue, creating the database if needed.
+
+        Args:
+            path (str): Path to the SQLite database file
+            lease_seconds (float, optional): Seconds a claimed job stays reserved without a heartbeat.
+                                             Defaults to DEFAULT_LEASE_SECONDS.
+            max_attempts (int, optional): Number of times a job is claimed before it fails if its lease keeps
+                                          expiring. Defaults to DEFAULT_MAX_ATTEMPTS.
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        Open a connection to the queue database and close it afterwards.
+
+        Every operation uses its own short-lived connection, so the queue can be shared by
+        several processes and threads.
+
+        Yields:
+            sqlite3.Connection: The connection, in autocommit mode
+        """
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def enqueue(self, run_id: str, step: int, payload: Dict[str, Any], depends_on: List[int] = None) -> int:
+        """
+        Add a step job to the queue.
+
+        Args:
+            run_id (str): The research run the job belongs to
+            step (int): The step number
+            payload (Dict[str, Any]): Everything a worker needs to execute the step
+            depends_on (List[int], optional): Steps of the same run that have to be done first
+
+        Returns:
+            int: The job ID
+        """
+        now = time.time()
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "INSERT INTO jobs (run_id, step, depends_on, payload, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (run_id, step, json.dumps(depends_on or []), json.dumps(payload), JOB_PENDING, now, now)
+            )
+            return cursor.lastrowid
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Claim the oldest job that is ready to run.
+
+        A job is ready if it is pending, or claimed with an expired lease, and all the jobs it
+        depends on are done. A job with an expired lease that was already claimed max_attempts times
+        is marked as failed instead.
+
+        Args:
+            worker_id (str): The claiming worker
+
+        Returns:
+            Optional[Dict[str, Any]]: The claimed job, or None if no job is ready
+        """
+        now = time.time()
+        with self._connect() as connection:
+            # Take the write lock up front, so two workers cannot claim the same job
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                return self._claim_ready_job(connection, worker_id, now)
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+
+    def _claim_ready_job(self, connection: sqlite3.Connection, worker_id: str,
+                         now: float) -> Optional[Dict[str, Any]]:
+        """
+        Claim the oldest ready job inside an open write transaction and commit it.
+
+        Args:
+            connection (sqlite3.Connection): The connection holding the write lock
+            worker_id (str): The claiming worker
+            now (float): The current time
+
+        Returns:
+            Optional[Dict[str, Any]]: The claimed job, or None if no job is ready
+        """
+        candidates = connection.execute(
+            "SELECT * FROM jobs WHERE status = ? OR (status = ? AND lease_expires_at < ?) ORDER BY id",
+            (JOB_PENDING, JOB_CLAIMED, now)
+        ).fetchall()
+        for row in candidates:
+            if row["status"] == JOB_CLAIMED and row["attempts"] >= self.max_attempts:
+                connection.execute(
+                    "UPDATE jobs SET status = ?, error = ?, lease_expires_at = NULL, updated_at = ? WHERE id = ?",
+                    (JOB_FAILED, f"Abandoned after {row['attempts']} attempts: the worker stopped before "
+                                 f"finishing the step", now, row["id"])
+                )
+                logger.warning(f"Step {row['step']} of run {row['run_id']} failed after {row['attempts']} attempts")
+                continue
+            depends_on = json.loads(row["depends_on"])
+            if depends_on and not self._dependencies_done(connection, row["run_id"], depends_on):
+                continue
+            connection.execute(
+                "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, lease_expires_at = ?, "
+                "updated_at = ? WHERE id = ?",
+                (JOB_CLAIMED, worker_id, now + self.lease_seconds, now, row["id"])
+            )
+            connection.execute("COMMIT")
+            job = self._row_to_job(row)
+            job.update(status=JOB_CLAIMED, worker=worker_id, attempts=row["attempts"] + 1)
+            return job
+        connection.execute("COMMIT")
+        return None
+
+    def _dependencies_done(self, connection: sqlite3.Connection, run_id: str, depends_on: List[int]) -> bool:
+        """
+        Check whether the jobs of the given steps of a run are all done.
+
+        Steps without a job in the queue (e.g. steps restored from a previous run) count as done.
+
+        Args:
+            connection (sqlite3.Connection): The open connection
+            run_id (str): The research run
+            depends_on (List[int]): The step numbers
+
+        Returns:
+            bool: True if none of the steps is still waiting or running
+        """
+        placeholders = ", ".join("?" for _ in depends_on)
+        row = connection.execute(
+            f"SELECT COUNT(*) FROM jobs WHERE run_id = ? AND step IN ({placeholders}) "
+            f"AND status NOT IN (?, ?, ?)",
+            (run_id, *depends_on, *FINAL_JOB_STATUSES)
+        ).fetchone()
+        return row[0] == 0
+
+    def heartbeat(self, job_id: int, worker_id: str) -> bool:
+        """
+        Renew the lease of a claimed job.
+
+        Args:
+            job_id (int): The job ID
+            worker_id (str): The worker holding the job
+
+        Returns:
+            bool: False if the job is no longer held by the worker (e.g. it was cancelled)
+        """
+        now = time.time()
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET lease_expires_at = ?, updated_at = ? WHERE id = ? AND worker = ? AND status = ?",
+                (now + self.lease_seconds, now, job_id, worker_id, JOB_CLAIMED)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id: int, worker_id: str, result: Dict[str, Any]) -> bool:
+        """
+        Mark a claimed job as completed.
+
+        Args:
+            job_id (int): The job ID
+            worker_id (str): The worker holding the job
+            result (Dict[str, Any]): The result of the job
+
+        Returns:
+            bool: False if the job is no longer held by the worker
+        """
+        return self._finish(job_id, worker_id, JOB_COMPLETED, result=json.dumps(result))
+
+    def fail(self, job_id: int, worker_id: str, error: str) -> bool:
+        """
+        Mark a claimed job as failed.
+
+        Args:
+            job_id (int): The job ID
+            worker_id (str): The worker holding the job
+            error (str): The error message
+
+        Returns:
+            bool: False if the job is no longer held by the worker
+        """
+        return self._finish(job_id, worker_id, JOB_FAILED, error=error)
+
+    def _finish(self, job_id: int, worker_id: str, status: str, result: str = None, error: str = None) -> bool:
+        """
+        Set the final status of a claimed job.
+
+        Args:
+            job_id (int): The job ID
+            worker_id (str): The worker holding the job
+            status (str): The final status
+            result (str, optional): The result of the job as JSON
+            error (str, optional): The error message
+
+        Returns:
+            bool: False if the job is no longer held by the worker
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, lease_expires_at = NULL, updated_at = ? "
+                "WHERE id = ? AND worker = ? AND status = ?",
+                (status, result, error, time.time(), job_id, worker_id, JOB_CLAIMED)
+            )
+            return cursor.rowcount == 1
+
+    def cancel_run(self, run_id: str) -> int:
+        """
+        Cancel all jobs of a run that are not done yet.
+
+        Args:
+            run_id (str): The research run
+
+        Returns:
+            int: The number of cancelled jobs
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET status = ?, lease_expires_at = NULL, updated_at = ? "
+                "WHERE run_id = ? AND status IN (?, ?)",
+                (JOB_CANCELLED, time.time(), run_id, JOB_PENDING, JOB_CLAIMED)
+            )
+            return cursor.rowcount
+
+    def get_jobs(self, run_id: str) -> List[Dict[str, Any]]:
+        """
+        Get all jobs of a run.
+
+        Args:
+            run_id (str): The research run
+
+        Returns:
+            List[Dict[str, Any]]: The jobs, in the order they were enqueued
+        """
+        with self._connect() as connection:
+            rows = connection.execute("SELECT * FROM jobs WHERE run_id = ? ORDER BY id", (run_id,)).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def has_open_jobs(self) -> bool:
+        """
+        Check whether any job is waiting or running.
+
+        Returns:
+            bool: True if there are pending or claimed jobs
+        """
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (JOB_PENDING, JOB_CLAIMED)
+            ).fetchone()
+        return row[0] > 0
+
+    def completed_steps(self, run_id: str) -> List[int]:
+        """
+        Get the step numbers of the completed jobs of a run.
+
+        Args:
+            run_id (str): The research run
+
+        Returns:
+            List[int]: The step numbers
+        """
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT step FROM jobs WHERE run_id = ? AND status = ? ORDER BY step", (run_id, JOB_COMPLETED)
+            ).fetchall()
+        return [row["step"] for row in rows]
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+        """
+        Convert a database row to a job dictionary.
+
+        Args:
+            row (sqlite3.Row): The row
+
+        Returns:
+            Dict[str, Any]: The job with its JSON fields decoded
+        """
+        job = dict(row)
+        job["depends_on"] = json.loads(job["depends_on"])
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
@@ -0,0 +1,196 @@
+"""
+Similarity utilities for Gizmo.
+
+This module finds near-duplicate texts, e.g. the search queries of two plan steps that only differ
+in wording. Texts are reduced to sets of word shingles, and a MinHash index with locality-sensitive
+hashing finds the candidates that share shingles with a query without comparing it to every indexed
+text. The candidates are then ranked by the Jaccard similarity of their shingles.
+"""
+
+import hashlib
+import random
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+
+from gizmo.utils.context_utils import tokenize
+
+# Number of hash functions of a MinHash signature
+NUM_PERMUTATIONS = 64
+
+# Number of bands the signatures are split into for locality-sensitive hashing. With 16 bands of 4
+# rows, texts with a similarity of 0.5 become candidates with a probability of about 0.65, and
+# texts with a similarity of 0.8 with a probability of more than 0.99.
+NUM_BANDS = 16
+
+# Modulus of the hash functions, a Mersenne prime larger than the shingle hashes
+_PRIME = (1 << 61) - 1
+
+# Fixed seed, so that signatures are the same in every process
+_SEED = 1
+
+
+def stem(word: str) -> str:
+    """
+    Reduce a word to a crude stem, so that e.g. "effects" and "effect" are the same shingle.
+
+    Args:
+        word (str): The lowercase word
+
+    Returns:
+        str: The stem
+    """
+    for suffix in ("ing", "ies", "es", "s", "ed"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def content_words(text: str) -> Set[str]:
+    """
+    Get the content words of a text: its stemmed words without stop words.
+
+    Args:
+        text (str): The text
+
+    Returns:
+        Set[str]: The stemmed words
+    """
+    return {stem(word) for word in tokenize(text)}
+
+
+def shingles(text: str) -> Set[str]:
+    """
+    Get the shingles of a text: its stemmed words without stop words, and their pairs.
+
+    Args:
+        text (str): The text
+
+    Returns:
+        Set[str]: The shingles
+    """
+    words = [stem(word) for word in tokenize(text)]
+    return set(words) | {f"{first} {second}" for first, second in zip(words, words[1:])}
+
+
+def jaccard(first: Set[str], second: Set[str]) -> float:
+    """
+    Get the Jaccard similarity of two shingle sets.
+
+    Args:
+        first (Set[str]): The first set
+        second (Set[str]): The second set
+
+    Returns:
+        float: The size of the intersection divided by the size of the union, between 0 and 1
+    """
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+class MinHashIndex:
+    """An index of texts that finds the indexed texts most similar to a query."""
+
+    def __init__(self, num_permutations: int = NUM_PERMUTATIONS, num_bands: int = NUM_BANDS):
+        """
+        Initialize the MinHashIndex.
+
+        Args:
+            num_permutations (int, optional): Number of hash functions of a signature
+            num_bands (int, optional): Number of bands for locality-sensitive hashing; must divide num_permutations
+
+        Raises:
+            ValueError: If num_bands does not divide num_permutations
+        """
+        if num_permutations % num_bands:
+            raise ValueError("The number of bands must divide the number of permutations")
+        self.rows = num_permutations // num_bands
+        generator = random.Random(_SEED)
+        self._coefficients = [
+            (generator.randrange(1, _PRIME), generator.randrange(0, _PRIME)) for _ in range(num_permutations)
+        ]
+        self._buckets: List[Dict[Tuple[int, ...], List[Hashable]]] = [{} for _ in range(num_bands)]
+        self._shingles: Dict[Hashable, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._shingles)
+
+    def _signature(self, shingle_set: Set[str]) -> List[int]:
+        """
+        Compute the MinHash signature of a shingle set.
+
+        Args:
+            shingle_set (Set[str]): The shingles
+
+        Returns:
+            List[int]: The minimum of every hash function over the shingles
+        """
+        hashes = [int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=7).digest(), "big")
+                  for shingle in shingle_set]
+        return [min((a * value + b) % _PRIME for value in hashes) for a, b in self._coefficients]
+
+    def _bands(self, signature: List[int]):
+        """
+        Split a signature into the keys of its bands.
+
+        Args:
+            signature (List[int]): The signature
+
+        Yields:
+            Tuple[int, Tuple[int, ...]]: The band number and its key
+        """
+        for band in range(len(self._buckets)):
+            yield band, tuple(signature[band * self.rows:(band + 1) * self.rows])
+
+    def content_words(self, key: Hashable) -> Set[str]:
+        """
+        Get the content words of an indexed text, see `content_words`.
+
+        Args:
+            key (Hashable): The key of the text
+
+        Returns:
+            Set[str]: The stemmed words of the text without stop words, empty if the key is not indexed
+        """
+        # Shingles without a space are the single words of the text
+        return {shingle for shingle in self._shingles.get(key, ()) if " " not in shingle}
+
+    def add(self, key: Hashable, text: str):
+        """
+        Add a text to the index. Texts without shingles are not indexed.
+
+        Args:
+            key (Hashable): The key the text is found by, e.g. a step number
+            text (str): The text
+        """
+        shingle_set = shingles(text)
+        if not shingle_set or key in self._shingles:
+            return
+        self._shingles[key] = shingle_set
+        for band, band_key in self._bands(self._signature(shingle_set)):
+            self._buckets[band].setdefault(band_key, []).append(key)
+
+    def most_similar(self, text: str, min_similarity: float = 0.0) -> Optional[Tuple[Hashable, float]]:
+        """
+        Find the indexed text most similar to a text.
+
+        Args:
+            text (str): The text
+            min_similarity (float, optional): Minimum Jaccard similarity of a match. Defaults to 0.0.
+
+        Returns:
+            Optional[Tuple[Hashable, float]]: The key of the most similar text and its similarity, or None
+                                              if no candidate is similar enough
+        """
+        shingle_set = shingles(text)
+        if not shingle_set:
+            return None
+        candidates = set()
+        for band, band_key in self._bands(self._signature(shingle_set)):
+            candidates.update(self._buckets[band].get(band_key, []))
+
+        best = None
+        for key in candidates:
+            similarity = jaccard(shingle_set, self._shingles[key])
+            if similarity >= min_similarity and (best is None or similarity > best[1]):
+                best = (key, similarity)
+        return best
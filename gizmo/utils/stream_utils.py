@@ -0,0 +1,147 @@
+"""
+Streaming utilities for Gizmo.
+
+This module lets agents write their output while it is generated. The text is appended to a
+`.partial` file next to the final file, which is atomically renamed to the final file once the
+output is complete, so readers see either a growing `.partial` file or the finished file.
+"""
+
+import os
+from typing import Any, Callable, Dict, Optional
+
+from gizmo.utils.error_utils import logger
+
+# Suffix of the file an output is streamed to while it is generated
+PARTIAL_SUFFIX = ".partial"
+
+# Called with the path of the final file, the number of characters written so far and whether the file is done
+ProgressCallback = Callable[[str, int, bool], None]
+
+
+class PartialFile:
+    """An output file that is written incrementally and published atomically."""
+
+    def __init__(self, path: str, progress_callback: Optional[ProgressCallback] = None):
+        """
+        Initialize the PartialFile and create an empty `.partial` file.
+
+        Args:
+            path (str): Path of the final file
+            progress_callback (ProgressCallback, optional): Called after every write and once the file is done
+        """
+        self.path = path
+        self.partial_path = path + PARTIAL_SUFFIX
+        self.progress_callback = progress_callback
+        self.written = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.partial_path, 'w', encoding='utf-8')
+
+    def write(self, text: str):
+        """
+        Append text to the `.partial` file and make it visible to readers right away.
+
+        Args:
+            text (str): The text to append
+        """
+        if not text:
+            return
+        self._file.write(text)
+        self._file.flush()
+        self.written += len(text)
+        self._notify(False)
+
+    def commit(self, content: Optional[str] = None):
+        """
+        Finish the file and atomically rename it to its final path.
+
+        Args:
+            content (str, optional): The complete content, replacing what was streamed. The streamed
+                                     text can differ from the final output, e.g. if a tool was called.
+        """
+        if content is not None:
+            self._file.seek(0)
+            self._file.truncate()
+            self._file.write(content)
+            self.written = len(content)
+        self._file.close()
+        os.replace(self.partial_path, self.path)
+        self._notify(True)
+
+    def discard(self):
+        """
+        Remove the `.partial` file without publishing it.
+        """
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+
+    def _notify(self, done: bool):
+        """
+        Report the progress to the callback, if any.
+
+        Args:
+            done (bool): Whether the file is complete
+        """
+        if self.progress_callback is None:
+            return
+        try:
+            self.progress_callback(self.path, self.written, done)
+        except Exception as e:
+            logger.warning(f"Progress callback failed for '{self.path}': {str(e)}")
+
+
+async def astream_agent(agent, message: str, path: str, progress_callback: Optional[ProgressCallback] = None):
+    """
+    Run an agent with streaming and write its output to a file while it is generated.
+
+    Args:
+        agent (Agent): The agno agent to run
+        message (str): The input message
+        path (str): Path of the output file
+        progress_callback (ProgressCallback, optional): Called as the output file grows
+
+    Returns:
+        RunResponse: The complete response, including its metrics
+    """
+    partial_file = PartialFile(path, progress_callback)
+    try:
+        async for chunk in await agent.arun(message, stream=True):
+            if isinstance(chunk.content, str):
+                partial_file.write(chunk.content)
+        response = agent.run_response
+        partial_file.commit(response.content)
+        return response
+    except BaseException:
+        partial_file.discard()
+        raise
+
+
+class ReportStreamWriter:
+    """
+    A websocket-like receiver for GPT Researcher that writes the report chunks to a partial file.
+
+    GPT Researcher sends the report as it is generated through the `send_json` method of its
+    websocket; all other messages are ignored.
+    """
+
+    def __init__(self, partial_file: PartialFile):
+        """
+        Initialize the ReportStreamWriter.
+
+        Args:
+            partial_file (PartialFile): The file to write the report chunks to
+        """
+        self.partial_file = partial_file
+
+    async def send_json(self, data: Dict[str, Any]):
+        """
+        Receive a message from GPT Researcher.
+
+        Args:
+            data (Dict[str, Any]): The message
+        """
+        if data.get("type") == "report" and isinstance(data.get("output"), str):
+            self.partial_file.write(data["output"])
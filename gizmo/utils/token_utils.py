@@ -0,0 +1,98 @@
+"""
+Token utilities for Gizmo.
+
+This module estimates how many tokens a text takes up in a model's context. If tiktoken is
+installed and its encoding was loaded with `load_encoding`, the texts are tokenized with the
+encoding of the OpenAI models; otherwise the number of tokens is approximated from the number of
+characters. Loading the encoding may download it, so the workflows load it once at startup, off
+the event loop.
+"""
+
+import threading
+
+from gizmo.utils.error_utils import logger
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Encoding used by the OpenAI chat models
+ENCODING_NAME = "cl100k_base"
+
+# Average number of characters per token of English text, used without tiktoken
+CHARS_PER_TOKEN = 4
+
+
+# The loaded encoding, and whether loading it was already attempted
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def load_encoding():
+    """
+    Load the tiktoken encoding once. The first call may download the encoding and blocks, so call
+    it off the event loop, e.g. with `asyncio.to_thread(load_encoding)`.
+
+    Returns:
+        The encoding, or None if tiktoken is not installed or the encoding cannot be loaded
+    """
+    global _encoding, _encoding_loaded
+    with _encoding_lock:
+        if not _encoding_loaded:
+            if tiktoken is not None:
+                try:
+                    _encoding = tiktoken.get_encoding(ENCODING_NAME)
+                except Exception as e:
+                    logger.warning(f"Could not load the tiktoken encoding, estimating tokens from characters: {str(e)}")
+            _encoding_loaded = True
+        return _encoding
+
+
+def _get_encoding():
+    """
+    Get the tiktoken encoding without loading it.
+
+    Returns:
+        The encoding, or None if it was not loaded with `load_encoding` or cannot be loaded
+    """
+    return _encoding
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens of a text.
+
+    Args:
+        text (str): The text
+
+    Returns:
+        int: The number of tokens
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut a text down to at most the given number of tokens.
+
+    Args:
+        text (str): The text
+        max_tokens (int): Maximum number of tokens to keep
+
+    Returns:
+        str: The text, truncated if it was longer
+    """
+    if max_tokens <= 0 or not text:
+        return ""
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    return text[:max_tokens * CHARS_PER_TOKEN]
@@ -0,0 +1,118 @@
+"""
+Stage pipeline for Gizmo workflows.
+
+This module provides a small asyncio pipeline in which every stage is connected to the next one
+by a queue and has its own pool of workers. While a slow stage is busy with one item, the faster
+stages keep working on the following items, so the total time of a run approaches the time of the
+slowest stage instead of the sum of all stages.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, List
+
+from gizmo.utils.error_utils import logger
+
+# Marker put into a stage queue to tell a worker that no more items will arrive
+_STOP = object()
+
+
+class PipelineStage:
+    """A named pipeline stage processing items with a fixed number of workers."""
+
+    def __init__(self, name: str, handler: Callable[[Any], Awaitable[Any]], workers: int = 1):
+        """
+        Initialize the PipelineStage.
+
+        Args:
+            name (str): Name of the stage, used for logging
+            handler (Callable): Coroutine function called with an item, returning the item for the next stage
+            workers (int, optional): Number of items processed concurrently by this stage. Defaults to 1.
+        """
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers or 1)
+
+
+class StagePipeline:
+    """
+    A chain of queue-connected stages.
+
+    Items are released from one stage to the next in their original order, so a stage with a
+    single worker processes the items strictly one after another, in input order.
+    """
+
+    def __init__(self, stages: List[PipelineStage]):
+        """
+        Initialize the StagePipeline.
+
+        Args:
+            stages (List[PipelineStage]): The stages in execution order
+        """
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = stages
+
+    async def run(self, items: List[Any]) -> List[Any]:
+        """
+        Push all items through every stage of the pipeline.
+
+        If a stage handler raises, the exception replaces the item and is passed through the
+        remaining stages untouched.
+
+        Args:
+            items (List[Any]): The items to process
+
+        Returns:
+            List[Any]: The items returned by the last stage, in input order
+        """
+        queues = [asyncio.Queue() for _ in self.stages]
+        results = [None] * len(items)
+
+        for index, item in enumerate(items):
+            queues[0].put_nowait((index, item))
+
+        def forward(stage_index, buffer, state, index, item):
+            # Release items to the next stage in input order. This never suspends, so
+            # workers of the same stage cannot interleave while releasing items.
+            buffer[index] = item
+            while state["next"] in buffer:
+                ready_index = state["next"]
+                ready_item = buffer.pop(ready_index)
+                if stage_index + 1 < len(self.stages):
+                    queues[stage_index + 1].put_nowait((ready_index, ready_item))
+                else:
+                    results[ready_index] = ready_item
+                state["next"] += 1
+            if state["next"] == len(items):
+                state["done"].set()
+
+        async def worker(stage_index, buffer, state):
+            stage = self.stages[stage_index]
+            while True:
+                entry = await queues[stage_index].get()
+                if entry is _STOP:
+                    return
+                index, item = entry
+                if not isinstance(item, Exception):
+                    try:
+                        item = await stage.handler(item)
+                    except Exception as e:
+                        logger.error(f"Pipeline stage '{stage.name}' failed: {str(e)}")
+                        item = e
+                forward(stage_index, buffer, state, index, item)
+
+        async def run_stage(stage_index):
+            stage = self.stages[stage_index]
+            buffer, state = {}, {"next": 0, "done": asyncio.Event()}
+            if not items:
+                state["done"].set()
+            workers = [asyncio.create_task(worker(stage_index, buffer, state)) for _ in range(stage.workers)]
+
+            # Every item has to pass through this stage before the workers may stop
+            await state["done"].wait()
+            for _ in workers:
+                queues[stage_index].put_nowait(_STOP)
+            await asyncio.gather(*workers)
+
+        await asyncio.gather(*(run_stage(stage_index) for stage_index in range(len(self.stages))))
+        return results
@@ -0,0 +1,170 @@
+"""
+Research run state for Gizmo workflows.
+
+This module defines the objects that carry the state of a research run through the workflow:
+1. ResearchRun - Settings and shared state of a single `run_research` invocation
+2. StepJob - The state of one plan step as it moves through the research stages
+"""
+
+import time
+
+from gizmo.utils.manifest_utils import hash_text, step_fingerprint
+from gizmo.utils.metrics_utils import UsageAccumulator
+from gizmo.utils.similarity_utils import MinHashIndex
+
+
+class StepJob:
+    """State of a single plan step as it moves through the research stages."""
+
+    def __init__(self, step):
+        """
+        Initialize the StepJob.
+
+        Args:
+            step (Step): The parsed plan step
+        """
+        self.step = step
+        self.number = step.step
+        self.topic = step.topic
+        self.search_results = None
+        self.source_urls = []
+        self.report = None
+        self.summary = None
+        self.error = None
+        self.start_time = None
+        self.finished = False
+        self.resumed = False
+        self.usage_accumulator = UsageAccumulator()
+
+    @property
+    def formatted_summary(self):
+        """
+        Get the step summary formatted for the final summarizer.
+
+        Returns:
+            str: The formatted summary, or the error message if the step failed
+        """
+        if self.error is not None:
+            return f"## Step {self.number}: {self.topic}\n\nError: {str(self.error)}"
+        return f"## Step {self.number}: {self.topic}\n\n{self.summary}"
+
+
+class ResearchRun:
+    """Settings and shared state of a single research run."""
+
+    def __init__(self, plan_path, plan, output_dir, memory_dir, deep=False, initial_input=None):
+        """
+        Initialize the ResearchRun.
+
+        Args:
+            plan_path (str): Path to the plan file
+            plan (str): Content of the plan file
+            output_dir (str): Directory to save the output files
+            memory_dir (str): Directory to save intermediate files
+            deep (bool, optional): Whether to use GPT Researcher for deep research. Defaults to False.
+            initial_input (str, optional): Initial input for the research
+        """
+        self.plan_path = plan_path
+        self.plan = plan
+        self.output_dir = output_dir
+        self.memory_dir = memory_dir
+        self.deep = deep
+        self.initial_input = initial_input
+        self.usage_accumulator = UsageAccumulator()
+        self.start_time = time.time()
+        self.manifest = None
+        self.graph = None
+        self.deep_semaphore = None
+        self.step_semaphore = None
+        self.stream = False
+        self.progress_callback = None
+        self.rolling_summary = None
+        self.context_budget = None
+        self.source_index = MinHashIndex()
+        self.jobs = []
+
+    def record_usage(self, response, job=None):
+        """
+        Record the usage metrics of an agent response for the run and, optionally, for a step.
+
+        Args:
+            response: An agno RunResponse object containing metrics to record
+            job (StepJob, optional): The step the response belongs to
+        """
+        self.usage_accumulator.record(response)
+        if job is not None:
+            job.usage_accumulator.record(response)
+
+    def record_cost(self, cost, job=None):
+        """
+        Record a cost in USD for the run and, optionally, for a step.
+
+        Args:
+            cost (float): The cost to record
+            job (StepJob, optional): The step the cost belongs to
+        """
+        self.usage_accumulator.record_cost(cost)
+        if job is not None:
+            job.usage_accumulator.record_cost(cost)
+
+    def fingerprint(self, job):
+        """
+        Get the fingerprint of a step in this run.
+
+        Args:
+            job (StepJob): The step
+
+        Returns:
+            str: The fingerprint, see `step_fingerprint`
+        """
+        return step_fingerprint(job.step.model_dump(), hash_text(self.initial_input), self.deep,
+                                dag=self.graph is not None)
+
+    def create_jobs(self, steps):
+        """
+        Create a job for every parsed plan step.
+
+        Args:
+            steps (List[Step]): The parsed plan steps
+
+        Returns:
+            List[StepJob]: The created jobs, in plan order
+        """
+        self.jobs = [StepJob(step) for step in steps]
+        return self.jobs
+
+    def finished_summaries(self):
+        """
+        Get the formatted summaries of all finished steps.
+
+        Returns:
+            List[str]: The formatted summaries, in plan order
+        """
+        return [job.formatted_summary for job in self.jobs if job.finished]
+
+    def context_summaries(self, job):
+        """
+        Get the formatted summaries of the finished steps a step should build on.
+
+        If the steps are scheduled by their dependencies, these are the summaries of the steps the
+        given step depends on; otherwise all finished steps.
+
+        Args:
+            job (StepJob): The step to get the context for
+
+        Returns:
+            List[str]: The formatted summaries, in plan order
+        """
+        if self.graph is None:
+            return self.finished_summaries()
+        dependencies = set(self.graph.get(job.number, []))
+        return [other.formatted_summary for other in self.jobs if other.number in dependencies and other.finished]
+
+    def step_summaries(self):
+        """
+        Get the formatted summaries of all steps for the final summarizer.
+
+        Returns:
+            List[str]: The formatted summaries, in plan order
+        """
+        return [job.formatted_summary for job in self.jobs]
@@ -0,0 +1,94 @@
+"""
+Rolling summary for Gizmo workflows.
+
+This module maintains a summary of the research so far while the steps are still running. A
+background task folds the summaries of newly finished steps into the summary, so when the last step
+lands, the final summarizer only has to merge that summary with the few steps it does not cover yet,
+instead of summarizing every step from scratch.
+"""
+
+import asyncio
+import time
+
+from gizmo.agents.summarizer_agents import arun_rolling_summarizer_agent
+from gizmo.utils.error_utils import logger
+
+
+class RollingSummary:
+    """A summary of the finished steps of a research run, updated in the background."""
+
+    def __init__(self, run):
+        """
+        Initialize the RollingSummary.
+
+        Args:
+            run (ResearchRun): The research run to summarize
+        """
+        self.run = run
+        self.content = None
+        self.folded = set()
+        self._changed = asyncio.Event()
+        self._closing = False
+        self._task = None
+
+    def start(self):
+        """
+        Start the background task that folds finished steps into the summary.
+        """
+        self._task = asyncio.create_task(self._fold_loop())
+
+    def notify(self):
+        """
+        Tell the background task that a step has finished.
+        """
+        self._changed.set()
+
+    async def finish(self):
+        """
+        Stop folding new steps and wait for a fold in progress.
+
+        Returns:
+            tuple: The summary so far (None if no step was folded) and the formatted summaries of the
+                   steps it does not cover, in plan order
+        """
+        self._closing = True
+        self._changed.set()
+        if self._task is not None:
+            await self._task
+        remaining = [job.formatted_summary for job in self.run.jobs if job.number not in self.folded]
+        return self.content, remaining
+
+    async def _fold_loop(self):
+        """
+        Fold the steps that finished since the last fold until the summary is finished.
+
+        Steps that finish while a fold is in progress are folded together in the next one. If a fold
+        fails, its steps are left to the final summarizer, as are the steps that finish after the last
+        fold started.
+        """
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            # Once every step has finished, the final summarizer merges the remaining steps itself
+            if self._closing or all(job.finished for job in self.run.jobs):
+                return
+
+            jobs = [job for job in self.run.jobs if job.finished and job.number not in self.folded]
+            if not jobs:
+                continue
+
+            fold_start_time = time.time()
+            try:
+                response = await arun_rolling_summarizer_agent(
+                    self.content, [job.formatted_summary for job in jobs], self.run.memory_dir
+                )
+            except Exception as e:
+                logger.warning(f"Could not update the summary so far with steps "
+                               f"{', '.join(str(job.number) for job in jobs)}: {str(e)}")
+                continue
+
+            self.run.record_usage(response)
+            self.content = response.content
+            self.folded.update(job.number for job in jobs)
+            logger.info(f"Summary so far covers {len(self.folded)} of {len(self.run.jobs)} steps "
+                        f"(updated in {time.time() - fold_start_time:.2f}s)")
@@ -0,0 +1,74 @@
+"""
+Step dependency graph for Gizmo workflows.
+
+This module validates the `depends_on` edges of the parsed plan steps, so that the workflows can
+schedule the steps as a directed acyclic graph: a step starts as soon as the steps it depends on
+are finished.
+"""
+
+from typing import Dict, List
+
+from gizmo.utils.error_utils import logger
+
+
+def apply_plan_dependencies(steps, dependencies: Dict[int, List[int]]):
+    """
+    Set the dependencies declared in the plan's JSON sidecar on the parsed steps.
+
+    Dependencies found by the plan parser are kept for steps the sidecar does not mention.
+
+    Args:
+        steps (List[Step]): The parsed plan steps
+        dependencies (Dict[int, List[int]]): The dependencies by step number
+    """
+    for step in steps:
+        if step.step in dependencies:
+            step.depends_on = list(dependencies[step.step])
+
+
+def build_step_graph(steps) -> Dict[int, List[int]]:
+    """
+    Build the dependency graph of the plan steps.
+
+    Self-references and references to steps that are not in the plan are dropped with a warning.
+
+    Args:
+        steps (List[Step]): The parsed plan steps
+
+    Returns:
+        Dict[int, List[int]]: The dependencies by step number
+
+    Raises:
+        ValueError: If the dependencies contain a cycle
+    """
+    step_numbers = {step.step for step in steps}
+    graph = {}
+    for step in steps:
+        dependencies = []
+        for dependency in step.depends_on:
+            if dependency == step.step or dependency not in step_numbers:
+                logger.warning(f"Ignoring invalid dependency of step {step.step} on step {dependency}")
+                continue
+            if dependency not in dependencies:
+                dependencies.append(dependency)
+        graph[step.step] = dependencies
+
+    # Detect cycles with a depth-first search
+    visiting, visited = set(), set()
+
+    def visit(step_number, path):
+        if step_number in visited:
+            return
+        if step_number in visiting:
+            cycle = path[path.index(step_number):] + [step_number]
+            raise ValueError(f"Circular step dependencies: {' -> '.join(str(n) for n in cycle)}")
+        visiting.add(step_number)
+        for dependency in graph[step_number]:
+            visit(dependency, path + [step_number])
+        visiting.discard(step_number)
+        visited.add(step_number)
+
+    for step_number in graph:
+        visit(step_number, [])
+
+    return graph
@@ -4,16 +4,48 @@ Workflow orchestration for Gizmo.
 This module provides standalone functions for the Gizmo CLI to:
 1. Generate a research plan from a prompt
 2. Execute a research workflow based on a plan
+3. Execute the research workflows of many plans in one process
+4. Execute research steps from a work queue as a worker
 
 These functions are wrappers around the workflow implementations in workflow_basic.py and workflow_deep.py.
 """
 
+import asyncio
 import os
+import time
 
+from gizmo.agents.plan_parser_agent import set_plan_cache_dir
+from gizmo.tools.page_cache import set_page_cache_dir
+from gizmo.tools.search_cache import set_search_cache_dir
+from gizmo.utils.client_utils import set_rate_limit, set_response_cache, close_async_openai_client
+from gizmo.utils.error_utils import logger, log_error, set_project_context
+from gizmo.utils.file_utils import parse_batch_file, read_file
+from gizmo.utils.manifest_utils import STEP_COMPLETED
+from gizmo.utils.queue_utils import WorkQueue, new_worker_id
+from gizmo.utils.token_utils import load_encoding
 from gizmo.workflows.workflow_basic import basic_workflow
 from gizmo.workflows.workflow_deep import deep_workflow
 
 
+def set_cache_dir(cache_dir):
+    """
+    Enable the on-disk caches of this process.
+
+    Repeated identical model requests, e.g. retries, resumed runs and reruns of similar plans, are
+    answered from the cache instead of the OpenAI API, and the web search results, fetched pages and
+    parsed plans are shared across runs and processes.
+
+    Args:
+        cache_dir (str): Directory of the caches, or None to disable caching
+    """
+    set_response_cache(cache_dir)
+    set_search_cache_dir(cache_dir)
+    set_page_cache_dir(cache_dir)
+    set_plan_cache_dir(cache_dir)
+    if cache_dir:
+        logger.info(f"Caching model responses, search results and pages in '{cache_dir}'")
+
+
 def run_plan(input_prompt, output_plan_path, is_file=True, size=None):
     """
     Generate a research plan from a prompt.
@@ -36,7 +68,10 @@ def run_plan(input_prompt, output_plan_path, is_file=True, size=None):
     return basic_workflow.run_plan(input_prompt, output_plan_path, is_file, size)
 
 
-async def run_research(plan_path, output_dir, memory_dir=".memory", deep=False, initial_input=None):
+async def run_research(plan_path, output_dir, memory_dir=".memory", deep=False, initial_input=None, concurrency=1,
+                       stage_workers=None, resume=False, dag=False, deep_concurrency=None,
+                       step_semaphore=None, work_queue=None, incremental=False, stream=False,
+                       progress_callback=None, rolling_summary=False, context_budget=None):
     """
     Execute a research workflow based on a plan.
 
@@ -49,8 +84,33 @@ async def run_research(plan_path, output_dir, memory_dir=".memory", deep=False,
         memory_dir (str): Directory to save intermediate files
         deep (bool): Whether to use GPT Researcher for deep research
         initial_input (str, optional): Initial input for the research
+        concurrency (int, optional): Maximum number of steps researched in parallel. Defaults to 1.
+        stage_workers (dict, optional): Number of workers per stage ("source", "research", "summary").
+                                        If provided, the steps are executed as a stage pipeline.
+        resume (bool, optional): Whether to skip the steps completed by a previous run of the same plan.
+                                 Defaults to False.
+        dag (bool, optional): Whether to schedule the steps by their dependencies instead of assuming
+                              that every step depends on all previous ones. Defaults to False.
+        deep_concurrency (int, optional): Maximum number of GPT Researcher instances running at once in deep mode.
+                                          Defaults to None (only limited by the step concurrency).
+        step_semaphore (asyncio.Semaphore, optional): Semaphore shared with other runs that limits the number
+                                                      of steps in progress across all of them.
+        work_queue (str, optional): Path to a work queue database. If provided, the steps are enqueued and
+                                    executed by `gizmo worker` processes, and this call waits for them.
+        incremental (bool, optional): Whether to reuse the unchanged steps of a previous run of an edited plan,
+                                      researching only the added and changed steps. Defaults to False.
+        stream (bool, optional): Whether to write the step reports and the final summary to `.partial` files while
+                                 they are generated, renaming them when they are complete. Defaults to False.
+        progress_callback (callable, optional): Called with the path of a streamed file, the number of characters
+                                                written so far and whether the file is complete.
+        rolling_summary (bool, optional): Whether to keep a summary of the research so far up to date while the
+                                          steps run, so the final summary only has to merge the last steps.
+                                          Defaults to False.
+        context_budget (int, optional): Maximum number of tokens of the researcher input. Only the plan entries and
+                                        source passages most relevant to a step are kept within it.
 
     Raises:
+        ValueError: If stage_workers is combined with dag or work_queue
         Exception: If the research execution fails
     """
     # Set default retriever to duckduckgo if not already set
@@ -58,7 +118,154 @@ async def run_research(plan_path, output_dir, memory_dir=".memory", deep=False,
         os.environ["RETRIEVER"] = "duckduckgo"
 
     # Use the appropriate workflow based on the deep parameter
-    if deep:
-        return await deep_workflow.run_research(plan_path, output_dir, memory_dir, deep, initial_input)
-    else:
-        return await basic_workflow.run_research(plan_path, output_dir, memory_dir, deep, initial_input)
+    workflow = deep_workflow if deep else basic_workflow
+    return await workflow.run_research(
+        plan_path=plan_path, output_dir=output_dir, memory_dir=memory_dir, deep=deep, initial_input=initial_input,
+        concurrency=concurrency, stage_workers=stage_workers, resume=resume, dag=dag,
+        deep_concurrency=deep_concurrency, step_semaphore=step_semaphore, work_queue=work_queue,
+        incremental=incremental, stream=stream, progress_callback=progress_callback,
+        rolling_summary=rolling_summary, context_budget=context_budget
+    )
+
+
+async def run_batch(batch_path, max_projects=2, max_steps=None, rate_limit=None, resume=False, dag=False,
+                    deep_concurrency=None):
+    """
+    Execute the research workflows of all projects listed in a batch file in one process.
+
+    The projects share the OpenAI client and its connections. The number of projects, the number of
+    steps in progress across all projects and the rate of OpenAI requests are limited globally.
+    A failing project does not stop the other projects.
+
+    Args:
+        batch_path (str): Path to the batch file (see `parse_batch_file`)
+        max_projects (int, optional): Maximum number of projects researched in parallel. Defaults to 2.
+        max_steps (int, optional): Maximum number of steps in progress across all projects.
+                                   Defaults to None (only limited by the concurrency of each project).
+        rate_limit (float, optional): Maximum number of OpenAI requests per minute. Defaults to None (no limit).
+        resume (bool, optional): Whether to skip the steps completed by previous runs of the projects.
+                                 Defaults to False.
+        dag (bool, optional): Whether to schedule the steps by their dependencies. Defaults to False.
+        deep_concurrency (int, optional): Maximum number of GPT Researcher instances running at once in every
+                                          deep project. Defaults to None (only limited by the step concurrency).
+
+    Returns:
+        dict: The error of every project by name; None for the projects that succeeded
+
+    Raises:
+        ValueError: If the batch file is not valid
+    """
+    projects = parse_batch_file(batch_path)
+    logger.info(f"Running {len(projects)} research projects from batch '{batch_path}'")
+
+    set_rate_limit(rate_limit)
+    project_semaphore = asyncio.Semaphore(max(1, max_projects or 1))
+    step_semaphore = asyncio.Semaphore(max_steps) if max_steps else None
+    batch_start_time = time.time()
+
+    async def run_project(project):
+        async with project_semaphore:
+            # Every project runs in its own task, so the log prefix only applies to this project
+            set_project_context(project["name"])
+            try:
+                initial_input = read_file(project["initial_input"]) if project["initial_input"] else None
+                await run_research(
+                    plan_path=project["plan"], output_dir=project["output"], memory_dir=project["memory"],
+                    deep=project["deep"], initial_input=initial_input, concurrency=project["concurrency"],
+                    resume=resume, dag=dag, deep_concurrency=deep_concurrency, step_semaphore=step_semaphore
+                )
+                return None
+            except Exception as e:
+                log_error(e, f"Research project '{project['name']}' failed")
+                return e
+
+    try:
+        errors = await asyncio.gather(*(run_project(project) for project in projects))
+    finally:
+        set_rate_limit(None)
+        await close_async_openai_client()
+
+    failed = sum(1 for error in errors if error is not None)
+    logger.info(f"Batch completed in {time.time() - batch_start_time:.2f}s: "
+                f"{len(projects) - failed} projects succeeded, {failed} failed")
+    return {project["name"]: error for project, error in zip(projects, errors)}
+
+
+async def run_worker(queue_path, concurrency=1, poll_interval=5.0, exit_when_idle=False):
+    """
+    Execute research steps claimed from a work queue until stopped.
+
+    Several workers, on one machine or on machines sharing the filesystem, can process the same queue.
+
+    Args:
+        queue_path (str): Path to the work queue database
+        concurrency (int, optional): Maximum number of steps executed in parallel by this worker. Defaults to 1.
+        poll_interval (float, optional): Seconds to wait before checking the queue again when it has no
+                                         ready jobs. Defaults to 5.0.
+        exit_when_idle (bool, optional): Whether to stop once the queue has no jobs left. Defaults to False.
+    """
+    # Set default retriever to duckduckgo if not already set
+    if "RETRIEVER" not in os.environ:
+        os.environ["RETRIEVER"] = "duckduckgo"
+
+    queue = await asyncio.to_thread(WorkQueue, queue_path)
+    await asyncio.to_thread(load_encoding)
+    worker_id = new_worker_id()
+    logger.info(f"Worker {worker_id} processing work queue '{queue_path}'")
+
+    async def process(queued):
+        payload = queued["payload"]
+        workflow = deep_workflow if payload["deep"] else basic_workflow
+        completed_steps = await asyncio.to_thread(queue.completed_steps, queued["run_id"])
+        step_task = asyncio.create_task(workflow.run_queued_step(payload, completed_steps))
+        lease_lost = False
+
+        # Keep the lease of the job alive while the step is executed. If the job was cancelled or
+        # another worker took it over, the step is stopped, so it does not run twice.
+        async def heartbeat():
+            nonlocal lease_lost
+            while True:
+                await asyncio.sleep(queue.lease_seconds / 3)
+                try:
+                    held = await asyncio.to_thread(queue.heartbeat, queued["id"], worker_id)
+                except Exception as e:
+                    log_error(e, f"Could not renew the lease of step job {queued['id']}, retrying")
+                    continue
+                if not held:
+                    logger.warning(f"Step job {queued['id']} was cancelled or taken over by another worker, "
+                                   f"stopping step {payload['step']}")
+                    lease_lost = True
+                    step_task.cancel()
+                    return
+
+        heartbeat_task = asyncio.create_task(heartbeat())
+        try:
+            state = await step_task
+            if state.get("status") == STEP_COMPLETED:
+                await asyncio.to_thread(queue.complete, queued["id"], worker_id, state)
+            else:
+                await asyncio.to_thread(queue.fail, queued["id"], worker_id, state.get("error") or "Step failed")
+        except asyncio.CancelledError:
+            if not lease_lost:
+                raise
+        except Exception as e:
+            log_error(e, f"Step job {queued['id']} failed")
+            await asyncio.to_thread(queue.fail, queued["id"], worker_id, str(e))
+        finally:
+            heartbeat_task.cancel()
+
+    async def work():
+        while True:
+            queued = await asyncio.to_thread(queue.claim, worker_id)
+            if queued is not None:
+                await process(queued)
+            elif exit_when_idle and not await asyncio.to_thread(queue.has_open_jobs):
+                return
+            else:
+                await asyncio.sleep(poll_interval)
+
+    try:
+        await asyncio.gather(*(work() for _ in range(max(1, concurrency or 1))))
+    finally:
+        await close_async_openai_client()
+    logger.info(f"Worker {worker_id} stopped: no jobs left")
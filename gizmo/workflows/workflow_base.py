@@ -1,18 +1,60 @@
 """
 Base workflow for Gizmo.
 
-This module defines the abstract base class for all Gizmo workflows.
+This module defines the abstract base class for all Gizmo workflows. The base class drives the
+research phase: it parses the plan, schedules the steps and generates the final summary, while
+the concrete workflows implement the individual research stages of a step.
 """
 
+import asyncio
+import contextlib
+import os
+import time
+import uuid
 from abc import ABC, abstractmethod
 
+from gizmo.agents.plan_parser_agent import (
+    Step, arun_plan_parser_agent, cache_plan, get_cached_plan, parse_plan_steps
+)
+from gizmo.agents.source_agent import arun_source_agent
+from gizmo.agents.summarizer_agents import arun_step_summarizer_agent, arun_final_summarizer_agent
+from gizmo.tools.step_index import get_step_index
+from gizmo.utils.error_utils import log_error, logger, set_step_context, clear_step_context
+from gizmo.utils.file_utils import (
+    write_file, ensure_dir, read_file, parse_plan_dependencies, formulate_search_query
+)
+from gizmo.utils.manifest_utils import (
+    RunManifest, hash_text, STEP_RUNNING, STEP_COMPLETED, STEP_FAILED
+)
+from gizmo.utils.queue_utils import WorkQueue, FINAL_JOB_STATUSES, JOB_COMPLETED
+from gizmo.utils.similarity_utils import content_words
+from gizmo.utils.token_utils import load_encoding
+from gizmo.workflows.pipeline import PipelineStage, StagePipeline
+from gizmo.workflows.research_run import ResearchRun
+from gizmo.workflows.rolling_summary import RollingSummary
+from gizmo.workflows.step_graph import apply_plan_dependencies, build_step_graph
+
+# Research stages of a step, in execution order
+STAGES = ("source", "research", "summary")
+
+# Seconds between checks of the work queue while waiting for workers
+QUEUE_POLL_INTERVAL = 2.0
+
+# Similarity of two search queries from which a step reuses the sources of the earlier step as is,
+# provided that the queries also have the same content words (see `_collect_sources`)
+SOURCE_REUSE_SIMILARITY = 0.95
+
+# Similarity of two search queries from which the source agent starts from the sources of the earlier step
+SOURCE_EXTEND_SIMILARITY = 0.4
+
 
 class GizmoWorkflow(ABC):
     """
     Base class for Gizmo workflows.
 
     This abstract class defines the interface for all Gizmo workflows.
-    Concrete implementations should override the run_plan and run_research methods.
+    Concrete implementations should override the run_plan and run_research methods,
+    and implement the source and research stages of a step.
     """
 
     @abstractmethod
@@ -35,7 +77,141 @@ class GizmoWorkflow(ABC):
         pass
 
     @abstractmethod
-    async def run_research(self, plan_path, output_dir, memory_dir=".memory", deep=False, initial_input=None):
+    async def run_research(self, plan_path, output_dir, memory_dir=".memory", deep=False, initial_input=None,
+                           concurrency=1, stage_workers=None, resume=False, dag=False, deep_concurrency=None,
+                           step_semaphore=None, work_queue=None, incremental=False,
+                           stream=False, progress_callback=None, rolling_summary=False, context_budget=None):
+        """
+        Execute a research workflow based on a plan.
+
+        Args:
+            plan_path (str): Path to the plan file
+            output_dir (str): Directory to save the output files
+            memory_dir (str): Directory to save intermediate files
+            deep (bool): Whether to use GPT Researcher for deep research
+            initial_input (str, optional): Initial input for the research
+            concurrency (int, optional): Maximum number of steps researched in parallel. Defaults to 1.
+            stage_workers (dict, optional): Number of workers per stage ("source", "research", "summary").
+                                            If provided, the steps are executed as a stage pipeline.
+            resume (bool, optional): Whether to skip the steps completed by a previous run of the same plan.
+                                     Defaults to False.
+            dag (bool, optional): Whether to schedule the steps by their dependencies instead of assuming
+                                  that every step depends on all previous ones. Defaults to False.
+            deep_concurrency (int, optional): Maximum number of GPT Researcher instances running at once.
+                                              Defaults to None (only limited by the step concurrency).
+            step_semaphore (asyncio.Semaphore, optional): Semaphore shared with other runs that limits the
+                                                          number of steps in progress across all of them.
+            work_queue (str, optional): Path to a work queue database. If provided, the steps are enqueued
+                                        and executed by `gizmo worker` processes.
+            incremental (bool, optional): Whether to reuse the unchanged steps of a previous run of an edited
+                                          plan. Defaults to False.
+            stream (bool, optional): Whether to write the step reports and the final summary to `.partial`
+                                     files while they are generated. Defaults to False.
+            progress_callback (callable, optional): Called as the streamed files grow, see
+                                                    `stream_utils.ProgressCallback`
+            rolling_summary (bool, optional): Whether to fold finished steps into a summary of the research
+                                              so far in the background, so the final summary only has to
+                                              merge the last steps. Defaults to False.
+            context_budget (int, optional): Maximum number of tokens of the researcher input. Defaults to
+                                            `researcher_agent.CONTEXT_BUDGET`.
+
+        Raises:
+            ValueError: If stage_workers is combined with dag or work_queue
+            Exception: If the research execution fails
+        """
+        pass
+
+    @abstractmethod
+    async def _run_source_stage(self, job, run):
+        """
+        Collect the sources for a step.
+
+        Args:
+            job (StepJob): The step to process
+            run (ResearchRun): The research run
+        """
+        pass
+
+    @abstractmethod
+    async def _run_research_stage(self, job, run):
+        """
+        Research a step and write its report to the output directory.
+
+        Args:
+            job (StepJob): The step to process
+            run (ResearchRun): The research run
+        """
+        pass
+
+    async def _collect_sources(self, job, run):
+        """
+        Collect the sources for a step, reusing the sources of an earlier step with a similar search query.
+
+        If the search query of an earlier step is nearly the same and only differs in stop words and
+        word forms, its sources are reused without running the source agent. If it is similar, e.g.
+        the same query for another country, the source agent gets its sources to keep the relevant
+        ones and add sources for the rest of the step.
+
+        Args:
+            job (StepJob): The step to process
+            run (ResearchRun): The research run
+
+        Returns:
+            str: The search results
+        """
+        query = formulate_search_query(job.topic)
+        known_sources = None
+        match = run.source_index.most_similar(query, SOURCE_EXTEND_SIMILARITY)
+        if match is not None:
+            number, similarity = match
+            known_sources = read_file(os.path.join(run.memory_dir, f"step{number}_search.md"))
+            if (similarity >= SOURCE_REUSE_SIMILARITY and
+                    content_words(query) == run.source_index.content_words(number)):
+                logger.info(f"Reusing the sources of step {number} (query similarity {similarity:.2f})")
+                write_file(os.path.join(run.memory_dir, f"step{job.number}_search.md"), known_sources)
+                run.source_index.add(job.number, query)
+                return known_sources
+            logger.info(f"Extending the sources of step {number} (query similarity {similarity:.2f})")
+
+        source_response = await arun_source_agent(job.topic, job.number, run.memory_dir, known_sources)
+        run.record_usage(source_response, job)
+        run.source_index.add(job.number, query)
+        return source_response.content
+
+    def _index_sources(self, job, run):
+        """
+        Add a step whose sources were collected by an earlier run or another worker to the source index.
+
+        Args:
+            job (StepJob): The step
+            run (ResearchRun): The research run
+        """
+        if os.path.exists(os.path.join(run.memory_dir, f"step{job.number}_search.md")):
+            run.source_index.add(job.number, formulate_search_query(job.topic))
+
+    async def _run_summary_stage(self, job, run):
+        """
+        Summarize the report of a step.
+
+        Args:
+            job (StepJob): The step to process
+            run (ResearchRun): The research run
+        """
+        logger.info(f"Running step summarizer...")
+        summarizer_start_time = time.time()
+        summarizer_response = await arun_step_summarizer_agent(job.report, job.number, run.memory_dir)
+        run.record_usage(summarizer_response, job)
+        summarizer_time = time.time() - summarizer_start_time
+        job.summary = summarizer_response.content
+
+        # Log summarizer agent metrics if available
+        logger.info(f"Step summarizer agent completed in {summarizer_time:.2f}s")
+
+    async def _execute_research(self, plan_path, output_dir, memory_dir, deep, initial_input,
+                                concurrency=1, stage_workers=None, resume=False, dag=False, deep_concurrency=None,
+                                step_semaphore=None, work_queue=None, incremental=False,
+                                stream=False, progress_callback=None, rolling_summary=False,
+                                context_budget=None):
         """
         Execute a research workflow based on a plan.
 
@@ -45,8 +221,523 @@ class GizmoWorkflow(ABC):
             memory_dir (str): Directory to save intermediate files
             deep (bool): Whether to use GPT Researcher for deep research
             initial_input (str, optional): Initial input for the research
+            concurrency (int, optional): Maximum number of steps researched in parallel. Defaults to 1.
+            stage_workers (dict, optional): Number of workers per stage. If provided, the steps are
+                                            executed as a stage pipeline.
+            resume (bool, optional): Whether to skip the steps completed by a previous run of the same plan.
+                                     Defaults to False.
+            dag (bool, optional): Whether to schedule the steps by their dependencies instead of assuming
+                                  that every step depends on all previous ones. Defaults to False.
+            deep_concurrency (int, optional): Maximum number of GPT Researcher instances running at once.
+                                              Defaults to None (only limited by the step concurrency).
+            step_semaphore (asyncio.Semaphore, optional): Semaphore shared with other runs that limits the
+                                                          number of steps in progress across all of them.
+            work_queue (str, optional): Path to a work queue database. If provided, the steps are enqueued
+                                        and executed by `gizmo worker` processes.
+            incremental (bool, optional): Whether to reuse the unchanged steps of a previous run of an edited
+                                          plan. Defaults to False.
+            stream (bool, optional): Whether to write the step reports and the final summary to `.partial`
+                                     files while they are generated. Defaults to False.
+            progress_callback (callable, optional): Called as the streamed files grow, see
+                                                    `stream_utils.ProgressCallback`
+            rolling_summary (bool, optional): Whether to fold finished steps into a summary of the research
+                                              so far in the background, so the final summary only has to
+                                              merge the last steps. Defaults to False.
+            context_budget (int, optional): Maximum number of tokens of the researcher input. Defaults to
+                                            `researcher_agent.CONTEXT_BUDGET`.
 
         Raises:
+            ValueError: If stage_workers is combined with dag or work_queue
             Exception: If the research execution fails
         """
-        pass
\ No newline at end of file
+        # The stage pipeline schedules the steps in plan order and ignores their dependencies, and the
+        # workers of a work queue run the steps themselves
+        if stage_workers and dag:
+            raise ValueError("stage_workers and dag cannot be used together")
+        if stage_workers and work_queue:
+            raise ValueError("stage_workers and work_queue cannot be used together")
+
+        # Set default retriever to duckduckgo if not already set
+        if "RETRIEVER" not in os.environ:
+            os.environ["RETRIEVER"] = "duckduckgo"
+
+        # Ensure directories exist
+        ensure_dir(memory_dir)
+        ensure_dir(output_dir)
+
+        # Loading the tokenizer may download it, which would block the event loop
+        await asyncio.to_thread(load_encoding)
+
+        logger.info("Reading research plan...")
+        plan = read_file(plan_path)
+        run = ResearchRun(plan_path, plan, output_dir, memory_dir, deep, initial_input)
+        if deep_concurrency:
+            run.deep_semaphore = asyncio.Semaphore(deep_concurrency)
+        run.step_semaphore = step_semaphore
+        run.stream = stream
+        run.progress_callback = progress_callback
+        run.context_budget = context_budget
+        plan_hash = hash_text(plan)
+        input_hash = hash_text(initial_input)
+
+        # Load the manifest of the previous run if we are resuming it or updating it incrementally
+        manifest = None
+        plan_changed = False
+        if resume or incremental:
+            manifest = RunManifest.load(memory_dir)
+            if manifest is None:
+                logger.info("No previous run to reuse, starting from scratch")
+            elif manifest.matches(plan_hash, input_hash, deep):
+                pass
+            elif incremental:
+                logger.info("The plan, initial input or research mode changed since the previous run, "
+                            "only researching the changed steps")
+                manifest.update_plan(plan_hash, input_hash, deep)
+                plan_changed = True
+            else:
+                logger.warning("The plan, initial input or research mode changed since the previous run, "
+                               "starting from scratch")
+                manifest = None
+
+        # Parse the plan file to get the list of steps, unless the previous run already did
+        if manifest is not None and manifest.get_plan_steps() and not plan_changed:
+            steps = [Step(**step) for step in manifest.get_plan_steps()]
+            logger.info(f"Loaded {len(steps)} research steps from the previous run")
+        else:
+            steps = await self._parse_plan(run, plan_hash, require_dependencies=dag)
+
+        # Dependencies declared in the plan's JSON sidecar take precedence over the parsed ones
+        apply_plan_dependencies(steps, parse_plan_dependencies(plan_path))
+
+        if manifest is None:
+            manifest = RunManifest.create(memory_dir, plan_hash, input_hash, plan_path, output_dir, deep)
+        elif plan_changed:
+            self._remove_outdated_steps(run, manifest, steps)
+        manifest.set_plan_steps([step.model_dump() for step in steps])
+        manifest.save()
+        run.manifest = manifest
+        run.create_jobs(steps)
+
+        if dag:
+            run.graph = build_step_graph(steps)
+            independent = sum(1 for dependencies in run.graph.values() if not dependencies)
+            logger.info(f"Scheduling steps by their dependencies ({independent} steps without dependencies)")
+
+        if resume or incremental:
+            self._restore_completed_steps(run, require_fingerprint=plan_changed)
+
+        if rolling_summary:
+            run.rolling_summary = RollingSummary(run)
+            run.rolling_summary.start()
+
+        if work_queue:
+            await self._run_queued(run, work_queue)
+        elif stage_workers:
+            await self._run_pipelined(run, stage_workers)
+        else:
+            await self._run_concurrent(run, concurrency)
+
+        # Final step: Generate the overall summary
+        await self._run_final_summary(run)
+
+        # Calculate and log total research metrics
+        total_research_time = time.time() - run.start_time
+        logger.info(f"Research completed in {total_research_time:.2f}s total!")
+        logger.info(f"Total steps processed: {len(run.jobs)}")
+
+        # Log accumulated metrics
+        metrics = run.usage_accumulator.get_metrics()
+        logger.info(f"Total tokens used: {metrics['total_tokens']}")
+        logger.info(f"Total model time: {metrics['model_time']:.4f}s")
+        if deep:
+            logger.info(f"Total GPT Researcher costs: {metrics['total_cost']:.4f}$")
+        if metrics['cache_hits']:
+            logger.info(f"Model responses taken from the cache: {metrics['cache_hits']} of "
+                        f"{metrics['cache_hits'] + metrics['cache_misses']}")
+        manifest.complete(dict(metrics, time=total_research_time))
+
+    async def _parse_plan(self, run, plan_hash, require_dependencies=False):
+        """
+        Parse the plan into steps, using the Plan Parser Agent only if the plan cannot be read directly.
+
+        Args:
+            run (ResearchRun): The research run
+            plan_hash (str): Hash of the plan
+            require_dependencies (bool, optional): Whether the step dependencies are needed, i.e. the steps
+                                                   are scheduled by their dependencies. Defaults to False.
+
+        Returns:
+            List[Step]: The steps of the plan
+        """
+        steps = parse_plan_steps(run.plan_path, require_dependencies)
+        if steps is not None:
+            logger.info(f"Read {len(steps)} research steps from plan")
+            return steps
+
+        steps = get_cached_plan(plan_hash, require_dependencies)
+        if steps is not None:
+            logger.info(f"Loaded {len(steps)} parsed research steps from the cache")
+            return steps
+
+        parsed_plan = await arun_plan_parser_agent(run.plan)
+        run.record_usage(parsed_plan)
+        steps = parsed_plan.content.steps
+        cache_plan(plan_hash, steps, require_dependencies)
+        logger.info(f"Parsed {len(steps)} research steps from plan")
+        return steps
+
+    def _restore_completed_steps(self, run, require_fingerprint=False):
+        """
+        Mark the steps completed by the previous run as finished and reload their summaries.
+
+        A step is only reused if its fingerprint did not change and, when the steps are scheduled
+        by their dependencies, the steps it depends on are reused as well.
+
+        Args:
+            run (ResearchRun): The research run
+            require_fingerprint (bool, optional): Whether steps recorded without a fingerprint have to be
+                                                  researched again. Defaults to False.
+        """
+        reusable = set()
+        for job in run.jobs:
+            if not run.manifest.is_step_completed(job.number):
+                continue
+            fingerprint = run.manifest.get_step(job.number).get("fingerprint")
+            if fingerprint == run.fingerprint(job) or (fingerprint is None and not require_fingerprint):
+                reusable.add(job.number)
+
+        # A step whose dependencies are researched again has to be researched again with their new results
+        if run.graph is not None:
+            changed = True
+            while changed:
+                changed = False
+                for number in list(reusable):
+                    if any(dependency not in reusable for dependency in run.graph.get(number, [])):
+                        reusable.discard(number)
+                        changed = True
+
+        for job in run.jobs:
+            if job.number not in reusable:
+                continue
+            summary_file = run.manifest.get_step(job.number)["artifacts"]["summary"]
+            job.summary = read_file(summary_file)
+            job.finished = True
+            job.resumed = True
+            self._index_sources(job, run)
+
+        if reusable:
+            logger.info(f"Reusing {len(reusable)} of {len(run.jobs)} steps completed by the previous run")
+
+    def _remove_outdated_steps(self, run, manifest, steps):
+        """
+        Forget the steps of the previous run that are no longer part of the plan and delete their files.
+
+        Args:
+            run (ResearchRun): The research run
+            manifest (RunManifest): The manifest of the previous run
+            steps (List[Step]): The steps of the new plan
+        """
+        step_numbers = {str(step.step) for step in steps}
+        for step_number in [number for number in manifest.data["steps"] if number not in step_numbers]:
+            state = manifest.remove_step(step_number)
+            for path in state.get("artifacts", {}).values():
+                if os.path.exists(path):
+                    os.remove(path)
+            get_step_index(run.output_dir, run.memory_dir).remove_step(int(step_number))
+            logger.info(f"Removed step {step_number}, which is no longer part of the plan")
+
+    def _step_artifacts(self, job, run):
+        """
+        Get the files produced by a completed step.
+
+        Args:
+            job (StepJob): The completed step
+            run (ResearchRun): The research run
+
+        Returns:
+            dict: The artifact paths by artifact name
+        """
+        return {
+            "report": os.path.join(run.output_dir, f"step{job.number}.md"),
+            "search": os.path.join(run.memory_dir, f"step{job.number}_search.md"),
+            "summary": os.path.join(run.memory_dir, f"step{job.number}_summary.md"),
+        }
+
+    async def _run_concurrent(self, run, concurrency):
+        """
+        Execute whole steps, at most `concurrency` at a time.
+
+        If the run has a step graph, a step only starts once all the steps it depends on are finished.
+
+        Args:
+            run (ResearchRun): The research run
+            concurrency (int): Maximum number of steps researched in parallel
+        """
+        concurrency = max(1, concurrency or 1)
+        if concurrency > 1:
+            logger.info(f"Running up to {concurrency} steps concurrently")
+        semaphore = asyncio.Semaphore(concurrency)
+        finished = {job.number: asyncio.Event() for job in run.jobs}
+
+        async def run_step(job):
+            try:
+                # Wait until the steps this one depends on are finished
+                for dependency in (run.graph or {}).get(job.number, []):
+                    await finished[dependency].wait()
+                async with semaphore, run.step_semaphore or contextlib.nullcontext():
+                    for stage in STAGES:
+                        await self._run_stage(stage, job, run)
+            finally:
+                finished[job.number].set()
+
+        await asyncio.gather(*(run_step(job) for job in run.jobs))
+
+    async def _run_pipelined(self, run, stage_workers):
+        """
+        Execute the steps as a pipeline in which every stage has its own workers.
+
+        The source search of the next step overlaps with the research of the current one, and
+        steps are handed from one stage to the next in plan order.
+
+        Args:
+            run (ResearchRun): The research run
+            stage_workers (dict): Number of workers per stage ("source", "research", "summary")
+        """
+        logger.info("Running steps as a stage pipeline: " +
+                    ", ".join(f"{stage}={stage_workers.get(stage, 1)}" for stage in STAGES))
+
+        def make_handler(stage):
+            async def handler(job):
+                async with run.step_semaphore or contextlib.nullcontext():
+                    await self._run_stage(stage, job, run)
+                return job
+            return handler
+
+        pipeline = StagePipeline([
+            PipelineStage(stage, make_handler(stage), stage_workers.get(stage, 1))
+            for stage in STAGES
+        ])
+        await pipeline.run(run.jobs)
+
+    async def _run_queued(self, run, queue_path, poll_interval=QUEUE_POLL_INTERVAL):
+        """
+        Enqueue the unfinished steps into a work queue and wait until workers have executed them.
+
+        Args:
+            run (ResearchRun): The research run
+            queue_path (str): Path to the work queue database
+            poll_interval (float, optional): Seconds between checks of the queue
+        """
+        queue = await asyncio.to_thread(WorkQueue, queue_path)
+        run_id = uuid.uuid4().hex
+        payload = {
+            "plan_path": os.path.abspath(run.plan_path),
+            "output_dir": os.path.abspath(run.output_dir),
+            "memory_dir": os.path.abspath(run.memory_dir),
+            "deep": run.deep,
+            "initial_input": run.initial_input,
+            "plan_steps": [job.step.model_dump() for job in run.jobs],
+            "dag": run.graph is not None,
+            "stream": run.stream,
+            "context_budget": run.context_budget,
+        }
+
+        pending = {}
+        for job in run.jobs:
+            if job.finished:
+                continue
+            depends_on = run.graph.get(job.number, []) if run.graph is not None else []
+            await asyncio.to_thread(queue.enqueue, run_id, job.number, dict(payload, step=job.number), depends_on)
+            pending[job.number] = job
+        logger.info(f"Enqueued {len(pending)} steps into work queue '{queue_path}' (run {run_id}), "
+                    f"waiting for workers")
+
+        try:
+            while pending:
+                for queued in await asyncio.to_thread(queue.get_jobs, run_id):
+                    job = pending.get(queued["step"])
+                    if job is None or queued["status"] not in FINAL_JOB_STATUSES:
+                        continue
+                    self._apply_queued_job(queued, job, run)
+                    del pending[job.number]
+                    logger.info(f"Step {job.number} finished by worker {queued['worker']} "
+                                f"({len(run.jobs) - len(pending)} of {len(run.jobs)} steps done)")
+                if pending:
+                    await asyncio.sleep(poll_interval)
+        finally:
+            # Do not leave work behind for the workers if the coordinator stops early
+            if pending:
+                queue.cancel_run(run_id)
+
+    def _apply_queued_job(self, queued, job, run):
+        """
+        Record the outcome of a step executed by a worker on the job and in the manifest.
+
+        Args:
+            queued (dict): The finished queue job
+            job (StepJob): The step the queue job belongs to
+            run (ResearchRun): The research run
+        """
+        if queued["status"] == JOB_COMPLETED:
+            state = queued["result"]
+            job.summary = read_file(state["artifacts"]["summary"])
+            job.usage_accumulator.add_metrics(state["metrics"])
+            run.usage_accumulator.add_metrics(state["metrics"])
+            run.manifest.update_step(job.number, **state)
+        else:
+            error = queued["error"] or f"Step job was {queued['status']}"
+            job.error = RuntimeError(error)
+            run.manifest.update_step(job.number, status=STEP_FAILED, error=error)
+        job.finished = True
+        if run.rolling_summary is not None:
+            run.rolling_summary.notify()
+
+    async def run_queued_step(self, payload, completed_steps):
+        """
+        Execute one step claimed from a work queue, as a worker.
+
+        The summaries of the steps other workers completed are loaded from the memory directory,
+        so the step gets the same context as in a single-process run.
+
+        Args:
+            payload (dict): The payload of the queue job
+            completed_steps (List[int]): Steps of the run that are already completed
+
+        Returns:
+            dict: The state of the step (status, artifacts, metrics and error)
+        """
+        run = ResearchRun(payload["plan_path"], read_file(payload["plan_path"]), payload["output_dir"],
+                          payload["memory_dir"], payload["deep"], payload["initial_input"])
+        run.manifest = RunManifest.in_memory()
+        run.stream = payload.get("stream", False)
+        run.context_budget = payload.get("context_budget")
+        steps = [Step(**step) for step in payload["plan_steps"]]
+        run.create_jobs(steps)
+        if payload["dag"]:
+            run.graph = build_step_graph(steps)
+
+        for other in run.jobs:
+            summary_file = os.path.join(run.memory_dir, f"step{other.number}_summary.md")
+            if other.number in completed_steps and os.path.exists(summary_file):
+                other.summary = read_file(summary_file)
+                other.finished = True
+                self._index_sources(other, run)
+                get_step_index(run.output_dir, run.memory_dir).update_step(other.number)
+
+        job = next(job for job in run.jobs if job.number == payload["step"])
+        for stage in STAGES:
+            await self._run_stage(stage, job, run)
+        return run.manifest.get_step(job.number)
+
+    async def _run_stage(self, stage, job, run):
+        """
+        Run one research stage of a step, recording any error on the job.
+
+        Args:
+            stage (str): The stage to run ("source", "research" or "summary")
+            job (StepJob): The step to process
+            run (ResearchRun): The research run
+        """
+        if job.finished or job.error is not None:
+            return
+
+        # Set the step context for logging
+        set_step_context(job.number)
+        try:
+            if stage == STAGES[0]:
+                logger.info(f"Processing step #{job.number}: {job.topic}")
+                job.start_time = time.time()
+                run.manifest.update_step(job.number, status=STEP_RUNNING)
+
+            await getattr(self, f"_run_{stage}_stage")(job, run)
+            if stage in ("research", "summary"):
+                # Make the new step result, analysis or summary searchable for the research toolkit
+                get_step_index(run.output_dir, run.memory_dir).update_step(job.number)
+
+            if stage == STAGES[-1]:
+                # Log total step metrics
+                step_time = time.time() - job.start_time
+                logger.info(f"Step completed in {step_time:.2f}s total")
+                run.manifest.update_step(
+                    job.number,
+                    status=STEP_COMPLETED,
+                    artifacts=self._step_artifacts(job, run),
+                    metrics=dict(job.usage_accumulator.get_metrics(), time=step_time),
+                    fingerprint=run.fingerprint(job),
+                    error=None
+                )
+
+        except Exception as e:
+            error_msg = f"Error processing step {job.number}: {str(e)}"
+            logger.error(f"{error_msg}")
+            log_error(e, error_msg)
+            job.error = e
+
+            # Create error files
+            error_content = f"# Error in Step {job.number}: {job.topic}\n\n{str(e)}"
+            write_file(os.path.join(run.output_dir, f"step{job.number}.md"), error_content)
+            write_file(os.path.join(run.memory_dir, f"step{job.number}_summary.md"), "Error: " + str(e))
+            get_step_index(run.output_dir, run.memory_dir).update_step(job.number)
+            run.manifest.update_step(job.number, status=STEP_FAILED, error=str(e))
+
+        finally:
+            if stage == STAGES[-1] or job.error is not None:
+                job.finished = True
+                if run.rolling_summary is not None:
+                    run.rolling_summary.notify()
+            # Clear the step context after processing
+            clear_step_context()
+
+    async def _run_final_summary(self, run):
+        """
+        Generate the final summary of the research.
+
+        When every step was restored from a previous run that already produced the final summary
+        from the same steps, the existing summary is kept. With a rolling summary, only the steps
+        it does not cover yet are merged into it.
+
+        Args:
+            run (ResearchRun): The research run
+        """
+        summary_so_far = None
+        if run.rolling_summary is not None:
+            summary_so_far, remaining_summaries = await run.rolling_summary.finish()
+
+        step_summaries = run.step_summaries()
+        if not step_summaries:
+            return
+
+        summary_file = os.path.join(run.output_dir, "summary_final.md")
+        steps_fingerprint = hash_text("\n".join(run.fingerprint(job) for job in run.jobs))
+        if (all(job.resumed for job in run.jobs)
+                and run.manifest.data["final_summary"].get("status") == STEP_COMPLETED
+                and run.manifest.data["final_summary"].get("fingerprint") == steps_fingerprint
+                and os.path.exists(summary_file)):
+            logger.info("Final summary is up to date, skipping")
+            return
+
+        if summary_so_far:
+            logger.info(f"Merging the summary so far with {len(remaining_summaries)} remaining steps...")
+            step_summaries = remaining_summaries
+        else:
+            logger.info("Generating final summary...")
+        final_summary_start_time = time.time()
+        try:
+            await arun_final_summarizer_agent(step_summaries, run.output_dir, run.stream, run.progress_callback,
+                                              summary_so_far)
+            final_summary_time = time.time() - final_summary_start_time
+
+            # Log final summarizer metrics if available
+            logger.info(f"Final summarizer completed in {final_summary_time:.2f}s")
+            run.manifest.update_final_summary(status=STEP_COMPLETED, path=summary_file, error=None,
+                                              fingerprint=steps_fingerprint)
+
+        except Exception as e:
+            error_msg = f"Error generating final summary: {str(e)}"
+            logger.error(f"{error_msg}")
+            log_error(e, error_msg)
+
+            # Create error file for summary
+            error_content = f"# Error in Final Summary\n\n{str(e)}"
+            write_file(summary_file, error_content)
+            run.manifest.update_final_summary(status=STEP_FAILED, path=summary_file, error=str(e))
@@ -15,14 +15,10 @@ The workflow includes:
 import os
 import time
 
-from gizmo.agents.plan_parser_agent import run_plan_parser_agent
 from gizmo.agents.planning_agent import run_planning_agent
-from gizmo.agents.researcher_agent import run_researcher_agent
-from gizmo.agents.source_agent import run_source_agent
-from gizmo.agents.summarizer_agents import run_step_summarizer_agent, run_final_summarizer_agent
-from gizmo.utils.error_utils import retry, log_error, logger, set_step_context, clear_step_context
-from gizmo.utils.file_utils import write_file, ensure_dir, read_file
-from gizmo.utils.metrics_utils import UsageAccumulator
+from gizmo.agents.researcher_agent import arun_researcher_agent
+from gizmo.utils.error_utils import retry, logger
+from gizmo.utils.file_utils import write_file
 from gizmo.workflows.workflow_base import GizmoWorkflow
 
 
@@ -55,7 +51,10 @@ class BasicGizmoWorkflow(GizmoWorkflow):
         # Generate the plan in markdown format
         return run_planning_agent(input_prompt, output_plan_path, is_file, size)
 
-    async def run_research(self, plan_path, output_dir, memory_dir=".memory", deep=False, initial_input=None):
+    async def run_research(self, plan_path, output_dir, memory_dir=".memory", deep=False, initial_input=None,
+                           concurrency=1, stage_workers=None, resume=False, dag=False,
+                           deep_concurrency=None, step_semaphore=None, work_queue=None, incremental=False,
+                           stream=False, progress_callback=None, rolling_summary=False, context_budget=None):
         """
         Execute a basic research workflow based on a plan.
 
@@ -65,140 +64,109 @@ class BasicGizmoWorkflow(GizmoWorkflow):
             memory_dir (str): Directory to save intermediate files
             deep (bool): Whether to use GPT Researcher for deep research
             initial_input (str, optional): Initial input for the research
+            concurrency (int, optional): Maximum number of steps researched in parallel. Defaults to 1.
+            stage_workers (dict, optional): Number of workers per stage ("source", "research", "summary").
+                                            If provided, the steps are executed as a stage pipeline.
+            resume (bool, optional): Whether to skip the steps completed by a previous run of the same plan.
+                                     Defaults to False.
+            dag (bool, optional): Whether to schedule the steps by their dependencies instead of assuming
+                                  that every step depends on all previous ones. Defaults to False.
+            deep_concurrency (int, optional): Maximum number of GPT Researcher instances running at once.
+                                              Not used by the basic workflow.
+            step_semaphore (asyncio.Semaphore, optional): Semaphore shared with other runs that limits the
+                                                          number of steps in progress across all of them.
+            work_queue (str, optional): Path to a work queue database. If provided, the steps are enqueued
+                                        and executed by `gizmo worker` processes.
+            incremental (bool, optional): Whether to reuse the unchanged steps of a previous run of an edited
+                                          plan. Defaults to False.
+            stream (bool, optional): Whether to write the step reports and the final summary to `.partial`
+                                     files while they are generated. Defaults to False.
+            progress_callback (callable, optional): Called as the streamed files grow, see
+                                                    `stream_utils.ProgressCallback`
+            rolling_summary (bool, optional): Whether to fold finished steps into a summary of the research
+                                              so far in the background, so the final summary only has to
+                                              merge the last steps. Defaults to False.
+            context_budget (int, optional): Maximum number of tokens of the researcher input. Defaults to
+                                            `researcher_agent.CONTEXT_BUDGET`.
 
         Raises:
+            ValueError: If stage_workers is combined with dag or work_queue
             Exception: If the research execution fails
         """
-        # Set default retriever to duckduckgo if not already set
-        if "RETRIEVER" not in os.environ:
-            os.environ["RETRIEVER"] = "duckduckgo"
-
-        # Start timing the entire research process
-        research_start_time = time.time()
-
-        # Create a usage accumulator to track metrics across all agent runs
-        usage_accumulator = UsageAccumulator()
-
-        # Ensure directories exist
-        ensure_dir(memory_dir)
-        ensure_dir(output_dir)
-
-        # Parse the plan file to get the list of steps
-        logger.info("Reading research plan...")
-        plan = read_file(plan_path)
-        parsed_plan = run_plan_parser_agent(plan)
-        usage_accumulator.record(parsed_plan)
-        steps = parsed_plan.content.steps
-
-        logger.info(f"Parsed {len(steps)} research steps from plan")
-
-        # Store step summaries for the final summary
-        step_summaries = []
-
-        # Process each step in the plan
-        for step in enumerate(steps, start=1):
-            i = step[1].step
-            topic = step[1].topic
-            step_num = f"step #{i}"
-            # Set the step context for logging
-            set_step_context(i)
-            logger.info(f"Processing {step_num}: {step}")
-            step_start_time = time.time()
-
-            try:
-                if deep:
-                    # This workflow only handles basic research
-                    raise ValueError("Deep research is not supported by BasicGizmoWorkflow")
-                else:
-                    # Source Agent - Get search results
-                    logger.info(f"Running source agent...")
-                    source_start_time = time.time()
-                    source_response = run_source_agent(topic, i, memory_dir)
-                    usage_accumulator.record(source_response)
-                    source_time = time.time() - source_start_time
-                    search_results = source_response.content
-
-                    # Log source agent metrics if available
-                    logger.info(f"Source agent completed in {source_time:.2f}s")
-
-                    # Researcher Agent - Analyze the search results
-                    logger.info(f"Running researcher agent...")
-                    researcher_start_time = time.time()
-                    researcher_response = run_researcher_agent(topic, search_results, i, memory_dir, output_dir, plan_path, initial_input)
-                    usage_accumulator.record(researcher_response)
-                    researcher_time = time.time() - researcher_start_time
-                    analysis = researcher_response.content
-
-                    # Log researcher agent metrics if available
-                    logger.info(f"Researcher agent completed in {researcher_time:.2f}s")
-
-                    # Write the analysis to the output directory
-                    write_file(os.path.join(output_dir, f"step{i}.md"), analysis)
-
-                    # Step Summarizer - Summarize the step
-                    logger.info(f"Running step summarizer...")
-                    summarizer_start_time = time.time()
-                    summarizer_response = run_step_summarizer_agent(analysis, i, memory_dir)
-                    usage_accumulator.record(summarizer_response)
-                    summarizer_time = time.time() - summarizer_start_time
-                    summary = summarizer_response.content
-
-                    # Log summarizer agent metrics if available
-                    logger.info(f"Step summarizer agent completed in {summarizer_time:.2f}s")
-
-                    # Store the summary for the final summary
-                    step_summaries.append(f"## Step {i}: {step}\n\n{summary}")
-
-                # Log total step metrics
-                step_time = time.time() - step_start_time
-                logger.info(f"Step completed in {step_time:.2f}s total")
-
-            except Exception as e:
-                error_msg = f"Error processing step {i}: {str(e)}"
-                logger.error(f"{error_msg}")
-                log_error(e, error_msg)
-
-                # Create error files
-                error_content = f"# Error in Step {i}: {step}\n\n{str(e)}"
-                write_file(os.path.join(output_dir, f"step{i}.md"), error_content)
-                write_file(os.path.join(memory_dir, f"step{i}_summary.md"), "Error: " + str(e))
-
-                # Add error to summaries
-                step_summaries.append(f"## Step {i}: {step}\n\nError: {str(e)}")
-
-            finally:
-                # Clear the step context after processing
-                clear_step_context()
-
-        # Final step: Generate the overall summary
-        if step_summaries:
-            logger.info("Generating final summary...")
-            final_summary_start_time = time.time()
-            try:
-                run_final_summarizer_agent(step_summaries, output_dir)
-                final_summary_time = time.time() - final_summary_start_time
-
-                # Log final summarizer metrics if available
-                logger.info(f"Final summarizer completed in {final_summary_time:.2f}s")
-
-            except Exception as e:
-                error_msg = f"Error generating final summary: {str(e)}"
-                logger.error(f"{error_msg}")
-                log_error(e, error_msg)
-
-                # Create error file for summary
-                error_content = f"# Error in Final Summary\n\n{str(e)}"
-                write_file(os.path.join(output_dir, "summary_final.md"), error_content)
-
-        # Calculate and log total research metrics
-        total_research_time = time.time() - research_start_time
-        logger.info(f"Research completed in {total_research_time:.2f}s total!")
-        logger.info(f"Total steps processed: {len(steps)}")
-
-        # Log accumulated metrics
-        metrics = usage_accumulator.get_metrics()
-        logger.info(f"Total tokens used: {metrics['total_tokens']}")
-        logger.info(f"Total model time: {metrics['model_time']:.4f}s")
+        return await self._execute_research(
+            plan_path=plan_path, output_dir=output_dir, memory_dir=memory_dir, deep=deep, initial_input=initial_input,
+            concurrency=concurrency, stage_workers=stage_workers, resume=resume, dag=dag,
+            deep_concurrency=deep_concurrency, step_semaphore=step_semaphore, work_queue=work_queue,
+            incremental=incremental, stream=stream, progress_callback=progress_callback,
+            rolling_summary=rolling_summary, context_budget=context_budget
+        )
+
+    async def _run_source_stage(self, job, run):
+        """
+        Collect the sources for a step with the source agent.
+
+        Args:
+            job (StepJob): The step to process
+            run (ResearchRun): The research run
+        """
+        if run.deep:
+            # This workflow only handles basic research
+            raise ValueError("Deep research is not supported by BasicGizmoWorkflow")
+
+        # Source Agent - Get search results
+        logger.info(f"Running source agent...")
+        source_start_time = time.time()
+        job.search_results = await self._collect_sources(job, run)
+        source_time = time.time() - source_start_time
+
+        # Log source agent metrics if available
+        logger.info(f"Source agent completed in {source_time:.2f}s")
+
+    async def _run_research_stage(self, job, run):
+        """
+        Analyze the collected sources with the researcher agent.
+
+        When the steps are scheduled by their dependencies, the summaries of the steps this step
+        depends on are added to the researcher's input.
+
+        Args:
+            job (StepJob): The step to process
+            run (ResearchRun): The research run
+        """
+        # Researcher Agent - Analyze the search results
+        logger.info(f"Running researcher agent...")
+        researcher_start_time = time.time()
+        report_file = os.path.join(run.output_dir, f"step{job.number}.md")
+        researcher_response = await arun_researcher_agent(
+            job.topic, job.search_results, job.number, run.memory_dir, run.output_dir, run.plan_path,
+            run.initial_input, run.context_summaries(job) if run.graph is not None else None,
+            report_file if run.stream else None, run.progress_callback, run.context_budget
+        )
+        run.record_usage(researcher_response, job)
+        researcher_time = time.time() - researcher_start_time
+        job.report = researcher_response.content
+
+        # Log researcher agent metrics if available
+        logger.info(f"Researcher agent completed in {researcher_time:.2f}s")
+
+        # Write the analysis to the output directory, unless it was already streamed there
+        if not run.stream:
+            write_file(report_file, job.report)
+
+    def _step_artifacts(self, job, run):
+        """
+        Get the files produced by a completed step, including the researcher's analysis.
+
+        Args:
+            job (StepJob): The completed step
+            run (ResearchRun): The research run
+
+        Returns:
+            dict: The artifact paths by artifact name
+        """
+        artifacts = super()._step_artifacts(job, run)
+        artifacts["analysis"] = os.path.join(run.memory_dir, f"step{job.number}_analysis.md")
+        return artifacts
 
 
 # Create a global instance of the BasicGizmoWorkflow
@@ -10,20 +10,28 @@ The workflow includes:
 2. Use of GPT Researcher for deep research
 """
 
+import contextlib
 import os
 import time
 import re
 
 from gizmo.agents.gpt_researcher_agent import run_gpt_researcher_agent
-from gizmo.agents.plan_parser_agent import run_plan_parser_agent
 from gizmo.agents.planning_agent import run_planning_agent
-from gizmo.agents.source_agent import run_source_agent
-from gizmo.agents.summarizer_agents import run_step_summarizer_agent, run_final_summarizer_agent
-from gizmo.utils.error_utils import retry, log_error, logger, set_step_context, clear_step_context
-from gizmo.utils.file_utils import write_file, ensure_dir, read_file
+from gizmo.utils.context_utils import select_relevant_summaries
+from gizmo.utils.error_utils import retry, logger
+from gizmo.utils.file_utils import write_file
 from gizmo.utils.metrics_utils import UsageAccumulator
 from gizmo.workflows.workflow_base import GizmoWorkflow
 
+# Maximum number of previous step summaries passed to GPT Researcher
+DEEP_CONTEXT_STEPS = 5
+
+# Number of most recent step summaries that are always passed to GPT Researcher
+DEEP_CONTEXT_RECENT = 2
+
+# Maximum number of tokens of the previous step summaries passed to GPT Researcher
+DEEP_CONTEXT_TOKENS = 4000
+
 
 def extract_urls_from_markdown(markdown_text):
     """
@@ -73,7 +81,10 @@ class DeepGizmoWorkflow(GizmoWorkflow):
         # Generate the plan in markdown format
         return run_planning_agent(input_prompt, output_plan_path, is_file, size)
 
-    async def run_research(self, plan_path, output_dir, memory_dir=".memory", deep=True, initial_input=None):
+    async def run_research(self, plan_path, output_dir, memory_dir=".memory", deep=True, initial_input=None,
+                           concurrency=1, stage_workers=None, resume=False, dag=False,
+                           deep_concurrency=None, step_semaphore=None, work_queue=None, incremental=False,
+                           stream=False, progress_callback=None, rolling_summary=False, context_budget=None):
         """
         Execute a deep research workflow based on a plan.
 
@@ -83,150 +94,130 @@ class DeepGizmoWorkflow(GizmoWorkflow):
             memory_dir (str): Directory to save intermediate files
             deep (bool): Whether to use GPT Researcher for deep research
             initial_input (str, optional): Initial input for the research
+            concurrency (int, optional): Maximum number of steps researched in parallel. Defaults to 1.
+            stage_workers (dict, optional): Number of workers per stage ("source", "research", "summary").
+                                            If provided, the steps are executed as a stage pipeline.
+            resume (bool, optional): Whether to skip the steps completed by a previous run of the same plan.
+                                     Defaults to False.
+            dag (bool, optional): Whether to schedule the steps by their dependencies instead of assuming
+                                  that every step depends on all previous ones. Defaults to False.
+            deep_concurrency (int, optional): Maximum number of GPT Researcher instances running at once.
+                                              Defaults to None (only limited by the step concurrency).
+            step_semaphore (asyncio.Semaphore, optional): Semaphore shared with other runs that limits the
+                                                          number of steps in progress across all of them.
+            work_queue (str, optional): Path to a work queue database. If provided, the steps are enqueued
+                                        and executed by `gizmo worker` processes.
+            incremental (bool, optional): Whether to reuse the unchanged steps of a previous run of an edited
+                                          plan. Defaults to False.
+            stream (bool, optional): Whether to write the step reports and the final summary to `.partial`
+                                     files while they are generated. Defaults to False.
+            progress_callback (callable, optional): Called as the streamed files grow, see
+                                                    `stream_utils.ProgressCallback`
+            rolling_summary (bool, optional): Whether to fold finished steps into a summary of the research
+                                              so far in the background, so the final summary only has to
+                                              merge the last steps. Defaults to False.
+            context_budget (int, optional): Maximum number of tokens of the researcher input.
+                                            Not used by the deep workflow.
 
         Raises:
+            ValueError: If stage_workers is combined with dag or work_queue
             Exception: If the research execution fails
         """
-        # Set default retriever to duckduckgo if not already set
-        if "RETRIEVER" not in os.environ:
-            os.environ["RETRIEVER"] = "duckduckgo"
-
-        # Start timing the entire research process
-        research_start_time = time.time()
-
-        # Create a usage accumulator to track metrics across all agent runs
-        usage_accumulator = UsageAccumulator()
-
-        # Ensure directories exist
-        ensure_dir(memory_dir)
-        ensure_dir(output_dir)
-
-        # Parse the plan file to get the list of steps
-        logger.info("Reading research plan...")
-        plan = read_file(plan_path)
-        parsed_plan = run_plan_parser_agent(plan)
-        usage_accumulator.record(parsed_plan)
-        steps = parsed_plan.content.steps
-
-        logger.info(f"Parsed {len(steps)} research steps from plan")
-
-        # Store step summaries for the final summary
-        step_summaries = []
-
-        # Process each step in the plan
-        for step in enumerate(steps, start=1):
-            i = step[1].step
-            topic = step[1].topic
-            step_num = f"step #{i}"
-            # Set the step context for logging
-            set_step_context(i)
-            logger.info(f"Processing {step_num}: {step}")
-            step_start_time = time.time()
-
-            try:
-                if not deep:
-                    # This workflow only handles deep research
-                    raise ValueError("Regular research is not supported by DeepGizmoWorkflow")
-                else:
-                    # Use GPT Researcher for deep research
-                    logger.info(f"Running GPT Researcher for deep research...")
-                    
-                    # First run the source agent to get relevant URLs
-                    logger.info(f"Running source agent to find relevant sources...")
-                    source_start_time = time.time()
-                    source_response = run_source_agent(topic, i, memory_dir)
-                    usage_accumulator.record(source_response)
-                    source_time = time.time() - source_start_time
-                    search_results = source_response.content
-                    
-                    # Save source agent results to output directory
-                    source_file = os.path.join(output_dir, f"step{i}_sources.md")
-                    write_file(source_file, search_results)
-                    
-                    # Extract URLs from the source agent's response
-                    source_urls = extract_urls_from_markdown(search_results)
-                    logger.info(f"Source agent completed in {source_time:.2f}s, found {len(source_urls)} URLs")
-                    
-                    # Run GPT Researcher with the source URLs
-                    deep_research_start_time = time.time()
-                    research_report = await run_gpt_researcher_agent(
-                        topic=topic, 
-                        step_number=i, 
-                        output_dir=output_dir, 
-                        plan=plan, 
-                        previous_steps_summaries=step_summaries, 
-                        initial_query=initial_input,
-                        source_urls=source_urls
-                    )
-                    deep_research_time = time.time() - deep_research_start_time
-
-                    # Log GPT Researcher metrics
-                    logger.info(f"GPT Researcher completed in {deep_research_time:.2f}s")
-
-                    # Step Summarizer - Summarize the step
-                    logger.info(f"Running step summarizer...")
-                    summarizer_start_time = time.time()
-                    summarizer_response = run_step_summarizer_agent(research_report, i, memory_dir)
-                    usage_accumulator.record(summarizer_response)
-                    summarizer_time = time.time() - summarizer_start_time
-                    summary = summarizer_response.content
-
-                    # Log summarizer agent metrics if available
-                    logger.info(f"Step summarizer agent completed in {summarizer_time:.2f}s")
-
-                    # Store the summary for the final summary
-                    step_summaries.append(f"## Step {i}: {step}\n\n{summary}")
-
-                # Log total step metrics
-                step_time = time.time() - step_start_time
-                logger.info(f"Step completed in {step_time:.2f}s total")
-
-            except Exception as e:
-                error_msg = f"Error processing step {i}: {str(e)}"
-                logger.error(f"{error_msg}")
-                log_error(e, error_msg)
-
-                # Create error files
-                error_content = f"# Error in Step {i}: {step}\n\n{str(e)}"
-                write_file(os.path.join(output_dir, f"step{i}.md"), error_content)
-                write_file(os.path.join(memory_dir, f"step{i}_summary.md"), "Error: " + str(e))
-
-                # Add error to summaries
-                step_summaries.append(f"## Step {i}: {step}\n\nError: {str(e)}")
-
-            finally:
-                # Clear the step context after processing
-                clear_step_context()
-
-        # Final step: Generate the overall summary
-        if step_summaries:
-            logger.info("Generating final summary...")
-            final_summary_start_time = time.time()
-            try:
-                run_final_summarizer_agent(step_summaries, output_dir)
-                final_summary_time = time.time() - final_summary_start_time
-
-                # Log final summarizer metrics if available
-                logger.info(f"Final summarizer completed in {final_summary_time:.2f}s")
-
-            except Exception as e:
-                error_msg = f"Error generating final summary: {str(e)}"
-                logger.error(f"{error_msg}")
-                log_error(e, error_msg)
-
-                # Create error file for summary
-                error_content = f"# Error in Final Summary\n\n{str(e)}"
-                write_file(os.path.join(output_dir, "summary_final.md"), error_content)
-
-        # Calculate and log total research metrics
-        total_research_time = time.time() - research_start_time
-        logger.info(f"Research completed in {total_research_time:.2f}s total!")
-        logger.info(f"Total steps processed: {len(steps)}")
-
-        # Log accumulated metrics
-        metrics = usage_accumulator.get_metrics()
-        logger.info(f"Total tokens used: {metrics['total_tokens']}")
-        logger.info(f"Total model time: {metrics['model_time']:.4f}s")
+        return await self._execute_research(
+            plan_path=plan_path, output_dir=output_dir, memory_dir=memory_dir, deep=deep, initial_input=initial_input,
+            concurrency=concurrency, stage_workers=stage_workers, resume=resume, dag=dag,
+            deep_concurrency=deep_concurrency, step_semaphore=step_semaphore, work_queue=work_queue,
+            incremental=incremental, stream=stream, progress_callback=progress_callback,
+            rolling_summary=rolling_summary, context_budget=context_budget
+        )
+
+    async def _run_source_stage(self, job, run):
+        """
+        Collect the sources for a step and extract their URLs for GPT Researcher.
+
+        Args:
+            job (StepJob): The step to process
+            run (ResearchRun): The research run
+        """
+        if not run.deep:
+            # This workflow only handles deep research
+            raise ValueError("Regular research is not supported by DeepGizmoWorkflow")
+
+        # First run the source agent to get relevant URLs
+        logger.info(f"Running source agent to find relevant sources...")
+        source_start_time = time.time()
+        job.search_results = await self._collect_sources(job, run)
+        source_time = time.time() - source_start_time
+
+        # Save source agent results to output directory
+        source_file = os.path.join(run.output_dir, f"step{job.number}_sources.md")
+        write_file(source_file, job.search_results)
+
+        # Extract URLs from the source agent's response
+        job.source_urls = extract_urls_from_markdown(job.search_results)
+        logger.info(f"Source agent completed in {source_time:.2f}s, found {len(job.source_urls)} URLs")
+
+    async def _run_research_stage(self, job, run):
+        """
+        Research a step with GPT Researcher.
+
+        The summaries of the steps finished so far are passed to GPT Researcher as previously
+        written content. When the steps are run one after another, these are the previous steps;
+        when the steps are scheduled by their dependencies, the steps this step depends on. To keep
+        late steps as cheap as early ones, at most DEEP_CONTEXT_STEPS summaries are passed: the
+        DEEP_CONTEXT_RECENT most recent ones and those most relevant to the step topic, within
+        DEEP_CONTEXT_TOKENS tokens.
+
+        Args:
+            job (StepJob): The step to process
+            run (ResearchRun): The research run
+        """
+        # Use GPT Researcher for deep research
+        logger.info(f"Running GPT Researcher for deep research...")
+        context_summaries = run.context_summaries(job)
+        previous_steps_summaries = select_relevant_summaries(
+            context_summaries, job.topic, DEEP_CONTEXT_STEPS, DEEP_CONTEXT_RECENT, DEEP_CONTEXT_TOKENS
+        )
+        if len(previous_steps_summaries) < len(context_summaries):
+            logger.info(f"Passing {len(previous_steps_summaries)} of {len(context_summaries)} previous step "
+                        f"summaries to GPT Researcher")
+
+        # Run GPT Researcher with the source URLs, limiting the number of concurrent instances
+        research_usage = UsageAccumulator()
+        async with run.deep_semaphore or contextlib.nullcontext():
+            deep_research_start_time = time.time()
+            job.report = await run_gpt_researcher_agent(
+                topic=job.topic,
+                step_number=job.number,
+                output_dir=run.output_dir,
+                plan=run.plan,
+                previous_steps_summaries=previous_steps_summaries,
+                initial_query=run.initial_input,
+                source_urls=job.source_urls,
+                usage_accumulator=research_usage,
+                stream=run.stream,
+                progress_callback=run.progress_callback
+            )
+            deep_research_time = time.time() - deep_research_start_time
+        run.record_cost(research_usage.get_metrics()['total_cost'], job)
+
+        # Log GPT Researcher metrics
+        logger.info(f"GPT Researcher completed in {deep_research_time:.2f}s")
+
+    def _step_artifacts(self, job, run):
+        """
+        Get the files produced by a completed step, including the source list.
+
+        Args:
+            job (StepJob): The completed step
+            run (ResearchRun): The research run
+
+        Returns:
+            dict: The artifact paths by artifact name
+        """
+        artifacts = super()._step_artifacts(job, run)
+        artifacts["sources"] = os.path.join(run.output_dir, f"step{job.number}_sources.md")
+        return artifacts
 
 
 # Create a global instance of the DeepGizmoWorkflow
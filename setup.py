@@ -11,6 +11,7 @@ setup(
     author="purrfessor",
     packages=find_packages(),
     install_requires=[
+        # Pinned: the agent pool resets private attributes of agno 1.2.6 agents between runs
         "agno==1.2.6",
         "openai>=1.0.0",
         "duckduckgo-search",